@@ -0,0 +1,291 @@
+"""Benchmark the stages of the invoice2data pipeline.
+
+Times text extraction per input module, template loading, template
+matching, `prepare_input`, field parsing, plugins and output writing over a
+corpus of invoices, by default the one used by the tests. The extracted
+texts are also repeated to build synthetic corpora of larger documents,
+which stress the lines and tables parsing.
+
+Results are written as JSON, and can be compared with the results of
+another commit:
+
+    python benchmarks/benchmark.py --output new.json --compare old.json
+
+Run it with `nox --session=benchmark -- [options]`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from invoice2data.__main__ import input_mapping
+from invoice2data.__main__ import output_mapping
+from invoice2data.extract.invoice_template import PARSERS_MAPPING
+from invoice2data.extract.invoice_template import PLUGIN_MAPPING
+from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.extract.loader import read_templates
+from invoice2data.extract.template_index import TemplateIndex
+from invoice2data.extract.timings import Timings
+
+
+DEFAULT_CORPUS = os.path.join("tests", "compare")
+DEFAULT_INPUT_MODULES = ["pdftotext", "pdfminer", "pdfplumber"]
+INVOICE_EXTENSIONS = (".pdf", ".txt", ".png", ".jpg")
+
+
+def summary(timings: Timings) -> Dict[str, Dict[str, float]]:
+    """Return statistics of the samples of each stage.
+
+    Args:
+        timings (Timings): The wall time records of the stages.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Count, total, min, median and max of
+            the samples, in seconds.
+    """
+    samples: Dict[str, List[float]] = {}
+    for record in timings.records:
+        samples.setdefault(record["stage"], []).append(record["seconds"])
+    return {
+        stage: {
+            "count": len(stage_samples),
+            "total": sum(stage_samples),
+            "min": min(stage_samples),
+            "median": statistics.median(stage_samples),
+            "max": max(stage_samples),
+        }
+        for stage, stage_samples in sorted(samples.items())
+    }
+
+
+def find_invoices(folders: List[str]) -> List[str]:
+    """Return the invoice files found in the folders, sorted by path."""
+    invoices = []
+    for folder in folders:
+        for path, _subdirs, files in os.walk(folder):
+            invoices.extend(
+                os.path.join(path, name)
+                for name in files
+                if name.lower().endswith(INVOICE_EXTENSIONS)
+            )
+    return sorted(invoices)
+
+
+def bench_template_loading(
+    timings: Timings, folder: Optional[str], repeat: int
+) -> List[InvoiceTemplate]:
+    """Time loading the templates, without and with the template cache."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        read_templates(folder, cache_dir=cache_dir)
+        for _ in range(repeat):
+            with timings.measure("load_templates"):
+                templates = read_templates(folder)
+            with timings.measure("load_templates.cached"):
+                read_templates(folder, cache_dir=cache_dir)
+    return templates
+
+
+def bench_text_extraction(
+    timings: Timings, invoices: List[str], input_modules: List[str]
+) -> List[Tuple[str, str]]:
+    """Time the input modules and return the text of each invoice.
+
+    The text of an invoice is the one of the first input module which
+    extracted any. Input modules failing on a file, e.g. because a program
+    is missing, are skipped for that file.
+    """
+    texts = []
+    for invoice in invoices:
+        modules = ["text"] if invoice.lower().endswith(".txt") else input_modules
+        extracted = ""
+        for name in modules:
+            start = time.perf_counter()
+            try:
+                result = input_mapping[name].to_text(invoice)
+            except Exception as error:  # noqa: BLE001
+                print(f"Skipping {name} for {invoice}: {error}", file=sys.stderr)
+                continue
+            timings.add(f"to_text.{name}", time.perf_counter() - start)
+            if not extracted and isinstance(result, str):
+                extracted = result
+        if extracted.strip():
+            texts.append((invoice, extracted))
+    return texts
+
+
+def bench_processing(
+    timings: Timings,
+    templates: List[InvoiceTemplate],
+    texts: List[Tuple[str, str]],
+    repeat: int,
+) -> None:
+    """Time matching, preparing, parsing and writing the extracted texts."""
+    results: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        with timings.measure("index_templates"):
+            index = TemplateIndex(templates)
+        results = []
+        for _invoice, extracted_str in texts:
+            with timings.measure("match_templates"):
+                matched = index.match(extracted_str)
+            if not matched:
+                continue
+            template = matched[0]
+            with timings.measure("prepare_input"):
+                optimized_str = template.prepare_input(extracted_str)
+            output = parse_fields(timings, template, optimized_str)
+            for keyword, plugin in PLUGIN_MAPPING.items():
+                if keyword in template:
+                    with timings.measure(f"plugin.{keyword}"):
+                        plugin.extract(template, optimized_str, output)
+            results.append(output)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            for name, module in output_mapping.items():
+                if module is None:
+                    continue
+                path = os.path.join(output_dir, f"invoices.{name}")
+                start = time.perf_counter()
+                try:
+                    module.write_to_file(results, path, "%Y-%m-%d")
+                except Exception as error:  # noqa: BLE001
+                    print(f"Skipping output {name}: {error!r}", file=sys.stderr)
+                    continue
+                timings.add(f"output.{name}", time.perf_counter() - start)
+
+
+def parse_fields(
+    timings: Timings, template: InvoiceTemplate, optimized_str: str
+) -> Dict[str, Any]:
+    """Time the parsers of the template fields, grouped by parser.
+
+    Fields with an area need the input file and are not parsed.
+    """
+    output: Dict[str, Any] = {}
+    for k, v in template["fields"].items():
+        if not isinstance(v, dict) or "area" in v:
+            continue
+        parser = PARSERS_MAPPING.get(v.get("parser"))
+        if parser is None:
+            continue
+        with timings.measure(f"parse_field.{v['parser']}"):
+            value = parser.parse(template, k, v, optimized_str)
+        if value or value == 0.0:
+            output[k] = value
+    return output
+
+
+def scale_texts(texts: List[Tuple[str, str]], factor: int) -> List[Tuple[str, str]]:
+    """Repeat the text of every invoice to build larger documents."""
+    return [(invoice, "\n".join([text] * factor)) for invoice, text in texts]
+
+
+def metadata() -> Dict[str, Any]:
+    """Return the environment of the benchmark run."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of the median time of every stage."""
+    for group, stages in results["results"].items():
+        for stage, stats in stages.items():
+            base = baseline["results"].get(group, {}).get(stage)
+            if not base or not base["median"]:
+                continue
+            change = stats["median"] / base["median"] - 1
+            print(
+                f"{group:>8} {stage:<28} {base['median'] * 1000:10.3f} ms "
+                f"-> {stats['median'] * 1000:10.3f} ms {change:+8.1%}"
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "corpus",
+        nargs="*",
+        default=[DEFAULT_CORPUS],
+        help="Folders with the invoices to process.",
+    )
+    parser.add_argument(
+        "--templates",
+        help="Folder with the templates. Defaults to the built-in templates.",
+    )
+    parser.add_argument(
+        "--input-module",
+        action="append",
+        choices=sorted(input_mapping),
+        help="Input module to time for the PDF and image files. Can be repeated.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        action="append",
+        help="Repeat the extracted texts this many times. Can be repeated.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of runs of each stage."
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="JSON results to compare with.")
+    args = parser.parse_args(argv)
+
+    timings = Timings()
+    templates = bench_template_loading(timings, args.templates, args.repeat)
+    invoices = find_invoices(args.corpus)
+    texts = bench_text_extraction(
+        timings, invoices, args.input_module or DEFAULT_INPUT_MODULES
+    )
+    results = {"setup": summary(timings)}
+
+    for factor in args.scale or [1, 10]:
+        timings = Timings()
+        bench_processing(timings, templates, scale_texts(texts, factor), args.repeat)
+        results[f"x{factor}"] = summary(timings)
+
+    report = {
+        "meta": dict(metadata(), invoices=len(invoices), texts=len(texts)),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
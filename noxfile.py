@@ -281,6 +281,26 @@ def xdoctest(session: nox.Session) -> None:
     session.run("python", "-m", "xdoctest", *args)
 
 
+@nox.session(python=python_versions[0])
+def benchmark(session: nox.Session) -> None:
+    """Time the processing stages over the test corpus."""
+    session.run(
+        "uv",
+        "sync",
+        "--group",
+        "dev",
+        "--extra",
+        "pdfminer-six",
+        "--extra",
+        "pdfplumber",
+        "--extra",
+        "pyyaml",
+        env={"UV_PROJECT_ENVIRONMENT": session.virtualenv.location},
+    )
+    session.env["PYTHONPATH"] = "src"
+    session.run("python", "benchmarks/benchmark.py", *session.posargs)
+
+
 @nox.session(name="docs-build", python=python_versions[0])
 def docs_build(session: nox.Session) -> None:
     """Build the documentation."""
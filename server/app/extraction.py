@@ -0,0 +1,137 @@
+"""In-process invoice extraction for the server.
+
+Invoices are extracted with `invoice2data.extract_data` in a pool of worker
+processes, so the event loop is never blocked and several invoices can be
+parsed at once. Each worker loads the templates once when it starts and
+reloads them only when a file in the template folder changes, instead of
+starting a new `invoice2data` process (and re-reading every template) per
+request.
+
+Extracted texts are cached in INVOICE2DATA_TEXT_CACHE (`data/cache/texts` by
+default, empty to disable), so re-processing an invoice skips reading or
+OCRing it again.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from invoice2data import extract_data
+from invoice2data.extract.loader import read_templates
+from invoice2data.input.text_cache import TextCache
+from invoice2data.output.to_json import format_item
+
+
+TEMPLATE_DIR = Path("data/templates")
+TEMPLATE_CACHE_DIR = Path("data/cache/templates")
+TEMPLATE_SUFFIXES = (".yml", ".yaml", ".json")
+TEXT_CACHE_DIR = os.environ.get("INVOICE2DATA_TEXT_CACHE", "data/cache/texts")
+DATE_FORMAT = "%Y-%m-%d"
+
+# Number of invoices extracted in parallel
+WORKERS = int(os.environ.get("INVOICE2DATA_WORKERS", os.cpu_count() or 1))
+
+
+class TemplateStore:
+    """Built-in templates plus the templates of a folder, reloaded on change."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._built_in = None
+        self._custom = []
+        self._signature = None
+
+    def signature(self) -> Tuple:
+        """Names, sizes and modification times of the template files."""
+        files = []
+        for path in self.folder.rglob("*"):
+            if path.suffix not in TEMPLATE_SUFFIXES:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            name = str(path.relative_to(self.folder))
+            files.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(files))
+
+    def get(self) -> List[Any]:
+        """Return the templates, reloading the folder if a file changed."""
+        with self._lock:
+            if self._built_in is None:
+                self._built_in = read_templates(cache_dir=str(TEMPLATE_CACHE_DIR))
+            signature = self.signature()
+            if signature != self._signature:
+                print(f"🔄 Loading templates from {self.folder}")
+                self._custom = read_templates(
+                    str(self.folder.resolve()), cache_dir=str(TEMPLATE_CACHE_DIR)
+                )
+                self._signature = signature
+            return self._custom + self._built_in
+
+
+# Templates and text cache of a worker process, set by `_init_worker`
+_store: Optional[TemplateStore] = None
+_text_cache: Optional[TextCache] = None
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker():
+    global _store, _text_cache
+    TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
+    _store = TemplateStore(TEMPLATE_DIR)
+    _store.get()
+    if TEXT_CACHE_DIR:
+        _text_cache = TextCache(TEXT_CACHE_DIR)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _extract(path: str) -> Optional[Dict[str, Any]]:
+    """Extract an invoice in a worker, with dates formatted for JSON."""
+    res = extract_data(path, templates=_store.get(), text_cache=_text_cache)
+    if not res:
+        return None
+    return format_item(res, DATE_FORMAT)
+
+
+def start():
+    """Start the worker pool and load the templates in every worker."""
+    global _executor
+    if _executor is not None:
+        return
+    _executor = ProcessPoolExecutor(max_workers=WORKERS, initializer=_init_worker)
+    # Workers are started on demand, start them all now so the first
+    # uploads don't wait for the templates to load.
+    for future in [_executor.submit(_warm_up) for _ in range(WORKERS)]:
+        future.result()
+    print(f"✅ Started {WORKERS} extraction workers")
+
+
+def shutdown():
+    """Stop the worker pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def extract_invoice(path: Path) -> Optional[Dict[str, Any]]:
+    """Extract an invoice without blocking the event loop.
+
+    Returns the extracted fields, or None when no template matches.
+    """
+    if _executor is None:
+        start()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _extract, str(path))
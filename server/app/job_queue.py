@@ -0,0 +1,235 @@
+"""Background processing of uploaded invoices.
+
+Uploads are recorded as jobs in the `jobs` table of the server database and
+return at once. A configurable number of worker tasks take the queued jobs
+in order and run the extraction, whose result is stored with the job. Jobs
+which were queued or running when the server stopped are queued again at
+startup.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from server.app import extraction
+from server.app.storage import Database
+from server.app.storage import db
+
+
+# Number of jobs processed at the same time
+JOB_WORKERS = int(os.environ.get("INVOICE2DATA_JOB_WORKERS", extraction.WORKERS))
+
+JOB_COLUMNS = [
+    "id",
+    "filename",
+    "status",
+    "result",
+    "created_at",
+    "started_at",
+    "finished_at",
+]
+
+
+class JobQueue:
+    """Queue of invoices to process, persisted in the server database."""
+
+    def __init__(self, db: Database, workers: int):
+        self.db = db
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None
+
+    def init_db(self):
+        """Create the jobs table if it does not exist."""
+        with self.db.connection() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT
+            )""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+
+    async def start(self, handler: Callable[[str], Awaitable[Dict[str, Any]]]):
+        """Start the workers, with `handler(filename)` processing a file."""
+        self._handler = handler
+        self._queue = asyncio.Queue()
+        pending = await asyncio.to_thread(self._pending)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            print(f"🔄 Resuming {len(pending)} queued jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers. Unfinished jobs are resumed on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _pending(self) -> List[str]:
+        """Create the table and return the jobs to process, oldest first."""
+        self.init_db()
+        with self.db.connection() as conn:
+            # Jobs interrupted by a restart are processed again
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid"
+            ).fetchall()
+        return [job_id for (job_id,) in rows]
+
+    async def enqueue(self, filename: str) -> Dict[str, Any]:
+        """Record a job for the file and queue it."""
+        return (await self.enqueue_many([filename]))[0]
+
+    async def enqueue_many(self, filenames: List[str]) -> List[Dict[str, Any]]:
+        """Record a job for every file, in one transaction, and queue them.
+
+        The jobs are written in a worker thread, so waiting for the database
+        lock does not block the event loop.
+        """
+        jobs = await asyncio.to_thread(self._insert, filenames)
+        if self._queue is not None:
+            for job in jobs:
+                self._queue.put_nowait(job["id"])
+        return jobs
+
+    def _insert(self, filenames: List[str]) -> List[Dict[str, Any]]:
+        created_at = datetime.now().isoformat()
+        jobs = [
+            {
+                "id": uuid.uuid4().hex,
+                "filename": filename,
+                "status": "queued",
+                "result": None,
+                "created_at": created_at,
+                "started_at": None,
+                "finished_at": None,
+            }
+            for filename in filenames
+        ]
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO jobs (id, filename, status, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (job["id"], job["filename"], job["status"], job["created_at"])
+                    for job in jobs
+                ],
+            )
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job, with its result once it is processed."""
+        with self.db.connection() as conn:
+            row = conn.execute(
+                # The columns are the constant JOB_COLUMNS
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?",  # noqa: S608
+                (job_id,),
+            ).fetchone()
+        return _job_from_row(row) if row else None
+
+    def list_jobs(
+        self, status: Optional[str] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Return the latest jobs, optionally only those with a status."""
+        # The columns are the constant JOB_COLUMNS
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"  # noqa: S608
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def _update(self, job_id: str, **values):
+        unknown = set(values) - set(JOB_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job columns: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self.db.connection() as conn:
+            conn.execute(
+                # The columns are checked against JOB_COLUMNS above
+                f"UPDATE jobs SET {assignments} WHERE id = ?",  # noqa: S608
+                (*values.values(), job_id),
+            )
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:  # noqa: BLE001
+                # e.g. a locked database, the worker goes on with the next job
+                print(f"❌ Job {job_id} failed: {e}")
+                await asyncio.to_thread(self._mark_failed, job_id, e)
+            finally:
+                self._queue.task_done()
+
+    def _mark_failed(self, job_id: str, error: Exception):
+        result = {"message": f"Processing failed: {error}", "status": "failed"}
+        try:
+            self._update(
+                job_id,
+                status="failed",
+                result=json.dumps(result),
+                finished_at=datetime.now().isoformat(),
+            )
+        except Exception as e:  # noqa: BLE001
+            print(f"❌ Could not mark job {job_id} as failed: {e}")
+
+    async def _run(self, job_id: str):
+        # The database is used from a worker thread, not to block the event
+        # loop while waiting for a lock held by the extraction
+        job = await asyncio.to_thread(self.get, job_id)
+        if job is None or job["status"] != "queued":
+            return
+        await asyncio.to_thread(
+            self._update,
+            job_id,
+            status="running",
+            started_at=datetime.now().isoformat(),
+        )
+        try:
+            result = await self._handler(job["filename"])
+        except Exception as e:  # noqa: BLE001
+            print(f"❌ Job {job_id} failed: {e}")
+            result = {"message": f"Processing failed: {e}", "status": "failed"}
+        status = "success" if result.get("status") == "success" else "failed"
+        await asyncio.to_thread(
+            self._update,
+            job_id,
+            status=status,
+            result=json.dumps(result),
+            finished_at=datetime.now().isoformat(),
+        )
+
+
+def _job_from_row(row) -> Dict[str, Any]:
+    job = dict(zip(JOB_COLUMNS, row))
+    if job["result"]:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+queue = JobQueue(db, JOB_WORKERS)
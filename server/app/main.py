@@ -1,12 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from pathlib import Path
 import mistune  # Ensure mistune is installed: pip install mistune
-from server.app.routers import files, processing, templates, downloads, templates_api
+from server.app import extraction
+from server.app.job_queue import queue
+from server.app.storage import db
+from server.app.routers import files, processing, templates, downloads, templates_api, jobs
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ✅ Create or upgrade the database schema
+    db.init_db()
+    # ✅ Load the templates once, in the extraction workers
+    extraction.start()
+    # ✅ Process queued uploads in the background
+    await queue.start(files.process_invoice)
+    yield
+    await queue.stop()
+    extraction.shutdown()
+    db.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 DOCS_PATH = Path("server/docs/template_docs.md")
 
@@ -19,6 +38,7 @@ app.include_router(processing.router, prefix="/processing", tags=["Processing"])
 app.include_router(templates.router, prefix="/templates", tags=["Templates"])
 app.include_router(downloads.router, prefix="/downloads", tags=["Downloads"])
 app.include_router(templates_api.router, prefix="/templates", tags=["Templates"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
 
 # ✅ Setup Jinja2 Templates
 templates = Jinja2Templates(directory="server/templates")
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-import subprocess
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query
+import asyncio
+import io
 import sqlite3
 import shutil
 import json
-from fastapi.responses import FileResponse
+import tempfile
+from fastapi.responses import FileResponse, StreamingResponse
 from pathlib import Path
 import csv
-from datetime import datetime
-import pandas as pd
+from datetime import date, datetime
+from typing import Iterator, Optional
+from openpyxl import Workbook
+from starlette.background import BackgroundTask
 
-from server.app.utils import clean_json_output
+from server.app import extraction, uploads
+from server.app.storage import db
 
 router = APIRouter()
 
@@ -17,11 +22,13 @@ UPLOAD_DIR = Path("data/pdfs")
 TEXT_DIR = Path("data/text")
 UNPROCESSED_DIR = Path("data/unprocessed")
 TEMPLATE_DIR = Path("data/templates")
-DB_PATH = Path("data/invoices.db")
 
 OUTPUT_DIR = Path("data/output")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Lines of an export sent to the client at a time
+EXPORT_BATCH_SIZE = 200
+
 field_mapping = {
     "invoice_number": "Invoice Number",
     "amount": "Amount",
@@ -40,152 +47,210 @@ for directory in [UPLOAD_DIR, TEXT_DIR, UNPROCESSED_DIR]:
 @router.post("/upload/")
 async def upload_pdf(file: UploadFile = File(...)):
     """Handles PDF file upload and automatically triggers processing."""
-    file_path = UPLOAD_DIR / file.filename
+    filename = uploads.sanitize_filename(file.filename or "")
+    if not filename or filename.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid file name.")
+    file_path = UPLOAD_DIR / filename
 
     with open(file_path, "wb") as buffer:
         buffer.write(await file.read())
 
     # Process the file automatically
-    result = subprocess.run(
-        ["invoice2data", "--template-folder", str(TEMPLATE_DIR), "--output-format", "json", str(file_path)],
-        capture_output=True, text=True
-    )
-
-    print("Processing Output:", result.stdout)  # ✅ Debugging Processing
-    print("Processing Error:", result.stderr)   # ✅ Capture Errors
-    # Extract JSON from log output
-    json_data = clean_json_output(result.stderr)
+    try:
+        json_data = await extraction.extract_invoice(file_path)
+    except Exception as e:
+        print(f"❌ Extraction failed for {filename}: {e}")
+        unprocessed_path = UNPROCESSED_DIR / filename
+        shutil.move(file_path, unprocessed_path)  # Move failed file to unprocessed folder
+        return {"message": f"Upload successful, but processing failed for {filename}. Moved to unprocessed.", "status": "failed"}
     print("JSON Data:", json_data)
 
-    if "No template" in result.stderr:  # ❌ Processing failed
-        unprocessed_path = UNPROCESSED_DIR / file.filename
+    if not json_data:  # ❌ Processing failed
+        unprocessed_path = UNPROCESSED_DIR / filename
         shutil.move(file_path, unprocessed_path)  # Move failed file to unprocessed folder
-        return {"message": f"Upload successful, but no matching template for {file.filename}. Moved to unprocessed.", "status": "failed"}
+        return {"message": f"Upload successful, but no matching template for {filename}. Moved to unprocessed.", "status": "failed"}
 
-    json_data = result.stderr.strip()
-    if not json_data:
-        unprocessed_path = UNPROCESSED_DIR / file.filename
-        shutil.move(file_path, unprocessed_path)  # Move failed file to unprocessed folder
-        return {"message": f"Upload successful, but processing failed for {file.filename}. Moved to unprocessed.", "status": "failed"}
-    json_string = json.dumps(json_data, indent=2)
     # Store in database
     try:
-        conn = sqlite3.connect(DB_PATH, isolation_level=None)
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO invoices (filename, json_data) VALUES (?, ?)", (file.filename, json_string))
-        conn.commit()
+        db.save_invoice(filename, json_data, template="invoice2data")
     except sqlite3.OperationalError as e:
-        unprocessed_path = UNPROCESSED_DIR / file.filename
+        unprocessed_path = UNPROCESSED_DIR / filename
         shutil.move(file_path, unprocessed_path)  # Move failed file to unprocessed folder
         return {"message": f"Database error: {e}. Moved to unprocessed.", "status": "failed"}
-    finally:
-        conn.close()
 
-    return {"message": f"File uploaded and processed successfully", "filename": file.filename, "status": "success"}
-@router.get("/download/json/")
-async def download_json():
-    """Download processed invoices as JSON."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT filename, json_data FROM invoices")
-    results = c.fetchall()
-    conn.close()
+    return {"message": f"File uploaded and processed successfully", "filename": filename, "status": "success"}
 
-    invoices = {row[0]: json.loads(row[1]) for row in results}
-    json_path = OUTPUT_DIR / "invoices.json"
 
-    with open(json_path, "w") as json_file:
-        json.dump(invoices, json_file, indent=2)
+def export_filters(
+    date_from: Optional[date] = Query(None, description="First invoice date, included."),
+    date_to: Optional[date] = Query(None, description="Last invoice date, included."),
+    issuer: Optional[str] = Query(None, description="Only the invoices of this issuer."),
+):
+    """Filters of the exports, applied in the database query."""
+    return {
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None,
+        "issuer": issuer,
+    }
 
-    return FileResponse(json_path, media_type="application/json", filename="invoices.json")
 
+def _attachment(filename: str):
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
 
-@router.get("/download/csv/")
-async def download_csv():
-    """Download processed invoices as CSV."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT filename, json_data FROM invoices")
-    results = c.fetchall()
-    conn.close()
-
-    if not results:
-        return {"message": "No processed invoices found."}
 
-    invoices = []
-    for row in results:
-        if row[1] is None:
-            continue
-        try:
-            invoices.append(json.loads(row[1]))
-        except json.JSONDecodeError:
-            continue
+def _batched(lines: Iterator[str], size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Join lines into chunks of the response, to send fewer, larger writes."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
 
-    if not invoices:
-        return {"message": "No valid invoice data found."}
 
-    fieldnames = set()
-    for invoice in invoices:
-        fieldnames.update(invoice.keys())
+def _json_lines(filters) -> Iterator[str]:
+    # A JSON object of the invoices by filename, written one invoice at a time
+    separator = "{\n"
+    for filename, invoice in db.iter_invoices(**filters):
+        body = json.dumps(invoice, indent=2).replace("\n", "\n  ")
+        yield f"{separator}  {json.dumps(filename)}: {body}"
+        separator = ",\n"
+    yield "{}" if separator == "{\n" else "\n}"
 
-    csv_filename = f"invoices_{datetime.today().strftime('%m-%d-%Y')}.csv"
-    csv_path = OUTPUT_DIR / csv_filename
 
-    with open(csv_path, "w", newline="") as csv_file:
-        csv_writer = csv.DictWriter(csv_file, fieldnames=["filename"] + list(fieldnames))
+def _ndjson_lines(filters) -> Iterator[str]:
+    for filename, invoice in db.iter_invoices(**filters):
+        yield json.dumps({"filename": filename, **invoice}) + "\n"
+
+
+def _csv_lines(conn: sqlite3.Connection, fieldnames, filters) -> Iterator[str]:
+    # The rows are read from the snapshot the header was read from, and
+    # the connection is closed once they are sent
+    try:
+        buffer = io.StringIO()
+        csv_writer = csv.DictWriter(buffer, fieldnames=fieldnames)
         csv_writer.writeheader()
-        for row, invoice_data in zip(results, invoices):
-            invoice_data["filename"] = row[0]
+        for filename, invoice_data in db.iter_invoices(**filters, conn=conn):
+            invoice_data["filename"] = filename
             csv_writer.writerow(invoice_data)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        conn.close()
 
-    return FileResponse(csv_path, media_type="text/csv", filename=csv_filename)
 
-@router.get("/download/xls/")
-async def download_xlsx():
-    print("Test")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT filename, json_data FROM invoices")
-    results = c.fetchall()
-    conn.close()
-
-    if not results:
+def _csv_fields(filters):
+    """Open a snapshot of the database and read the CSV columns from it."""
+    conn = db.snapshot()
+    try:
+        return conn, db.invoice_fields(**filters, conn=conn)
+    except BaseException:
+        conn.close()
+        raise
+
+
+@router.get("/download/json/")
+async def download_json(filters: dict = Depends(export_filters)):
+    """Download processed invoices as JSON, streamed from the database."""
+    return StreamingResponse(
+        _batched(_json_lines(filters)),
+        media_type="application/json",
+        headers=_attachment("invoices.json"),
+    )
+
+
+@router.get("/download/ndjson/")
+async def download_ndjson(filters: dict = Depends(export_filters)):
+    """Download processed invoices as newline-delimited JSON, one invoice per line."""
+    return StreamingResponse(
+        _batched(_ndjson_lines(filters)),
+        media_type="application/x-ndjson",
+        headers=_attachment("invoices.ndjson"),
+    )
+
+
+@router.get("/download/csv/")
+async def download_csv(filters: dict = Depends(export_filters)):
+    """Download processed invoices as CSV, streamed from the database.
+
+    The header and the rows are read in one transaction, so invoices
+    processed during the download don't add columns missing from the header.
+    """
+    conn, fieldnames = await asyncio.to_thread(_csv_fields, filters)
+    if not fieldnames:
+        conn.close()
         return {"message": "No processed invoices found."}
 
-    invoices = []
-    for row in results:
-        if row[1] is None:
-            continue
-        try:
-            invoices.append((row[0], json.loads(row[1])))
-        except json.JSONDecodeError:
-            continue
-
-    if not invoices:
-        return {"message": "No valid invoice data found."}
-
-    formatted_data = []
-    for filename, invoice in invoices:
-        row = {"File": filename}
-        for key, col_name in field_mapping.items():
-            value = invoice.get(key, "")
-            if isinstance(value, str):
-                if col_name == "Mail To" and "innovationdiagnostics" in value.lower():
-                    value = "Innovation Diagnostics"
-                elif any(c in value for c in "-/") and len(value) >= 8:
-                    try:
-                        dt = datetime.strptime(value.strip(), "%Y-%m-%d")
-                        value = dt.strftime("%m/%d/%Y")
-                    except Exception:
-                        pass
-            row[col_name] = value
-        formatted_data.append(row)
-
-    df = pd.DataFrame(formatted_data)[columns_order]
+    csv_filename = f"invoices_{datetime.today().strftime('%m-%d-%Y')}.csv"
+    fieldnames = ["filename"] + [field for field in fieldnames if field != "filename"]
+    return StreamingResponse(
+        _batched(_csv_lines(conn, fieldnames, filters)),
+        media_type="text/csv",
+        headers=_attachment(csv_filename),
+    )
+
+def _xlsx_row(filename: str, invoice: dict) -> list:
+    """Cells of an invoice in the XLSX export, in `columns_order`."""
+    row = {"File": filename}
+    for key, col_name in field_mapping.items():
+        value = invoice.get(key, "")
+        if isinstance(value, str):
+            if col_name == "Mail To" and "innovationdiagnostics" in value.lower():
+                value = "Innovation Diagnostics"
+            elif any(c in value for c in "-/") and len(value) >= 8:
+                try:
+                    dt = datetime.strptime(value.strip(), "%Y-%m-%d")
+                    value = dt.strftime("%m/%d/%Y")
+                except Exception:
+                    pass
+        elif isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        row[col_name] = value
+    return [row.get(column, "") for column in columns_order]
+
+
+def write_xlsx(xlsx_path: Path, filters: dict) -> int:
+    """Write the invoices to an XLSX file, one row at a time.
+
+    The worksheet is written in write-only mode, so rows are flushed to the
+    file as they are added instead of being kept in memory. Returns the
+    number of invoices written.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns_order)
+    count = 0
+    for filename, invoice in db.iter_invoices(**filters):
+        sheet.append(_xlsx_row(filename, invoice))
+        count += 1
+    workbook.save(xlsx_path)
+    return count
+
 
+@router.get("/download/xls/")
+async def download_xlsx(filters: dict = Depends(export_filters)):
+    """Download processed invoices as an XLSX summary."""
     xlsx_filename = f"invoices_summary_{datetime.today().strftime('%Y%m%d')}.xlsx"
-    xlsx_path = OUTPUT_DIR / xlsx_filename
-    df.to_excel(xlsx_path, index=False)
+    # Each request writes a file of its own, removed once it is sent
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", dir=OUTPUT_DIR, delete=False) as tmp:
+        xlsx_path = Path(tmp.name)
+    try:
+        count = await asyncio.to_thread(write_xlsx, xlsx_path, filters)
+    except BaseException:
+        xlsx_path.unlink(missing_ok=True)
+        raise
+    if not count:
+        xlsx_path.unlink(missing_ok=True)
+        return {"message": "No processed invoices found."}
 
-    return FileResponse(xlsx_path, media_type="text/xls", filename=xlsx_filename)
-    # return FileResponse(xlsx_path, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=xlsx_filename)
\ No newline at end of file
+    return FileResponse(
+        xlsx_path,
+        media_type="text/xls",
+        filename=xlsx_filename,
+        background=BackgroundTask(xlsx_path.unlink, missing_ok=True),
+    )
+    # return FileResponse(xlsx_path, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename=xlsx_filename)
@@ -1,14 +1,14 @@
-import re
+import asyncio
 import shutil
-import json
 import sqlite3
-import subprocess
 from pathlib import Path
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request
 from fastapi.responses import JSONResponse
 import yaml
 
-from server.app.utils import clean_json_output
+from server.app import extraction, uploads
+from server.app.job_queue import queue
+from server.app.storage import db
 from server.app.routers.processing import process_with_pdftotext # Or relocate the helper
 
 router = APIRouter()
@@ -16,7 +16,6 @@ router = APIRouter()
 UPLOAD_DIR = Path("data/pdfs")
 TEXT_DIR = Path("data/text")
 UNPROCESSED_DIR = Path("data/unprocessed")
-DB_PATH = Path("data/invoices.db")
 TEMPLATE_DIR = Path("data/templates")
 TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
 TEMPLATE_RAW_DIR = Path("data/templates_raw")
@@ -24,24 +23,17 @@ TEMPLATE_RAW_DIR = Path("data/templates_raw")
 for directory in [UPLOAD_DIR, TEXT_DIR, UNPROCESSED_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
-def sanitize_filename(filename):
-    """Sanitize filenames by removing special characters and spaces."""
-    return filename.replace(" ", "_")
-
-def process_invoice(filename: str):
+async def process_invoice(filename: str):
     print(f"🔹 Processing invoice: {filename}")
     file_path = UPLOAD_DIR / filename
 
-    result = subprocess.run(
-        ["invoice2data", "--template-folder", str(TEMPLATE_DIR), "--output-format", "json", str(file_path)],
-        capture_output=True, text=True
-    )
-
-    print("Processing Output:", result.stdout)
-    print("Processing Error:", result.stderr)
-    json_data = clean_json_output(result.stderr)
+    try:
+        json_data = await extraction.extract_invoice(file_path)
+    except Exception as e:
+        print(f"❌ Extraction failed for {filename}: {e}")
+        json_data = None
 
-    if "No template" in result.stderr or not json_data:
+    if not json_data:
         # Try raw template fallback based on partial match from filename
         fallback_template = None
         filename_base = Path(filename).stem.lower()
@@ -60,57 +52,97 @@ def process_invoice(filename: str):
                 # json_data = process_with_pdftotext_fallback(filename, fallback_template)
                 print(f"filename:{filename}")
                 print(f"fallback_template:{fallback_template}")
-                json_data = process_with_pdftotext(filename, fallback_template, srcPDFS="pdfs")
+                json_data = await asyncio.to_thread(
+                    process_with_pdftotext, filename, fallback_template, srcPDFS="pdfs"
+                )
 
             except Exception as e:
                 shutil.move(file_path, UNPROCESSED_DIR / filename)
+                await asyncio.to_thread(
+                    db.save_failure, filename, f"Fallback failed: {e}", template=fallback_template
+                )
                 return {"message": f"Fallback failed: {e}", "status": "failed", "template": fallback_template}
         else:
             shutil.move(file_path, UNPROCESSED_DIR / filename)
+            await asyncio.to_thread(db.save_failure, filename, "No matching template found.")
             return {"message": f"No matching template found. Moved to unprocessed.", "status": "failed"}
 
+    template = fallback_template if 'fallback_template' in locals() else "invoice2data"
+
     # ✅ Store valid JSON
     try:
-        json_string = json.dumps(json_data, indent=2)
-        conn = sqlite3.connect(DB_PATH, isolation_level=None)
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO invoices (filename, json_data) VALUES (?, ?)", (filename, json_string))
-        conn.commit()
+        await asyncio.to_thread(db.save_invoice, filename, json_data, template=template)
     except sqlite3.OperationalError as e:
         shutil.move(file_path, UNPROCESSED_DIR / filename)
         return {"message": f"Database error: {e}. Moved to unprocessed folder.", "status": "failed"}
-    finally:
-        conn.close()
 
     return {
         "message": f"Successfully processed {filename}",
         "filename": filename,
         "status": "success",
-        "template": fallback_template if 'fallback_template' in locals() else "invoice2data"
+        "template": template
     }
 
 @router.post("/upload/")
 async def upload_pdf(file: UploadFile = File(...)):
-    """Handles PDF file upload and automatically triggers processing."""
-    file_path = UPLOAD_DIR / file.filename
+    """Handles PDF file upload and queues it for processing.
+
+    Poll `/jobs/{job_id}` for the processing result.
+    """
+    filename = uploads.sanitize_filename(file.filename or "")
+    if not filename or filename.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid file name.")
+    file_path = UPLOAD_DIR / filename
 
     with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+        await asyncio.to_thread(shutil.copyfileobj, file.file, buffer, uploads.CHUNK_SIZE)
 
-    # Process the file automatically
-    return process_invoice(file.filename)
+    # Process the file in the background
+    job = await queue.enqueue(filename)
+    return {
+        "message": f"{filename} uploaded and queued for processing",
+        "filename": filename,
+        "job_id": job["id"],
+        "status": job["status"],
+    }
+
+@router.post("/upload/batch/")
+async def upload_batch(request: Request):
+    """Handles the upload of many PDFs, or zip archives of PDFs, at once.
+
+    The multipart body is written to disk as it is received, so it is never
+    held in memory. Every PDF is queued for processing, poll `/jobs/{job_id}`
+    for the results.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data body.")
+
+    try:
+        parts = await uploads.save_multipart(content_type, request.stream(), UPLOAD_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid multipart body: {e}") from e
+    stored, skipped = await uploads.store_uploads(parts, UPLOAD_DIR)
+    if not stored:
+        raise HTTPException(status_code=400, detail="No PDF files in the upload.")
+
+    jobs = await queue.enqueue_many(stored)
+    print(f"📥 Queued {len(jobs)} uploaded files, skipped {len(skipped)}")
+    return {
+        "message": f"{len(jobs)} files uploaded and queued for processing",
+        "jobs": [
+            {"filename": job["filename"], "job_id": job["id"], "status": job["status"]}
+            for job in jobs
+        ],
+        "skipped": skipped,
+    }
 
 @router.get("/uploaded_files/")
 async def get_uploaded_files():
     """List uploaded and processed files."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     uploaded_files = {f.name for f in UPLOAD_DIR.glob("*.pdf")}
     unprocessed_files = {f.name for f in UNPROCESSED_DIR.glob("*.pdf")}
-    
-    c.execute("SELECT filename FROM invoices WHERE json_data IS NOT NULL")
-    processed_files = {row[0] for row in c.fetchall()}
-    conn.close()
+    processed_files = db.processed_filenames()
 
     files = []
     all_files = uploaded_files | unprocessed_files | processed_files  # Ensure all sources are checked
@@ -132,11 +164,7 @@ async def delete_file(filename: str):
     unprocessed_file = UNPROCESSED_DIR / filename
     
     # Remove from database
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM invoices WHERE filename = ?", (filename,))
-    conn.commit()
-    conn.close()
+    db.delete_invoice(filename)
     
     # Delete files from storage
     for f in [file_path, text_file, unprocessed_file]:
@@ -154,11 +182,7 @@ async def reset_system():
             file.unlink()
     
     # Clear database
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM invoices")
-    conn.commit()
-    conn.close()
+    db.delete_invoices()
     
     return {"message": "System reset complete."}
 
@@ -177,6 +201,6 @@ async def retry_processing(filename: str):
         print(f"✅ Moved {filename} from unprocessed to pdfs.")  # Log movement
     except Exception as e:
         print(f"❌ Failed to move {filename}: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to move file: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to move file: {e}") from e
 
-    return process_invoice(filename)
+    return await process_invoice(filename)
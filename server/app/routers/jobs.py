@@ -0,0 +1,30 @@
+"""Status of the background processing jobs."""
+
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi import HTTPException
+from fastapi import Query
+from server.app.job_queue import queue
+
+
+router = APIRouter()
+
+
+@router.get("/")
+async def list_jobs(
+    status: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)
+):
+    """List the latest processing jobs, optionally filtered by status."""
+    jobs = await asyncio.to_thread(queue.list_jobs, status=status, limit=limit)
+    return {"jobs": jobs}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Return the status of a processing job, and its result once finished."""
+    job = await asyncio.to_thread(queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
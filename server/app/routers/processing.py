@@ -1,3 +1,4 @@
+import asyncio
 import json
 import shutil
 import subprocess
@@ -8,7 +9,8 @@ from pathlib import Path
 from fastapi import APIRouter, HTTPException, Query
 from datetime import datetime
 
-from server.app.utils import clean_json_output
+from server.app import extraction
+from server.app.storage import db
 
 router = APIRouter()
 
@@ -16,7 +18,6 @@ UPLOAD_DIR = Path("data/pdfs")
 UNPROCESSED_DIR = Path("data/unprocessed")
 TEMPLATE_DIR = Path("data/templates")
 TEMPLATE_RAW_DIR = Path("data/templates_raw")
-DB_PATH = Path("data/invoices.db")
 
 REQUIRED_FIELDS = ["invoice_number", "amount", "date", "customer", "vendor"]
 
@@ -99,37 +100,31 @@ async def process_single_invoice(filename: str, pdftotext: bool = Query(False),
 
         try:
             print(template)
-            json_data = process_with_pdftotext(filename, template, srcPDFS="unprocessed")
+            json_data = await asyncio.to_thread(
+                process_with_pdftotext, filename, template, srcPDFS="unprocessed"
+            )
             print("Extracted using pdftotext:", json.dumps(json_data, indent=2))
         except Exception as e:
             return {"message": f"pdftotext processing failed: {e}", "status": "failed", "template": template}
 
     else:
-        result = subprocess.run(
-            ["invoice2data", "--template-folder", str(TEMPLATE_DIR), "--output-format", "json", str(pdf_file)],
-            capture_output=True, text=True
-        )
-
-        print("Raw invoice2data output:", result.stdout)
-        print("Error (if any):", result.stderr)
-
-        json_data = clean_json_output(result.stderr)
+        try:
+            json_data = await extraction.extract_invoice(pdf_file)
+        except Exception as e:
+            print(f"❌ Extraction failed for {filename}: {e}")
+            json_data = None
 
-        if "No template" in result.stderr or not json_data:
+        if not json_data:
             unprocessed_path = UNPROCESSED_DIR / filename
             shutil.move(pdf_file, unprocessed_path)
+            db.save_failure(filename, "No matching template found.")
             return {"message": f"Processing failed for {filename}. Moved to unprocessed folder.", "status": "failed"}
 
-    json_string = json.dumps(json_data, indent=2)
     try:
-        conn = sqlite3.connect(DB_PATH, isolation_level=None)
-        c = conn.cursor()
-        c.execute("INSERT OR REPLACE INTO invoices (filename, json_data) VALUES (?, ?)", (filename, json_string))
-        conn.commit()
+        db.save_invoice(filename, json_data, template=template if pdftotext else "invoice2data")
     except sqlite3.OperationalError as e:
         return {"message": f"Database error: {e}"}
     finally:
-        conn.close()
         processed_path = UPLOAD_DIR / filename
         if pdf_file.exists():
             shutil.move(pdf_file, processed_path)
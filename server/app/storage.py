@@ -0,0 +1,402 @@
+"""SQLite storage of the server.
+
+A single `Database` hands out connections from a small pool instead of
+opening one per request. Connections use WAL journaling, so listings and
+downloads read while uploads are written, and keep their compiled
+statements in the sqlite3 statement cache, so the fixed SQL below is only
+prepared once per connection.
+
+Besides the extracted JSON, the fields used to search and filter invoices
+(issuer, date, amount, invoice number, status and template) are stored in
+indexed columns.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+
+DB_PATH = Path("data/invoices.db")
+
+# Number of connections kept open
+POOL_SIZE = int(os.environ.get("INVOICE2DATA_DB_POOL_SIZE", "4"))
+
+# Milliseconds to wait for a lock held by another connection
+BUSY_TIMEOUT = 5000
+
+# Rows fetched at a time when iterating over the invoices
+FETCH_SIZE = 500
+
+INVOICE_COLUMNS = {
+    "issuer": "TEXT",
+    "invoice_number": "TEXT",
+    "date": "TEXT",
+    "amount": "REAL",
+    "currency": "TEXT",
+    "status": "TEXT NOT NULL DEFAULT 'processed'",
+    "template": "TEXT",
+    "message": "TEXT",
+    "json_data": "TEXT",
+    "csv_data": "TEXT",
+    "updated_at": "TEXT",
+}
+INDEXED_COLUMNS = ["issuer", "date", "amount", "invoice_number", "status", "template"]
+
+# Dates of the invoices as stored by the extraction and the raw templates
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y"]
+
+UPSERT_INVOICE = """INSERT INTO invoices
+    (filename, issuer, invoice_number, date, amount, currency, status, template, message, json_data, updated_at)
+    VALUES (:filename, :issuer, :invoice_number, :date, :amount, :currency, :status, :template, :message, :json_data, :updated_at)
+    ON CONFLICT (filename) DO UPDATE SET
+        issuer = excluded.issuer,
+        invoice_number = excluded.invoice_number,
+        date = excluded.date,
+        amount = excluded.amount,
+        currency = excluded.currency,
+        status = excluded.status,
+        template = excluded.template,
+        message = excluded.message,
+        json_data = excluded.json_data,
+        updated_at = excluded.updated_at"""
+SELECT_INVOICES = "SELECT filename, json_data FROM invoices WHERE status = 'processed' ORDER BY filename"
+SELECT_PROCESSED = "SELECT filename FROM invoices WHERE status = 'processed'"
+DELETE_INVOICE = "DELETE FROM invoices WHERE filename = ?"
+DELETE_INVOICES = "DELETE FROM invoices"
+
+
+def _iso_date(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _amount(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def invoice_row(
+    filename: str,
+    data: Optional[Dict[str, Any]],
+    status: str = "processed",
+    template: Optional[str] = None,
+    message: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Return the columns of an invoice, with the indexed fields taken from its data."""
+    if not isinstance(data, dict):
+        data = {}
+    return {
+        "filename": filename,
+        "issuer": _text(data.get("issuer")),
+        "invoice_number": _text(data.get("invoice_number")),
+        "date": _iso_date(data.get("date")),
+        "amount": _amount(data.get("amount")),
+        "currency": _text(data.get("currency")),
+        "status": status,
+        "template": template,
+        "message": message,
+        "json_data": json.dumps(data, indent=2) if data else None,
+        "updated_at": datetime.now().isoformat(),
+    }
+
+
+class Database:
+    """Pool of WAL-mode connections to the server database."""
+
+    def __init__(self, path: Path, pool_size: int = POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            timeout=BUSY_TIMEOUT / 1000,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool, opening one if none is free."""
+        if not self._initialized:
+            self.init_db()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.pool_size
+                if can_open:
+                    self._created += 1
+            conn = self._open() if can_open else self._pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection and run the statements in one transaction."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def init_db(self):
+        """Create the tables, adding the columns missing from older databases."""
+        with self._lock:
+            if self._initialized:
+                return
+            conn = self._open()
+            # One transaction, so that an interrupted migration is rolled back
+            # whole instead of leaving added columns without their values
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("""CREATE TABLE IF NOT EXISTS invoices (
+                    id INTEGER PRIMARY KEY,
+                    filename TEXT UNIQUE
+                )""")
+                existing = {
+                    row[1] for row in conn.execute("PRAGMA table_info(invoices)")
+                }
+                added = [column for column in INVOICE_COLUMNS if column not in existing]
+                for column in added:
+                    conn.execute(
+                        f"ALTER TABLE invoices ADD COLUMN {column} {INVOICE_COLUMNS[column]}"
+                    )
+                for column in INDEXED_COLUMNS:
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS invoices_{column} ON invoices ({column})"
+                    )
+                self._backfill(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def _backfill(self, conn: sqlite3.Connection):
+        # Fill the new columns of the invoices stored as a JSON blob only, by
+        # the old server. The rows saved since always have `updated_at`.
+        # It stored the error message of failed extractions as a JSON string.
+        rows = conn.execute(
+            "SELECT filename, json_data FROM invoices WHERE updated_at IS NULL"
+        ).fetchall()
+        for filename, json_data in rows:
+            try:
+                data = json.loads(json_data) if json_data else None
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) and data:
+                row = invoice_row(filename, data)
+            else:
+                message = data if isinstance(data, str) else None
+                row = invoice_row(filename, None, status="failed", message=message)
+            row["json_data"] = json_data
+            conn.execute(UPSERT_INVOICE, row)
+        if rows:
+            print(f"🔄 Indexed {len(rows)} stored invoices")
+
+    def close(self):
+        """Close the pooled connections."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._lock:
+            self._created = 0
+
+    def save_invoice(
+        self, filename: str, data: Dict[str, Any], template: Optional[str] = None
+    ):
+        """Store the extracted data of an invoice."""
+        with self.connection() as conn:
+            conn.execute(UPSERT_INVOICE, invoice_row(filename, data, template=template))
+
+    def save_failure(self, filename: str, message: str, template: Optional[str] = None):
+        """Record an invoice which could not be processed."""
+        with self.connection() as conn:
+            conn.execute(
+                UPSERT_INVOICE,
+                invoice_row(
+                    filename, None, status="failed", template=template, message=message
+                ),
+            )
+
+    def invoices(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Return the filename and data of the processed invoices."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_INVOICES).fetchall()
+        invoices = []
+        for filename, json_data in rows:
+            try:
+                data = json.loads(json_data)
+            except (TypeError, json.JSONDecodeError):
+                continue
+            if isinstance(data, dict):
+                invoices.append((filename, data))
+        return invoices
+
+    @staticmethod
+    def _filters(
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        issuer: Optional[str] = None,
+    ) -> Tuple[str, List[Any]]:
+        conditions, params = ["status = 'processed'"], []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if issuer:
+            conditions.append("issuer = ?")
+            params.append(issuer)
+        return " AND ".join(conditions), params
+
+    def snapshot(self) -> sqlite3.Connection:
+        """Open a connection reading the database in a single transaction.
+
+        `invoice_fields` and `iter_invoices` called with it see the same
+        invoices, even when others are written meanwhile. It is not one of
+        the pool, the caller closes it.
+        """
+        if not self._initialized:
+            self.init_db()
+        conn = self._open()
+        conn.execute("BEGIN")
+        return conn
+
+    def iter_invoices(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        issuer: Optional[str] = None,
+        conn: Optional[sqlite3.Connection] = None,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield the filename and data of the processed invoices, in batches from a cursor.
+
+        Dates are ISO dates, both bounds included. Unless `conn`, e.g. a
+        `snapshot`, is given, the rows are read with a connection of their
+        own, not one of the pool, as the iteration lasts as long as the
+        client downloading them.
+        """
+        where, params = self._filters(date_from, date_to, issuer)
+        own_conn = conn is None
+        if conn is None:
+            if not self._initialized:
+                self.init_db()
+            conn = self._open()
+        try:
+            cursor = conn.execute(
+                # `where` only holds the constant conditions of _filters
+                f"SELECT filename, json_data FROM invoices WHERE {where} ORDER BY filename",  # noqa: S608
+                params,
+            )
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for filename, json_data in rows:
+                    try:
+                        data = json.loads(json_data)
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+                    if isinstance(data, dict):
+                        yield filename, data
+        finally:
+            if own_conn:
+                conn.close()
+
+    def invoice_fields(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        issuer: Optional[str] = None,
+        conn: Optional[sqlite3.Connection] = None,
+    ) -> List[str]:
+        """Return the sorted names of the fields found in the processed invoices.
+
+        Read with `conn` if given, else with a connection of the pool.
+        """
+        where, params = self._filters(date_from, date_to, issuer)
+        with nullcontext(conn) if conn is not None else self.connection() as reader:
+            rows = reader.execute(
+                # `where` only holds the constant conditions of _filters
+                "SELECT DISTINCT field.key FROM invoices, json_each(invoices.json_data) AS field "  # noqa: S608
+                "WHERE CASE WHEN json_valid(invoices.json_data) THEN json_type(invoices.json_data) END = 'object' "
+                f"AND {where} ORDER BY field.key",
+                params,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def processed_filenames(self) -> Set[str]:
+        """Return the filenames of the processed invoices."""
+        with self.connection() as conn:
+            return {row[0] for row in conn.execute(SELECT_PROCESSED)}
+
+    def delete_invoice(self, filename: str):
+        """Delete the record of an invoice."""
+        with self.connection() as conn:
+            conn.execute(DELETE_INVOICE, (filename,))
+
+    def delete_invoices(self):
+        """Delete the records of all the invoices."""
+        with self.connection() as conn:
+            conn.execute(DELETE_INVOICES)
+
+
+db = Database(DB_PATH)
@@ -0,0 +1,231 @@
+"""Streaming storage of uploaded files.
+
+`save_multipart` parses a multipart/form-data request body as it arrives
+and writes every file part straight to disk, chunk by chunk, so large
+batches of invoices are never held in memory. Zip archives are unpacked
+member by member afterwards, up to INVOICE2DATA_MAX_UNZIPPED_SIZE bytes
+(1 GiB by default) per archive.
+
+Files with the same name in an upload, e.g. `a/inv.pdf` and `b/inv.pdf` in
+an archive, are stored as `inv.pdf` and `inv-2.pdf`.
+"""
+
+import asyncio
+import os
+import uuid
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+
+try:
+    from python_multipart.multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser
+    from multipart.multipart import parse_options_header
+
+CHUNK_SIZE = 1024 * 1024
+
+# Maximum number of bytes unpacked from a zip archive
+MAX_UNZIPPED_SIZE = int(os.environ.get("INVOICE2DATA_MAX_UNZIPPED_SIZE", str(1024**3)))
+
+
+def sanitize_filename(filename: str) -> str:
+    """Keep the base name of an uploaded file, without spaces."""
+    return Path(filename.replace("\\", "/")).name.replace(" ", "_")
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """Return the name, with a number added if it is already used."""
+    path = Path(name)
+    number = 1
+    while name in used:
+        number += 1
+        name = f"{path.stem}-{number}{path.suffix}"
+    used.add(name)
+    return name
+
+
+class _PartWriter:
+    """Callbacks of the multipart parser, writing file parts to a folder."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self.saved: List[Tuple[str, Path]] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._filename: Optional[str] = None
+        self._tmp_path: Optional[Path] = None
+        self._file = None
+
+    def on_part_begin(self):
+        self._filename = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            _disposition, options = parse_options_header(self._header_value)
+            filename = options.get(b"filename")
+            if filename:
+                self._filename = filename.decode("utf-8", "replace")
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        if self._filename:
+            # Written under a temporary name until the part is complete. The
+            # file stays open across the parser callbacks, it is closed by
+            # on_part_end, or by close() once the body is parsed.
+            self._tmp_path = self.folder / f".{uuid.uuid4().hex}.part"
+            self._file = open(self._tmp_path, "wb")  # noqa: SIM115
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._file is not None:
+            self._file.write(data[start:end])
+
+    def on_part_end(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self.saved.append((self._filename, self._tmp_path))
+        self._tmp_path = None
+
+    def close(self):
+        """Close and remove the file of a part which did not complete."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._tmp_path.unlink(missing_ok=True)
+            self._tmp_path = None
+
+    def abort(self):
+        self.close()
+        for _name, path in self.saved:
+            if path.exists():
+                path.unlink()
+
+
+async def save_multipart(
+    content_type: str, stream: AsyncIterator[bytes], folder: Path
+) -> List[Tuple[str, Path]]:
+    """Write the files of a multipart body to temporary files in a folder.
+
+    Returns the uploaded filename and temporary path of every file part.
+    """
+    _content_type, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("Missing multipart boundary.")
+
+    writer = _PartWriter(folder)
+    callbacks = {
+        name: getattr(writer, name)
+        for name in [
+            "on_part_begin",
+            "on_header_field",
+            "on_header_value",
+            "on_header_end",
+            "on_headers_finished",
+            "on_part_data",
+            "on_part_end",
+        ]
+    }
+    parser = MultipartParser(boundary, callbacks)
+    try:
+        async for chunk in stream:
+            # The callbacks write the file parts, off the event loop
+            await asyncio.to_thread(parser.write, chunk)
+        await asyncio.to_thread(parser.finalize)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        writer.close()
+    return writer.saved
+
+
+def _copy_member(src, dst, limit: int) -> int:
+    """Copy an archive member, stopping once more than `limit` bytes are read."""
+    size = 0
+    while size <= limit:
+        chunk = src.read(min(CHUNK_SIZE, limit - size + 1))
+        if not chunk:
+            break
+        dst.write(chunk)
+        size += len(chunk)
+    return size
+
+
+def _extract_zip(
+    archive: Path, folder: Path, suffix: str, used: Set[str]
+) -> Tuple[List[str], List[str]]:
+    stored, skipped = [], []
+    # The sizes in the archive may be forged, the bytes unpacked are counted
+    remaining = MAX_UNZIPPED_SIZE
+    with zipfile.ZipFile(archive) as zf:
+        for member in zf.infolist():
+            if member.is_dir():
+                continue
+            filename = sanitize_filename(member.filename)
+            if not filename.lower().endswith(suffix) or filename.startswith("."):
+                skipped.append(member.filename)
+                continue
+            if member.file_size > remaining:
+                skipped.append(member.filename)
+                continue
+            tmp_path = folder / f".{uuid.uuid4().hex}.part"
+            with zf.open(member) as src, open(tmp_path, "wb") as dst:
+                size = _copy_member(src, dst, remaining)
+            if size > remaining:
+                tmp_path.unlink()
+                skipped.append(member.filename)
+                continue
+            remaining -= size
+            filename = _unique_name(filename, used)
+            tmp_path.replace(folder / filename)
+            stored.append(filename)
+    return stored, skipped
+
+
+async def store_uploads(
+    parts: List[Tuple[str, Path]], folder: Path, suffix: str = ".pdf"
+) -> Tuple[List[str], List[str]]:
+    """Move uploaded files to their final name, unpacking zip archives.
+
+    Only files with the suffix are kept. Returns the stored filenames and
+    the names of the skipped files.
+    """
+    stored, skipped = [], []
+    used: Set[str] = set()
+    for filename, tmp_path in parts:
+        name = sanitize_filename(filename)
+        if name.lower().endswith(".zip"):
+            try:
+                zip_stored, zip_skipped = await asyncio.to_thread(
+                    _extract_zip, tmp_path, folder, suffix, used
+                )
+            except zipfile.BadZipFile:
+                zip_stored, zip_skipped = [], [filename]
+            finally:
+                tmp_path.unlink()
+            stored += zip_stored
+            skipped += zip_skipped
+        elif name.lower().endswith(suffix) and not name.startswith("."):
+            name = _unique_name(name, used)
+            tmp_path.replace(folder / name)
+            stored.append(name)
+        else:
+            tmp_path.unlink()
+            skipped.append(filename)
+    return stored, skipped
@@ -39,6 +39,11 @@ async function uploadFile(file) {
         });
 
         let result = await response.json();
+        if (result.job_id) {
+            // ✅ Processing runs in the background, wait for the job to finish
+            let job = await waitForJob(result.job_id);
+            result = job.result || { message: `Processing ${job.status}`, status: job.status };
+        }
         alert(result.message);
 
         let row = document.createElement("tr");
@@ -62,6 +67,17 @@ async function uploadFile(file) {
 
 
 
+async function waitForJob(jobId, interval = 1000) {
+    while (true) {
+        let response = await fetch(`/jobs/${jobId}`);
+        let job = await response.json();
+        if (job.status !== "queued" && job.status !== "running") {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 async function loadUnprocessedFiles() {
     try {
         let response = await fetch("/files/uploaded_files/");
@@ -2,14 +2,19 @@
 """Command-line interface."""
 
 import datetime
+import json
 import logging
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from copy import deepcopy
+from itertools import repeat
 from os.path import join
 from typing import Any
 from typing import ClassVar
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
@@ -17,7 +22,11 @@ from typing import Tuple
 import click
 
 from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.extract.loader import build_template_cache
 from invoice2data.extract.loader import read_templates
+from invoice2data.extract.template_index import TemplateIndex
+from invoice2data.extract.timings import Timings
+from invoice2data.extract.timings import measure
 
 from .input import gvision
 from .input import ocrmypdf
@@ -26,8 +35,10 @@ from .input import pdfplumber
 from .input import pdftotext
 from .input import tesseract
 from .input import text
+from .input.text_cache import TextCache
 from .output import to_csv
 from .output import to_json
+from .output import to_ndjson
 from .output import to_xml
 
 
@@ -46,6 +57,7 @@ input_mapping = {
 output_mapping = {
     "csv": to_csv,
     "json": to_json,
+    "ndjson": to_ndjson,
     "xml": to_xml,
     "none": None,
 }
@@ -112,6 +124,8 @@ def extract_data(
     invoicefile: str,
     templates: Optional[List[InvoiceTemplate]] = None,
     input_module: Any = None,
+    text_cache: Optional[TextCache] = None,
+    timings: Optional[Timings] = None,
 ) -> Dict[str, Any]:
     """Extracts structured data from PDF/image invoices.
 
@@ -128,6 +142,10 @@ def extract_data(
         input_module (Any, optional): Library to be used to extract text
                                         from the given `invoicefile`.
                                         Choices: {'pdftotext', 'pdfminer', 'tesseract', 'text'}.
+        text_cache (Optional[TextCache]): Cache of previously extracted texts.
+                                          If None, the text is always extracted.
+        timings (Optional[Timings]): Records the wall time of each stage of the
+                                     extraction when set. See `invoice2data.extract.timings`.
 
     Returns:
         Dict[str, Any]: Extracted and matched fields, or False if no template matches.
@@ -152,7 +170,11 @@ def extract_data(
     elif input_module is None:
         input_module = text if invoicefile.lower().endswith(".txt") else pdftotext
 
-    extracted_str = input_module.to_text(invoicefile)
+    with measure(timings, "to_text", input_module=input_module.__name__):
+        if text_cache is not None:
+            extracted_str = text_cache.to_text(input_module, invoicefile)
+        else:
+            extracted_str = input_module.to_text(invoicefile)
     if not isinstance(extracted_str, str) or not extracted_str.strip():
         logger.error(
             "Failed to extract text from %s using %s",
@@ -167,42 +189,74 @@ def extract_data(
     logger.debug("END pdftotext result =============================")
 
     templates = templates or read_templates()
+    template_index = get_template_index(templates)
 
-    for template in templates:
-        if template.matches_input(extracted_str):
-            logger.info("Using %s template", template["template_name"])
+    with measure(timings, "match_templates"):
+        templates_matched = template_index.match(extracted_str)
+    if templates_matched:
+        template = templates_matched[0]
+        logger.info("Using %s template", template["template_name"])
+        with measure(timings, "prepare_input", template=template["template_name"]):
             optimized_str = template.prepare_input(extracted_str)
-            return template.extract(
-                optimized_str, invoicefile, input_module
-            )  # Return directly if match found
+        return template.extract(
+            optimized_str, invoicefile, input_module, timings
+        )  # Return directly if match found
 
     # If no template matches, try OCR fallback
     if ocrmypdf.ocrmypdf_available() and input_module is not ocrmypdf:
         logger.debug("Text extraction failed, falling back to ocrmypdf")
-        extracted_str, invoicefile, templates_matched = extract_data_fallback_ocrmypdf(
-            invoicefile, templates, input_module
-        )
+        with measure(timings, "ocrmypdf_fallback"):
+            extracted_str, invoicefile, templates_matched = (
+                extract_data_fallback_ocrmypdf(
+                    invoicefile, templates, input_module, text_cache
+                )
+            )
         if templates_matched:
             template = templates_matched[0]
-            return template.extract(extracted_str, invoicefile, input_module)
+            return template.extract(extracted_str, invoicefile, input_module, timings)
 
     logger.error("No template for %s", invoicefile)
     return {}
 
 
+_template_index_cache: Dict[Tuple[int, ...], TemplateIndex] = {}
+
+
+def get_template_index(templates: List[InvoiceTemplate]) -> TemplateIndex:
+    """Return the keyword index for a list of templates.
+
+    The index is built once and reused as long as the same templates are
+    passed in, which is the case when processing a batch of files.
+
+    Args:
+        templates (List[InvoiceTemplate]): The templates to select from.
+
+    Returns:
+        TemplateIndex: The index over the given templates.
+    """
+    key = tuple(map(id, templates))
+    template_index = _template_index_cache.get(key)
+    if template_index is None:
+        # Only keep the latest index, it holds references to its templates
+        _template_index_cache.clear()
+        template_index = TemplateIndex(templates)
+        _template_index_cache[key] = template_index
+    return template_index
+
+
 def extract_data_fallback_ocrmypdf(
     invoicefile: str,
     templates: List[InvoiceTemplate],
     input_module: Any,
+    text_cache: Optional[TextCache] = None,
 ) -> Tuple[str, str, List[InvoiceTemplate]]:
     logger.debug("Trying OCR extraction with ocrmypdf")
-    extracted_str = ocrmypdf.to_text(invoicefile)
+    if text_cache is not None:
+        extracted_str = text_cache.to_text(ocrmypdf, invoicefile)
+    else:
+        extracted_str = ocrmypdf.to_text(invoicefile)
 
-    # Convert the filter object to a list
-    templates_matched: List[InvoiceTemplate] = list(
-        filter(lambda t: t.matches_input(extracted_str), templates)
-    )
-    templates_matched.sort(key=lambda k: k["priority"], reverse=True)
+    templates_matched = get_template_index(templates).match(extracted_str)
 
     if templates_matched:
         return extracted_str, invoicefile, templates_matched
@@ -261,13 +315,53 @@ def extract_data_fallback_ocrmypdf(
     is_flag=True,
     help="Ignore built-in templates.",
 )
+@click.option(
+    "--template-cache",
+    type=click.Path(file_okay=False),
+    envvar="INVOICE2DATA_TEMPLATE_CACHE",
+    help="Folder where parsed templates are cached to speed up start-up. "
+    "Can also be set with the INVOICE2DATA_TEMPLATE_CACHE environment variable.",
+)
+@click.option(
+    "--build-template-cache",
+    is_flag=True,
+    help="Rebuild the template cache before processing. Requires --template-cache.",
+)
+@click.option(
+    "--text-cache",
+    type=click.Path(file_okay=False),
+    envvar="INVOICE2DATA_TEXT_CACHE",
+    help="Folder where extracted texts are cached, so the same file is not read "
+    "or OCRed again. Can also be set with the INVOICE2DATA_TEXT_CACHE environment "
+    "variable.",
+)
+@click.option(
+    "--text-cache-size",
+    type=click.IntRange(min=1),
+    default=256,
+    help="Maximum size of the text cache in MiB. Default: 256",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=0),
+    default=1,
+    help="Number of files to process in parallel. 0 uses all CPUs. Default: 1",
+)
+@click.option(
+    "--timings",
+    "timings_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the time spent in each stage of the extraction of every file "
+    "to this JSON file.",
+)
 @click.argument(
     "input_files",
     type=click.File("wb"),
     nargs=-1,
 )
 @click.version_option()
-def main(
+def main(  # noqa: C901
     input_reader: Optional[str],
     output_format: str,
     output_date_format: str,
@@ -278,6 +372,12 @@ def main(
     filename_format: str,
     template_folder: Optional[str],
     exclude_built_in_templates: bool,
+    template_cache: Optional[str],
+    build_template_cache: bool,
+    text_cache: Optional[str],
+    text_cache_size: int,
+    jobs: int,
+    timings_file: Optional[str],
     input_files: Tuple[Any, ...],
 ) -> None:
     """Extract data from PDF files and output it in a structured format."""
@@ -289,43 +389,194 @@ def main(
     input_module = input_reader
     output_module = output_mapping[output_format]
 
-    templates = _load_templates(template_folder, exclude_built_in_templates)
-
-    output = []
-    for f in input_files:
-        try:
-            res = extract_data(f.name, templates=templates, input_module=input_module)
-            if res:
-                logger.info(res)
-                output.append(res)
-
-                if copy or move:
-                    _process_and_move_copy(
-                        f.name, res, copy, move, filename_format
-                    )  # Extract file processing and copy/move
-        except Exception as e:
-            logger.critical(
-                "Invoice2data failed to process %s. \nError message: %s", f.name, e
-            )
-        finally:
+    if build_template_cache:
+        if not template_cache:
+            raise click.UsageError("--build-template-cache requires --template-cache")
+        _build_template_cache(
+            template_folder, exclude_built_in_templates, template_cache
+        )
+        if not input_files:
+            return
+
+    templates = _load_templates(
+        template_folder, exclude_built_in_templates, template_cache
+    )
+
+    filenames = [f.name for f in input_files]
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    cache = TextCache(text_cache, text_cache_size * 1024 * 1024) if text_cache else None
+
+    # Invoices are written as soon as they are extracted
+    writer = (
+        output_module.open_writer(output_name, output_date_format)
+        if output_module is not None
+        else None
+    )
+    timings_output = []
+    results = _extract_files(
+        filenames, templates, input_module, cache, jobs, bool(timings_file)
+    )
+    processed = 0
+    try:
+        for f, (res, error, timings) in zip(input_files, results):
+            processed += 1
+            if timings is not None:
+                timings_output.append({"file": f.name, "stages": timings.to_list()})
+            try:
+                if error is not None:
+                    raise error
+                if res:
+                    logger.info(res)
+                    if writer is not None:
+                        writer.write_one(res)
+
+                    if copy or move:
+                        _process_and_move_copy(
+                            f.name, res, copy, move, filename_format
+                        )  # Extract file processing and copy/move
+            except Exception as e:
+                logger.critical(
+                    "Invoice2data failed to process %s. \nError message: %s",
+                    f.name,
+                    e,
+                )
+            finally:
+                f.close()
+    except BrokenProcessPool as e:
+        # A worker died, e.g. killed for using too much memory, the pool
+        # can't extract the remaining files. Those extracted are kept.
+        remaining = input_files[processed:]
+        logger.critical(
+            "Invoice2data failed to process %s files, a worker process "
+            "crashed: %s\nFiles not processed: %s",
+            len(remaining),
+            e,
+            ", ".join(f.name for f in remaining),
+        )
+        for f in remaining:
             f.close()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if timings_file:
+        with open(timings_file, "w", encoding="utf-8") as f:
+            json.dump(timings_output, f, indent=2)
+
+
+def _extract_files(
+    filenames: List[str],
+    templates: List[InvoiceTemplate],
+    input_module: Optional[str],
+    text_cache: Optional[TextCache],
+    jobs: int,
+    collect_timings: bool = False,
+) -> Iterator[Tuple[Dict[str, Any], Optional[Exception], Optional[Timings]]]:
+    """Extract data from files, in a process pool if more than one job is set.
+
+    Results are yielded in the order of `filenames`, as soon as they are
+    available.
+    """
+    if jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield _extract_file(
+                filename, templates, input_module, text_cache, collect_timings
+            )
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(filenames)),
+        initializer=_init_worker,
+        initargs=(templates, logger.level),
+    ) as executor:
+        yield from executor.map(
+            _extract_file_in_worker,
+            filenames,
+            repeat(input_module),
+            repeat(text_cache),
+            repeat(collect_timings),
+        )
+
+
+def _extract_file(
+    filename: str,
+    templates: List[InvoiceTemplate],
+    input_module: Optional[str],
+    text_cache: Optional[TextCache],
+    collect_timings: bool = False,
+) -> Tuple[Dict[str, Any], Optional[Exception], Optional[Timings]]:
+    """Extract data from a file, returning the error instead of raising it."""
+    timings = Timings() if collect_timings else None
+    try:
+        res = extract_data(
+            filename,
+            templates=templates,
+            input_module=input_module,
+            text_cache=text_cache,
+            timings=timings,
+        )
+    except Exception as e:
+        return {}, e, timings
+    return res, None, timings
+
 
-    if output_module is not None:
-        output_module.write_to_file(output, output_name, output_date_format)
+# Templates of a worker process, set once by `_init_worker`
+_worker_templates: List[InvoiceTemplate] = []
+
+
+def _init_worker(templates: List[InvoiceTemplate], log_level: int) -> None:
+    """Receive the templates loaded by the main process."""
+    global _worker_templates
+    _worker_templates = templates
+    logger.setLevel(log_level)
+
+
+def _extract_file_in_worker(
+    filename: str,
+    input_module: Optional[str],
+    text_cache: Optional[TextCache],
+    collect_timings: bool,
+) -> Tuple[Dict[str, Any], Optional[Exception], Optional[Timings]]:
+    """Extract data from a file with the templates of the worker process."""
+    return _extract_file(
+        filename, _worker_templates, input_module, text_cache, collect_timings
+    )
 
 
 def _load_templates(
-    template_folder: Optional[str], exclude_built_in_templates: bool
+    template_folder: Optional[str],
+    exclude_built_in_templates: bool,
+    template_cache: Optional[str] = None,
 ) -> List[Any]:
     """Load templates from the specified folder."""
     templates = []
     if template_folder:
-        templates.extend(read_templates(os.path.abspath(template_folder)))
+        templates.extend(
+            read_templates(os.path.abspath(template_folder), cache_dir=template_cache)
+        )
     if not exclude_built_in_templates:
-        templates.extend(read_templates())
+        templates.extend(read_templates(cache_dir=template_cache))
     return templates
 
 
+def _build_template_cache(
+    template_folder: Optional[str],
+    exclude_built_in_templates: bool,
+    template_cache: str,
+) -> None:
+    """Rebuild the template cache of the folders used for processing."""
+    if template_folder:
+        cache_file = build_template_cache(
+            os.path.abspath(template_folder), cache_dir=template_cache
+        )
+        logger.info("Template cache written to %s", cache_file)
+    if not exclude_built_in_templates:
+        cache_file = build_template_cache(cache_dir=template_cache)
+        logger.info("Template cache written to %s", cache_file)
+
+
 def _process_and_move_copy(
     filename: str,
     res: Dict[str, Any],
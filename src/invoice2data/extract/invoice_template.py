@@ -5,22 +5,34 @@ Templates are initially read from .yml files and then kept as class.
 
 import re
 import unicodedata
+from datetime import datetime
+from functools import lru_cache
 from logging import getLogger
 from pprint import pformat
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
 from typing import OrderedDict as OrderedDictType
+from typing import Pattern
+from typing import Sequence
+from typing import Tuple
 
-import dateparser  # type: ignore[import-untyped]
+from dateparser.date import DateDataParser  # type: ignore[import-untyped]
 
+from ..input import layout
 from ..input import ocrmypdf
 
 # Area extraction is currently added for pdftotext, ocrmypdf and tesseract (which uses pdftotext)
 from ..input import pdftotext
 from ..input import tesseract
+from ..input.layout import Page
 from . import parsers
 from .plugins import lines
 from .plugins import tables
+from .timings import Timings
+from .timings import measure
 
 
 logger = getLogger(__name__)
@@ -32,6 +44,7 @@ OPTIONS_DEFAULT = {
     "currency": "EUR",
     "date_formats": [],
     "languages": [],
+    "ocr_languages": [],  # tesseract languages, e.g. ["eng", "deu"]
     "decimal_separator": ".",
     "replace": [],  # example: see templates/fr/fr.free.mobile.yml
 }
@@ -44,6 +57,28 @@ PARSERS_MAPPING = {
 
 PLUGIN_MAPPING = {"lines": lines, "tables": tables}
 
+# Settings of the lines parser and the tables plugin holding regexes
+LINES_PATTERN_KEYS = (
+    "start",
+    "end",
+    "line",
+    "first_line",
+    "last_line",
+    "skip_line",
+    "line_separator",
+)
+TABLES_PATTERN_KEYS = ("start", "end", "body", "line_separator")
+
+# strptime directives for the day, month and year of a date format
+STRPTIME_DATE_PARTS = (("%d", "%j"), ("%m", "%b", "%B", "%j"), ("%Y", "%y"))
+# Number of parsed dates kept in memory
+DATE_CACHE_SIZE = 4096
+
+WHITESPACE_RE = re.compile(" +")
+# Spaces and apostrophes used as thousands separators
+NUMBER_SPACES_RE = re.compile(r"[\s']")
+ACCENTS_RE = re.compile("[\u0300-\u0362]")
+
 
 class InvoiceTemplate(OrderedDictType[str, Any]):
     """Represents single template files that live as .yml files on the disk.
@@ -60,11 +95,13 @@ class InvoiceTemplate(OrderedDictType[str, Any]):
           Parse date and return the date after parsing.
       coerce_type(value, target_type)
           Change the type of values.
+      compile_regex(pattern)
+          Return the compiled version of a regex used by the template.
       extract(optimized_str)
           Given a template file and a string, extract matching data fields.
     """
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
+    def __init__(self, *args: Any, compile_regexes: bool = True, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
 
         # Merge template-specific options with defaults
@@ -89,34 +126,95 @@ class InvoiceTemplate(OrderedDictType[str, Any]):
         if "issuer" not in self.keys():
             self["issuer"] = self["keywords"][0]
 
+        if not isinstance(self.options.get("replace", []), list):
+            self.options["replace"] = [self.options["replace"]]
+
+        # Compile all regexes once, so errors show up when loading the template.
+        # Templates known to be valid may skip this and compile on first use.
+        self._regex_cache: Dict[str, Pattern[str]] = {}
+        if compile_regexes:
+            for location, pattern in self._iter_patterns():
+                try:
+                    self.compile_regex(pattern)
+                except re.error as error:
+                    raise ValueError(
+                        "Error in Template %s invalid regex %r in %s: %s"
+                        % (self.get("template_name"), pattern, location, error)
+                    ) from error
+
+    def __reduce__(self) -> Any:
+        """Pickle as the template items, e.g. to hand templates to workers.
+
+        The template was validated when it was created, so unpickling does
+        not compile its regexes again.
+        """
+        return (_restore_template, (dict(self),))
+
+    def _iter_patterns(self) -> Iterator[Tuple[str, str]]:  # noqa: C901
+        """Yield all regexes used by the template with their location."""
+        for i, replace in enumerate(self.options["replace"]):
+            if isinstance(replace, (list, tuple)) and replace:
+                yield from _patterns_of(f"options.replace[{i}]", replace[0])
+
+        fields = self.get("fields") or {}
+        for k, v in fields.items():
+            if isinstance(v, dict):
+                if v.get("parser") == "regex":
+                    yield from _patterns_of(f"fields.{k}.regex", v.get("regex"))
+                elif v.get("parser") == "lines":
+                    yield from _lines_patterns(f"fields.{k}", v)
+            elif not k.startswith("static_"):
+                yield from _patterns_of(f"fields.{k}", v)
+
+        if isinstance(self.get("lines"), dict):
+            yield from _lines_patterns("lines", self["lines"])
+
+        for i, table in enumerate(self.get("tables") or []):
+            for key in TABLES_PATTERN_KEYS:
+                yield from _patterns_of(f"tables[{i}].{key}", table.get(key))
+
+    def compile_regex(self, pattern: str) -> Pattern[str]:
+        """Return the compiled regex, compiling it on first use.
+
+        Args:
+            pattern (str): The regex as written in the template.
+
+        Returns:
+            Pattern[str]: The compiled regex.
+        """
+        try:
+            return self._regex_cache[pattern]
+        except KeyError:
+            compiled = self._regex_cache[pattern] = re.compile(pattern)
+            return compiled
+
     def prepare_input(self, extracted_str: str) -> str:
         """Input raw string and do transformations, as set in template file."""
         # Remove whitespace
         if self.options["remove_whitespace"]:
-            optimized_str = re.sub(" +", "", extracted_str)
+            optimized_str = WHITESPACE_RE.sub("", extracted_str)
         else:
             optimized_str = extracted_str
 
         # Remove accents
         if self.options["remove_accents"]:
-            optimized_str = re.sub(
-                "[\u0300-\u0362]", "", unicodedata.normalize("NFKD", optimized_str)
+            optimized_str = ACCENTS_RE.sub(
+                "", unicodedata.normalize("NFKD", optimized_str)
             )
 
         # Convert to lower case
         if self.options["lowercase"]:
             optimized_str = optimized_str.lower()
 
-        if not isinstance(self.options.get("replace", []), list):
-            self.options["replace"] = [self.options["replace"]]
-
         # Specific replace
         for replace in self.options.get("replace", []):
             assert len(replace) == 2, (
                 "Error in Template %s A replace should be a list of exactly 2 elements."
                 % self["template_name"]
             )
-            optimized_str = re.sub(replace[0], replace[1], optimized_str)
+            optimized_str = self.compile_regex(replace[0]).sub(
+                replace[1], optimized_str
+            )
 
         return optimized_str
 
@@ -169,41 +267,77 @@ class InvoiceTemplate(OrderedDictType[str, Any]):
         Returns:
             float: The parsed numerical value.
         """
-        assert isinstance(value, str)
-        # Early exit if no thousands separator or custom decimal separator is present
-        if not any(char in value for char in r",.'\s"):
-            return float(value)
-
-        # Ensure decimal_separator is a string before calling count()
-        assert isinstance(self.options["decimal_separator"], str)
-        assert value.count(self.options["decimal_separator"]) < 2, (
-            f"Error in Template {self['template_name']}: "
-            "Decimal separator cannot be present several times"
-        )
+        return self.parse_numbers([value])[0]
+
+    def parse_numbers(self, values: Sequence[str]) -> List[float]:
+        """Parses the numbers of a column, like `parse_number` for each value.
+
+        The separators are looked up once for all the values.
 
+        Args:
+            values (Sequence[str]): The strings containing the numbers.
+
+        Returns:
+            List[float]: The parsed numerical values.
+        """
+        decimal_separator = self.options["decimal_separator"]
         # Determine the thousands separator based on the decimal separator
-        thousands_separator = "," if self.options["decimal_separator"] == "." else "."
+        thousands_separator = "," if decimal_separator == "." else "."
+        numbers = []
+        for value in values:
+            assert isinstance(value, str)
+            # Early exit if no thousands separator or custom decimal separator is present
+            if not any(char in value for char in r",.'\s"):
+                numbers.append(float(value))
+                continue
+
+            # Ensure decimal_separator is a string before calling count()
+            assert isinstance(decimal_separator, str)
+            assert value.count(decimal_separator) < 2, (
+                f"Error in Template {self['template_name']}: "
+                "Decimal separator cannot be present several times"
+            )
 
-        # Remove all possible thousands separators
-        amount_no_thousand_sep = re.sub(
-            r"[\s']", "", value.replace(thousands_separator, "")
-        )
+            # Remove all possible thousands separators
+            amount_no_thousand_sep = NUMBER_SPACES_RE.sub(
+                "", value.replace(thousands_separator, "")
+            )
 
-        # Replace the decimal separator with a dot
-        return float(
-            amount_no_thousand_sep.replace(str(self.options["decimal_separator"]), ".")
-        )
+            # Replace the decimal separator with a dot
+            numbers.append(
+                float(amount_no_thousand_sep.replace(decimal_separator, "."))
+            )
+        return numbers
 
     def parse_date(self, value: str) -> Any:
-        """Parses date and returns date after parsing."""
-        res = dateparser.parse(
+        """Parses date and returns date after parsing.
+
+        The template's `date_formats` are tried with `strptime` first,
+        dateparser is only used when none of them matches. Results are
+        memoized, so dates repeated in lines and tables are parsed once.
+        """
+        res = _parse_date(
             value,
-            date_formats=self.options["date_formats"],
-            languages=self.options["languages"],
+            _as_tuple(self.options["languages"]),
+            _as_tuple(self.options["date_formats"]),
         )
         logger.debug("result of date parsing=%s", res)
         return res
 
+    def parse_dates(self, values: Sequence[str]) -> List[Any]:
+        """Parses the dates of a column, like `parse_date` for each value.
+
+        Repeated values are only parsed once.
+
+        Args:
+            values (Sequence[str]): The strings containing the dates.
+
+        Returns:
+            List[Any]: The parsed dates, None for the values that failed.
+        """
+        dates = {value: self.parse_date(value) for value in dict.fromkeys(values)}
+        return [dates[value] for value in values]
+
     def coerce_type(self, value: str, target_type: str) -> Any:
         """Coerces a value to the specified target type.
 
@@ -214,26 +348,37 @@ class InvoiceTemplate(OrderedDictType[str, Any]):
 
         Returns:
             Any: The coerced value.
+        """
+        return self.coerce_column([value], target_type)[0]
+
+    def coerce_column(self, values: Sequence[str], target_type: str) -> List[Any]:
+        """Coerces the values of a column, like `coerce_type` for each value.
+
+        Args:
+            values (Sequence[str]): The values to be coerced.
+            target_type (str): The target type to which the values should be
+                coerced. Valid values: 'int', 'float', 'date'.
+
+        Returns:
+            List[Any]: The coerced values.
 
         Raises:
             AssertionError: If the target_type is unknown.
         """
-        if target_type == "int":
-            if not value:
-                return 0
-            return int(self.parse_number(value))
-        elif target_type == "float":
-            if not value:
-                return 0.0
-            return float(self.parse_number(value))
-        elif target_type == "date":
-            return self.parse_date(value)
-        elif target_type == "datetime":
-            return self.parse_date(value)
+        if target_type in ("int", "float"):
+            convert = int if target_type == "int" else float
+            numbers = iter(self.parse_numbers([value for value in values if value]))
+            return [convert(next(numbers)) if value else convert(0) for value in values]
+        elif target_type in ("date", "datetime"):
+            return self.parse_dates(values)
         raise AssertionError("Unknown type")
 
     def extract(
-        self, optimized_str: str, invoice_file: str, input_module: Any
+        self,
+        optimized_str: str,
+        invoice_file: str,
+        input_module: Any,
+        timings: Optional[Timings] = None,
     ) -> Dict[str, Any]:
         """Extracts data from the optimized string using the template.
 
@@ -241,37 +386,130 @@ class InvoiceTemplate(OrderedDictType[str, Any]):
             optimized_str (str): The optimized string.
             invoice_file (str): The path to the invoice file.
             input_module (Any): The input module used.
+            timings (Optional[Timings]): Records the time spent in each
+                area, field parser and plugin when set.
 
         Returns:
             Dict[str, Any]: The extracted data.
 
         """
         output = _initialize_output_and_log(self, optimized_str)
+        # Layout of the document, extracted once for all fields with an area
+        layouts: Dict[str, List[Page]] = {}
+        template_name = self.get("template_name")
 
         for k, v in self["fields"].items():
             if isinstance(v, dict):
                 optimized_str_for_parser = _handle_area(
-                    self, v, input_module, invoice_file, optimized_str
+                    self,
+                    k,
+                    v,
+                    input_module,
+                    invoice_file,
+                    optimized_str,
+                    layouts,
+                    timings,
                 )
 
                 if "parser" in v:
-                    _handle_parser(self, k, v, optimized_str_for_parser, output)
+                    with measure(
+                        timings,
+                        "parse_field",
+                        template=template_name,
+                        field=k,
+                        parser=v["parser"],
+                    ):
+                        _handle_parser(self, k, v, optimized_str_for_parser, output)
 
             elif k.startswith("static_"):
                 logger.debug("field=%s | static value=%s", k, v)
                 output[k.replace("static_", "")] = v
 
             else:
-                _handle_legacy_syntax(self, k, v, optimized_str, output)
+                with measure(
+                    timings,
+                    "parse_field",
+                    template=template_name,
+                    field=k,
+                    parser="legacy",
+                ):
+                    _handle_legacy_syntax(self, k, v, optimized_str, output)
         output["currency"] = self.options["currency"]
 
         # Run plugins:
         for plugin_keyword, plugin_func in PLUGIN_MAPPING.items():
             if plugin_keyword in self.keys():
-                plugin_func.extract(self, optimized_str, output)
+                with measure(
+                    timings, "plugin", template=template_name, plugin=plugin_keyword
+                ):
+                    plugin_func.extract(self, optimized_str, output)
         return _check_required_fields(self, output)
 
 
+def _as_tuple(value: Any) -> Tuple[str, ...]:
+    """Return a list option as a hashable tuple."""
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value or ())
+
+
+@lru_cache(maxsize=None)
+def _date_data_parser(languages: Tuple[str, ...]) -> DateDataParser:
+    """Return a dateparser instance restricted to the languages.
+
+    Creating one loads the language data, so templates declaring the same
+    languages share an instance.
+    """
+    return DateDataParser(languages=list(languages) or None)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date(
+    value: str, languages: Tuple[str, ...], date_formats: Tuple[str, ...]
+) -> Optional[datetime]:
+    """Parse a date like `dateparser.parse`, trying the formats first."""
+    date_string = " ".join(value.split())
+    for date_format in date_formats:
+        # Formats missing a part are completed by dateparser's settings
+        if not all(
+            any(directive in date_format for directive in part)
+            for part in STRPTIME_DATE_PARTS
+        ):
+            continue
+        try:
+            return datetime.strptime(date_string, date_format)
+        except ValueError:
+            continue
+
+    data = _date_data_parser(languages).get_date_data(value, list(date_formats) or None)
+    return data.date_obj if data else None
+
+
+def _restore_template(tpl: Dict[str, Any]) -> InvoiceTemplate:
+    """Recreate a pickled template without validating it again."""
+    return InvoiceTemplate(tpl, compile_regexes=False)
+
+
+def _patterns_of(location: str, patterns: Any) -> Iterator[Tuple[str, str]]:
+    """Yield the regexes of a setting which may be a string or a list."""
+    patterns = patterns if isinstance(patterns, list) else [patterns]
+    for pattern in patterns:
+        # Non-string values are reported by the parsers when they are used
+        if isinstance(pattern, str):
+            yield location, pattern
+
+
+def _lines_patterns(
+    location: str, settings: Dict[str, Any]
+) -> Iterator[Tuple[str, str]]:
+    """Yield the regexes of lines settings, with or without rules."""
+    rules = settings.get("rules", [settings])
+    for i, rule in enumerate(rules):
+        rule_location = f"{location}.rules[{i}]" if "rules" in settings else location
+        for key in LINES_PATTERN_KEYS:
+            yield from _patterns_of(f"{rule_location}.{key}", rule.get(key))
+
+
 def _initialize_output_and_log(
     self: InvoiceTemplate, optimized_str: str
 ) -> Dict[str, Any]:
@@ -296,15 +534,37 @@ def _initialize_output_and_log(
 
 def _handle_area(
     self: InvoiceTemplate,
+    k: str,
     v: Dict[str, Any],
     input_module: Any,
     invoice_file: str,
     optimized_str: str,
+    layouts: Dict[str, List[Page]],
+    timings: Optional[Timings] = None,
 ) -> str:
-    """Handle area-specific extraction."""
+    """Handle area-specific extraction.
+
+    The input module extracts the text of each area. With
+    `layout.AREAS_FROM_LAYOUT`, the positioned words of the document are
+    extracted on the first area and kept in `layouts`, the areas are cut
+    from them instead.
+    """
     if "area" in v and input_module in (pdftotext, ocrmypdf, tesseract):
         logger.debug(f"Area was specified with parameters {v['area']}")
-        optimized_str_area: str = input_module.to_text(invoice_file, v["area"])
+        ocr_languages = self.options["ocr_languages"] or None
+        with measure(timings, "area", template=self.get("template_name"), field=k):
+            if layout.AREAS_FROM_LAYOUT:
+                if invoice_file not in layouts:
+                    layouts[invoice_file] = _to_layout(
+                        input_module, invoice_file, ocr_languages
+                    )
+                optimized_str_area = layout.area_text(layouts[invoice_file], v["area"])
+            elif input_module is tesseract:
+                optimized_str_area = tesseract.to_text(
+                    invoice_file, v["area"], languages=ocr_languages
+                )
+            else:
+                optimized_str_area = input_module.to_text(invoice_file, v["area"])
         logger.debug(
             "START pdftotext area result ===========================\n%s",
             optimized_str_area,
@@ -314,6 +574,15 @@ def _handle_area(
     return optimized_str
 
 
+def _to_layout(
+    input_module: Any, invoice_file: str, ocr_languages: Optional[List[str]]
+) -> List[Page]:
+    """Extract the positioned words of the document with the input module."""
+    if input_module is tesseract:
+        return tesseract.to_layout(invoice_file, languages=ocr_languages)
+    return input_module.to_layout(invoice_file)  # type: ignore[no-any-return]
+
+
 def _handle_parser(
     self: InvoiceTemplate,
     k: str,
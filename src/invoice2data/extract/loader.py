@@ -4,14 +4,18 @@ Templates are initially read from .yml or .json files and then kept as class.
 """
 
 import codecs
+import hashlib
 import json
 import os
+import pickle
+import tempfile
 from logging import getLogger
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import cast
 
 
@@ -29,6 +33,9 @@ from .invoice_template import InvoiceTemplate  # type: ignore[unused-ignore]
 
 logger = getLogger(__name__)
 
+# Bump when the format of the cached templates changes
+CACHE_VERSION = 1
+
 
 def ordered_load(
     stream: str, loader: Callable[[str], Any] = json.loads
@@ -54,19 +61,31 @@ def ordered_load(
     for tpl in tpl_stream:
         tpl = prepare_template(tpl)
         if tpl:
-            output.append(InvoiceTemplate(cast(Dict[str, Any], tpl)))
+            try:
+                output.append(InvoiceTemplate(cast(Dict[str, Any], tpl)))
+            except ValueError as error:
+                logger.warning("Failed to load template from stream:\n%s", error)
 
     return output
 
 
-def read_templates(folder: Optional[str] = None) -> List[InvoiceTemplate]:
+def read_templates(
+    folder: Optional[str] = None, cache_dir: Optional[str] = None
+) -> List[InvoiceTemplate]:
     """Load YAML templates from template folder. Return list of dicts.
 
     Use built-in templates if no folder is set.
 
+    When a cache directory is given, the valid parsed templates are kept in a
+    cache file there, keyed by file path, modification time and size. Only
+    the template files which changed since the cache was written are parsed
+    and validated again.
+
     Args:
         folder (Optional[str]): User-defined folder where templates are stored.
                                 If None, uses built-in templates.
+        cache_dir (Optional[str]): Folder where the parsed templates are cached.
+                                   If None, templates are always parsed.
 
     Returns:
         List[InvoiceTemplate]: List of InvoiceTemplate objects.
@@ -84,37 +103,158 @@ def read_templates(folder: Optional[str] = None) -> List[InvoiceTemplate]:
     else:
         folder = os.path.abspath(folder)
 
+    cache_file = _cache_file(cache_dir, folder) if cache_dir else None
+    cached = _read_cache(cache_file) if cache_file else None
+    entries: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    tpl: Optional[Dict[str, Any]]
+
     for path, _subdirs, files in os.walk(folder):
         for name in sorted(files):
-            with codecs.open(
-                os.path.join(path, name), encoding="utf-8"
-            ) as template_file:
-                if name.endswith((".yaml", ".yml")):
-                    try:
-                        tpl = load(template_file.read(), Loader=SafeLoader)
-                    except YAMLError as error:
-                        logger.warning("Failed to load %s template:\n%s", name, error)
-                        continue
-                elif name.endswith(".json"):
-                    try:
-                        tpl = json.loads(template_file.read())
-                    except ValueError as error:
-                        logger.warning(
-                            "json Loader Failed to load %s template:\n%s", name, error
-                        )
-                        continue
-                else:
-                    continue
+            file_path = os.path.join(path, name)
+            if not name.endswith((".yaml", ".yml", ".json")):
+                continue
+            stat = os.stat(file_path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if cached and file_path in cached and cached[file_path][0] == key:
+                # Cached templates were validated when they were cached,
+                # so their regexes are only compiled when first used.
+                tpl = cached[file_path][1]
+                output.append(InvoiceTemplate(tpl, compile_regexes=False))
+                entries[file_path] = cached[file_path]
+                continue
+
+            tpl = _read_template_file(file_path, name)
+            if tpl is None:
+                continue
             tpl["template_name"] = name
             tpl = prepare_template(tpl)
 
             if tpl:
-                output.append(InvoiceTemplate(cast(Dict[str, Any], tpl)))
+                try:
+                    output.append(InvoiceTemplate(tpl))
+                except ValueError as error:
+                    logger.warning("Failed to load %s template:\n%s", name, error)
+                    continue
+                entries[file_path] = (key, tpl)
+
+    # Unchanged entries hold the very same objects, so this stays cheap
+    if cache_file and entries != cached:
+        _write_cache(cache_file, entries)
 
     logger.info("Loaded %d templates from %s", len(output), folder)
     return output
 
 
+def build_template_cache(
+    folder: Optional[str] = None, cache_dir: Optional[str] = None
+) -> str:
+    """Parse all templates of a folder and write them to the cache.
+
+    Any existing cache for the folder is discarded first.
+
+    Args:
+        folder (Optional[str]): User-defined folder where templates are stored.
+                                If None, uses built-in templates.
+        cache_dir (Optional[str]): Folder where the parsed templates are cached.
+                                   Defaults to the user cache folder.
+
+    Returns:
+        str: Path of the written cache file.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    if folder is None:
+        folder = "./src/invoice2data/extract/templates"
+    cache_file = _cache_file(cache_dir, os.path.abspath(folder))
+    if os.path.exists(cache_file):
+        os.remove(cache_file)
+    read_templates(folder, cache_dir=cache_dir)
+    return cache_file
+
+
+def default_cache_dir() -> str:
+    """Return the default folder for the template cache.
+
+    Returns:
+        str: `$XDG_CACHE_HOME/invoice2data`, or `~/.cache/invoice2data`.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "invoice2data")
+
+
+def _read_template_file(file_path: str, name: str) -> Optional[Dict[str, Any]]:
+    """Parse a single YAML or JSON template file."""
+    with codecs.open(file_path, encoding="utf-8") as template_file:
+        if name.endswith((".yaml", ".yml")):
+            try:
+                tpl = load(template_file.read(), Loader=SafeLoader)
+            except YAMLError as error:
+                logger.warning("Failed to load %s template:\n%s", name, error)
+                return None
+        else:
+            try:
+                tpl = json.loads(template_file.read())
+            except ValueError as error:
+                logger.warning(
+                    "json Loader Failed to load %s template:\n%s", name, error
+                )
+                return None
+    return cast(Dict[str, Any], tpl)
+
+
+def _cache_file(cache_dir: str, folder: str) -> str:
+    """Return the cache file used for a template folder."""
+    digest = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()  # noqa: S324
+    return os.path.join(cache_dir, "templates-%s.pickle" % digest[:16])
+
+
+def _read_cache(
+    cache_file: str,
+) -> Optional[Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]]]:
+    """Read cached templates, returning None if the cache is unusable."""
+    try:
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)  # noqa: S301
+    except FileNotFoundError:
+        return None
+    except (
+        OSError,
+        pickle.UnpicklingError,
+        EOFError,
+        AttributeError,
+        ImportError,
+    ) as error:
+        logger.warning("Ignoring unreadable template cache %s: %s", cache_file, error)
+        return None
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        logger.debug("Ignoring outdated template cache %s", cache_file)
+        return None
+    logger.debug("Read template cache %s", cache_file)
+    return cast(Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]], cache["entries"])
+
+
+def _write_cache(
+    cache_file: str, entries: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]]
+) -> None:
+    """Atomically write the cache, so concurrent readers never see a partial file."""
+    cache_dir = os.path.dirname(cache_file)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                {"version": CACHE_VERSION, "entries": entries},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, cache_file)
+    except OSError as error:
+        logger.warning("Failed to write template cache %s: %s", cache_file, error)
+        return
+    logger.debug("Wrote template cache %s", cache_file)
+
+
 def prepare_template(tpl: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Prepare a template for use.
 
@@ -3,15 +3,20 @@
 Initial work and maintenance by Holger Brunn @hbrunn
 """
 
-import re
+from logging import DEBUG
 from logging import getLogger
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Match
 from typing import Optional
+from typing import Pattern
+from typing import Tuple
 from typing import Union
 
+from ..utils import _search_from
+from ..utils import _split_lines
+
 
 # from ..invoice_template import InvoiceTemplate  # type: ignore[unused-ignore]
 
@@ -19,8 +24,13 @@ logger = getLogger(__name__)
 
 DEFAULT_OPTIONS = {"line_separator": r"\n"}
 
+# Kinds of lines of a block, in the order their patterns are tried
+LINE_ROLES = ("first_line", "last_line", "skip_line", "line")
+
 
-def parse_line(patterns: Union[str, List[str]], line: str) -> Optional[Match[str]]:
+def parse_line(
+    patterns: Union[Pattern[str], List[Pattern[str]]], line: str
+) -> Optional[Match[str]]:
     """Parse a line using a given pattern or list of patterns.
 
     This function searches for a match in the given line using the provided
@@ -28,7 +38,8 @@ def parse_line(patterns: Union[str, List[str]], line: str) -> Optional[Match[str
     object; otherwise, it returns None.
 
     Args:
-        patterns (Union[str, List[str]]): The pattern(s) to search for.
+        patterns (Union[Pattern[str], List[Pattern[str]]]): The compiled
+            pattern(s) to search for.
         line (str): The line to parse.
 
     Returns:
@@ -36,17 +47,78 @@ def parse_line(patterns: Union[str, List[str]], line: str) -> Optional[Match[str
     """
     patterns = patterns if isinstance(patterns, list) else [patterns]
     for pattern in patterns:
-        match = re.search(pattern, line)
+        match = pattern.search(line)
         if match:
             return match
     return None
 
 
+def compile_patterns(
+    template: Dict[str, Any], patterns: Union[str, List[str]]
+) -> List[Pattern[str]]:
+    """Return the compiled regexes of a setting holding one or more patterns.
+
+    Args:
+        template (Dict[str, Any]): The template the patterns belong to.
+        patterns (Union[str, List[str]]): The pattern(s) from the settings.
+
+    Returns:
+        List[Pattern[str]]: The compiled patterns.
+    """
+    patterns = patterns if isinstance(patterns, list) else [patterns]
+    return [template.compile_regex(p) for p in patterns]  # type: ignore[attr-defined]
+
+
+class LineClassifier:
+    """Tell which pattern of a rule a line matches, and the match.
+
+    The first_line, last_line, skip_line and line patterns of the rule are
+    compiled once into a single sequence, in the order `parse_block` tries
+    them, so classifying a line is one pass over it stopping at the first
+    match.
+
+    Args:
+        template (Dict[str, Any]): The template the rule belongs to.
+        settings (Dict[str, Any]): The settings of the rule.
+    """
+
+    def __init__(self, template: Dict[str, Any], settings: Dict[str, Any]) -> None:
+        self._all = tuple(
+            (role, pattern.search)
+            for role in LINE_ROLES
+            if role in settings
+            for pattern in compile_patterns(template, settings[role])
+        )
+        # Outside of an entry only first_line patterns are looked for
+        self._first = tuple(alt for alt in self._all if alt[0] == "first_line")
+
+    def classify(self, line: str, in_entry: bool) -> Optional[Tuple[str, Match[str]]]:
+        """Return the role of the first pattern matching a line and the match.
+
+        Args:
+            line (str): The line.
+            in_entry (bool): Whether a first_line was found, so that the
+                other patterns apply.
+
+        Returns:
+            Optional[Tuple[str, Match[str]]]: The role, e.g. `first_line`,
+                and the match, None if the line matches no pattern.
+        """
+        for role, search in self._all if in_entry else self._first:
+            match = search(line)
+            if match:
+                return role, match
+        return None
+
+
 def parse_block(  # noqa: RUF100 C901
     template: Dict[str, Any],
     field: str,
     settings: Dict[str, Any],
     content: str,
+    pos: int = 0,
+    endpos: Optional[int] = None,
+    coerce: bool = True,
 ) -> List[Dict[str, Any]]:
     """Parse a block of lines to extract data.
 
@@ -60,6 +132,11 @@ def parse_block(  # noqa: RUF100 C901
         field (str): The name of the field to extract.
         settings (Dict[str, Any]): The settings for the extraction rule.
         content (str): The text content to parse.
+        pos (int): Offset of the block in the content. Defaults to 0.
+        endpos (Optional[int]): Offset of the end of the block in the content.
+            Defaults to the end of the content.
+        coerce (bool): Whether to convert the typed fields, see `coerce_rows`.
+            Defaults to True.
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries, where each dictionary
@@ -70,8 +147,12 @@ def parse_block(  # noqa: RUF100 C901
         "Error in Template %s Line regex missing" % template["template_name"]
     )
 
-    logger.debug("START lines block content ========================\n%s", content)
-    logger.debug("END lines block content ==========================")
+    if logger.isEnabledFor(DEBUG):
+        logger.debug(
+            "START lines block content ========================\n%s",
+            content[pos:endpos],
+        )
+        logger.debug("END lines block content ==========================")
     lines: List[Dict[str, Any]] = []
     current_row: Dict[str, Any] = {}
 
@@ -90,82 +171,87 @@ def parse_block(  # noqa: RUF100 C901
     # In this way the code will simply loop through and extract the lines as expected.
     if "first_line" not in settings and "last_line" not in settings:
         settings["first_line"] = settings["line"]
+    classifier = LineClassifier(template, settings)
     # As we enter the loop, we set the boolean for first_line being found to False,
     # This indicates the we are looking for the first_line pattern
     first_line_found = False
-    for line in re.split(settings["line_separator"], content):
+    line_separator = template.compile_regex(settings["line_separator"])  # type: ignore[attr-defined]
+    for line in _split_lines(line_separator, content, pos, endpos):
         # If the line has empty lines in it , skip them
         if not line.strip("").strip("\n").strip("\r") or not line:
             continue
-        if "first_line" in settings:
-            # Check if the current lines the first_line pattern
-            match = parse_line(settings["first_line"], line)
-            if match:
-                # The line matches the first_line pattern so append current row to output
-                # then assign a new current_row
-                if current_row:
-                    lines.append(current_row)
-                current_row = {
-                    field: value.strip() if value else ""
-                    for field, value in match.groupdict().items()
-                }
-                # Flip first_line_found boolean as first_line has been found
-                # This will allow last_line and line to be matched on below
-                first_line_found = True
-                continue
-        # Look for line or last_line only if the first has has been found
-        if first_line_found is True:
-            # If last_line was provided, check that
-            if "last_line" in settings:
-                # last_line pattern provided, so check if the current line is that line
-                match = parse_line(settings["last_line"], line)
-                if match:
-                    # This is the last_line, so parse all lines thus far,
-                    # append to output,
-                    # and reset current_row
-                    current_row = parse_current_row(match, current_row)
-                    if current_row:
-                        lines.append(current_row)
-                    current_row = {}
-                    # Flip first_line_found boolean to look for first_line again on next loop
-                    first_line_found = False
-                    continue
-            # Next we see if this is a line that should be skipped
-            if "skip_line" in settings:
-                # If skip_line was provided, check for a match now
-                if isinstance(settings["skip_line"], list):
-                    # Accepts a list
-                    skip_line_results = [
-                        re.search(x, line) for x in settings["skip_line"]
-                    ]
-                else:
-                    # Or a simple string
-                    skip_line_results = [re.search(settings["skip_line"], line)]
-                if any(skip_line_results):
-                    # There was at least one match to a skip_line
-                    logger.debug("skip_line match on \ns*%s*", line)
-                    continue
-            # If none of those have continued the loop, check if this is just a normal line
-            match = parse_line(settings["line"], line)
-            if match:
-                # This is one of the lines between first_line and last_line
-                # Parse the data and add it to the current_row
-                current_row = parse_current_row(match, current_row)
-                continue
-        # If the line doesn't match anything, log and continue to next line
-        logger.debug("The following line doesn't match anything:\n*%s*", line)
+        # Find the first pattern matching the line, only first_line is
+        # looked for until the first has been found
+        classified = classifier.classify(line, first_line_found)
+        role, match = classified if classified else (None, None)
+        if role == "first_line":
+            # The line matches the first_line pattern so append current row to output
+            # then assign a new current_row
+            if current_row:
+                lines.append(current_row)
+            current_row = {
+                field: value.strip() if value else ""
+                for field, value in match.groupdict().items()  # type: ignore[union-attr]
+            }
+            # Flip first_line_found boolean as first_line has been found
+            # This will allow last_line and line to be matched on below
+            first_line_found = True
+        elif role == "last_line":
+            # This is the last_line, so parse all lines thus far,
+            # append to output,
+            # and reset current_row
+            current_row = parse_current_row(match, current_row)
+            if current_row:
+                lines.append(current_row)
+            current_row = {}
+            # Flip first_line_found boolean to look for first_line again on next loop
+            first_line_found = False
+        elif role == "skip_line":
+            # There was at least one match to a skip_line
+            logger.debug("skip_line match on \ns*%s*", line)
+        elif role == "line":
+            # This is one of the lines between first_line and last_line
+            # Parse the data and add it to the current_row
+            current_row = parse_current_row(match, current_row)
+        else:
+            # If the line doesn't match anything, log and continue to next line
+            logger.debug("The following line doesn't match anything:\n*%s*", line)
     if current_row:
         # All lines processed, so append whatever the final current_row was to output
         lines.append(current_row)
 
-    types = settings.get("types", [])
-    for row in lines:
-        for name in row.keys():
-            if name in types:
-                row[name] = template.coerce_type(row[name], types[name])  # type: ignore[attr-defined]
+    if coerce:
+        coerce_rows(template, lines, settings.get("types"))
     return lines
 
 
+def coerce_rows(
+    template: Dict[str, Any],
+    rows: List[Dict[str, Any]],
+    types: Optional[Dict[str, str]],
+) -> List[Dict[str, Any]]:
+    """Convert the typed fields of the rows, a column at a time.
+
+    Args:
+        template (Dict[str, Any]): The template the rows were parsed with.
+        rows (List[Dict[str, Any]]): The parsed rows, converted in place.
+        types (Optional[Dict[str, str]]): The type of each typed field.
+
+    Returns:
+        List[Dict[str, Any]]: The rows.
+    """
+    for name, target_type in (types or {}).items():
+        typed_rows = [row for row in rows if name in row]
+        if not typed_rows:
+            continue
+        values = template.coerce_column(  # type: ignore[attr-defined]
+            [row[name] for row in typed_rows], target_type
+        )
+        for row, value in zip(typed_rows, values):
+            row[name] = value
+    return rows
+
+
 def parse_by_rule(
     template: Dict[str, Any],
     field: str,
@@ -184,7 +270,7 @@ def parse_by_rule(
         List[Dict[str, Any]]: The parsed lines.
     """
     # First apply default options.
-    settings = DEFAULT_OPTIONS.copy()
+    settings: Dict[str, Any] = DEFAULT_OPTIONS.copy()
     settings.update(rule)
 
     # Validate settings
@@ -195,26 +281,32 @@ def parse_by_rule(
         "Error in Template %s Lines end regex missing" % template["template_name"]
     )
 
+    start_re = template.compile_regex(settings["start"])  # type: ignore[attr-defined]
+    end_re = template.compile_regex(settings["end"])  # type: ignore[attr-defined]
+
     blocks_count = 0
     lines = []
 
-    # Try finding & parsing blocks of lines one by one
+    # Try finding & parsing blocks of lines one by one, moving an offset
+    # through the content instead of cutting off what has been parsed
+    pos = 0
     while True:
-        start = re.search(settings["start"], content)
+        start = _search_from(start_re, content, pos)
         if not start:
             logger.debug("Failed to find lines block start")
             break
-        content = content[start.end() :]
 
-        end = re.search(settings["end"], content)
+        end = _search_from(end_re, content, start[1])
         if not end:
             logger.debug("Failed to find lines block end")
             break
 
         blocks_count += 1
-        lines += parse_block(template, field, settings, content[0 : end.start()])
+        lines += parse_block(
+            template, field, settings, content, start[1], end[0], coerce=False
+        )
 
-        content = content[end.end() :]
+        pos = end[1]
 
     if blocks_count == 0:
         logger.warning(
@@ -223,7 +315,8 @@ def parse_by_rule(
     elif not lines:
         logger.warning('Failed to find any lines for "%s"', field)
 
-    return lines
+    # The rows of all the blocks are converted together
+    return coerce_rows(template, lines, settings.get("types"))
 
 
 def parse(
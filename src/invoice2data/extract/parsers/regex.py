@@ -13,15 +13,24 @@ For more detailed parsing "type" and "group" settings can be specified.
 
 import logging
 import re
+import sys
 from collections import OrderedDict
+from functools import lru_cache
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Pattern
 
 from ..utils import _apply_grouping
 
 
+if sys.version_info >= (3, 11):
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+else:
+    import sre_parse
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,7 +57,7 @@ def parse(
         logger.warning('Field "%s" doesn\'t have regex specified', field)
         return None
 
-    result = _extract_matches(settings, content)
+    result = _extract_matches(template, settings, content)
     if result is None:
         return None
 
@@ -64,7 +73,9 @@ def parse(
     return result
 
 
-def _extract_matches(settings: Dict[str, Any], content: str) -> Optional[List[Any]]:
+def _extract_matches(
+    template: Any, settings: Dict[str, Any], content: str
+) -> Optional[List[Any]]:
     """Extract matches from the content using the given regexes."""
     if isinstance(settings["regex"], list):
         regexes = settings["regex"]
@@ -81,7 +92,13 @@ def _extract_matches(settings: Dict[str, Any], content: str) -> Optional[List[An
             )
             continue
 
-        matches = re.findall(regex, content)
+        compiled = template.compile_regex(regex)
+        literal = required_literal(compiled)
+        if literal is not None and literal not in content:
+            # The regex can't match, skip scanning the content with it
+            matches = []
+        else:
+            matches = compiled.findall(content)
         logger.debug(
             "field=\033[1m\033[93m%s\033[0m | regex=\033[36m%s\033[0m | matches=\033[1m\033[92m%s\033[0m",
             settings.get("field", ""),
@@ -99,6 +116,56 @@ def _extract_matches(settings: Dict[str, Any], content: str) -> Optional[List[An
     return result
 
 
+@lru_cache(maxsize=None)
+def required_literal(pattern: Pattern[str]) -> Optional[str]:
+    """Return the longest text every match of a regex contains.
+
+    Checking that the text is in the content is much faster than scanning
+    the content with a regex which doesn't start with a literal, so the
+    regexes which can't match are skipped. Only the literals outside of
+    alternatives and repetitions are considered.
+
+    Args:
+        pattern (Pattern[str]): The compiled regex.
+
+    Returns:
+        Optional[str]: The text, None if no text is required, e.g. for a
+            case-insensitive regex.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:  # noqa: BLE001
+        # The regex parser is internal to Python, it may change
+        return None
+    literals = _literals(parsed, [])
+    return max(literals, key=len) if literals else None
+
+
+def _literals(items: Any, literals: List[str]) -> List[str]:
+    """Collect the runs of literal characters of a parsed regex."""
+    run: List[str] = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_parse.IN and len(av) == 1 and av[0][0] is sre_parse.LITERAL:
+            # A class of a single character, e.g. [@]
+            run.append(chr(av[0][1]))
+            continue
+        if run:
+            literals.append("".join(run))
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            _group, add_flags, _del_flags, subpattern = av
+            if not add_flags & re.IGNORECASE:
+                _literals(subpattern, literals)
+    if run:
+        literals.append("".join(run))
+    return literals
+
+
 def _apply_type_coercion(
     template: Any, settings: Dict[str, Any], result: List[Any]
 ) -> List[Any]:
@@ -1,13 +1,21 @@
 """Plugin to extract tables from an invoice."""
 
-import re
 from collections import OrderedDict
+from functools import partial
+from logging import DEBUG
 from logging import getLogger
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import Optional
+from typing import Tuple
 
 from ..utils import _apply_grouping
+from ..utils import _search_from
+from ..utils import _split_lines
 
 
 logger = getLogger(__name__)
@@ -38,13 +46,10 @@ def extract(
         if table is None:
             continue
 
-        # Extract table body
-        table_body = _extract_table_body(content, table)
-        if table_body is None:
-            continue
-
-        # Process table lines
-        table_data = _process_table_lines(self, table, table_body)
+        # Process the lines of every occurrence of the table
+        table_data = _process_table_lines(
+            self, table, content, _extract_table_bodies(self, content, table)
+        )
         if table_data is None:
             continue
 
@@ -85,64 +90,110 @@ def _extract_and_validate_settings(
     return table
 
 
-def _extract_table_body(content: str, table: Dict[str, Any]) -> Optional[str]:
-    """Extract the table body from the content.
+def _extract_table_bodies(
+    self: "OrderedDict[str, Any]", content: str, table: Dict[str, Any]
+) -> Iterator[Tuple[int, int]]:
+    """Find the bodies of all the occurrences of the table in the content.
+
+    The end of a table is searched after its start, and the next start after
+    that end, so a table repeated on every page is found on each of them.
 
     Args:
+        self (InvoiceTemplate): The current instance of the class.  # noqa: DOC103
         content (str): The content of the invoice.
         table (Dict[str, Any]): The validated table settings.
 
-    Returns:
-        Optional[str]: The extracted table body, or None if start or end
-                       regexes are not found.
+    Yields:
+        Tuple[int, int]: The start and end offsets of each table body in
+            the content.
     """
-    start = re.search(table["start"], content)
-    end = re.search(table["end"], content)
-
-    if not start:
-        logger.debug("Failed to find the start of the table")
-        return None
-
-    if not end:
-        logger.debug("Failed to find the end of the table")
-        return None
+    start_re = self.compile_regex(table["start"])  # type: ignore[attr-defined]
+    end_re = self.compile_regex(table["end"])  # type: ignore[attr-defined]
+    pos = 0
+    found = False
+    while True:
+        start = _search_from(start_re, content, pos)
+        if not start:
+            if not found:
+                logger.debug("Failed to find the start of the table")
+            return
+
+        end = _search_from(end_re, content, start[1])
+        if not end:
+            logger.debug("Failed to find the end of the table")
+            return
+
+        found = True
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(
+                "START table body content ========================\n%s",
+                content[start[1] : end[0]],
+            )
+            logger.debug("END table body content ==========================")
+        yield start[1], end[0]
 
-    table_body = content[start.end() : end.start()]
-    logger.debug("START table body content ========================\n%s", table_body)
-    logger.debug("END table body content ==========================")
-    return table_body
+        if end[1] == pos:
+            # Empty start and end matches, the next search would find them again
+            return
+        pos = end[1]
 
 
 def _process_table_lines(
     self: "OrderedDict[str, Any]",
     table: Dict[str, Any],
-    table_body: str,
+    content: str,
+    bodies: Iterator[Tuple[int, int]],
 ) -> Optional[Dict[str, Any]]:
-    """Process the lines within the table body.
+    """Process the lines within the table bodies.
+
+    The values are collected column by column, then each column is
+    converted at once following the coercion plan of the table.
 
     Args:
         self (InvoiceTemplate): The current instance of the class.  # noqa: DOC103
         table (Dict[str, Any]): The validated table settings.
-        table_body (str): The extracted table body.
+        content (str): The content of the invoice.
+        bodies (Iterator[Tuple[int, int]]): The offsets of the table bodies
+            in the content.
 
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries, where each dictionary
-                              represents a row in the table.
+        Optional[Dict[str, Any]]: The extracted data, the values of a field
+            matched on several lines in a list, or None if the table is not
+            found or a date fails to parse.
     """
-    types = table.get("types", {})
     no_match_found = True
-    line_output: Dict[str, Any] = {}
-    for line in re.split(table["line_separator"], table_body):
-        if not line.strip("").strip("\n") or line.isspace():
-            continue
-
-        # Correct the function call and return logic
-        if not _process_table_line(self, table, line, types, line_output):
-            return None  # Return None immediately if line parsing fails
-        else:
-            no_match_found = (
-                False  # Update no_match_found only if line processing is successful
-            )
+    found = False
+    body_re = self.compile_regex(table["body"])  # type: ignore[attr-defined]
+    columns: Dict[str, List[Any]] = {field: [] for field in body_re.groupindex}
+    line_separator = self.compile_regex(table["line_separator"])  # type: ignore[attr-defined]
+    for pos, endpos in bodies:
+        found = True
+        for line in _split_lines(line_separator, content, pos, endpos):
+            if not line.strip("").strip("\n") or line.isspace():
+                continue
+            no_match_found = False
+
+            match = body_re.search(line)
+            if not match:
+                logger.debug("The following line doesn't match anything:\n*%s*", line)
+                continue
+            if logger.isEnabledFor(DEBUG):
+                for field, value in match.groupdict().items():
+                    logger.debug(
+                        (
+                            "field=\033[1m\033[93m%s\033[0m |"
+                            "regex=\033[36m%s\033[0m | "
+                            "matches=\033[1m\033[92m['%s']\033[0m"
+                        ),
+                        field,
+                        match.re.pattern,
+                        value,
+                    )
+            for column, value in zip(columns.values(), match.groupdict().values()):
+                column.append(value)
+
+    if not found:
+        return None
 
     if no_match_found:
         logger.debug(
@@ -150,72 +201,77 @@ def _process_table_lines(
             table["body"],
         )
 
-    return line_output
+    return _coerce_columns(self, table, columns)
 
 
-def _process_table_line(  # noqa: C901
-    self: "OrderedDict[str, Any]",
-    table: Dict[str, Any],
-    line: str,
-    types: Dict[str, Any],
-    output: Dict[str, Any],
-) -> bool:
-    """Process a single line within the table body.
+def _coerce_columns(
+    self: "OrderedDict[str, Any]", table: Dict[str, Any], columns: Dict[str, List[Any]]
+) -> Optional[Dict[str, Any]]:
+    """Convert the values of the table, a column at a time.
 
     Args:
-        self (InvoiceTemplate): The current instance of the class.
+        self (InvoiceTemplate): The current instance of the class.  # noqa: DOC103
         table (Dict[str, Any]): The validated table settings.
-        line (str): A single line from the table body.
-        types (Dict[str, Any]): A dictionary of type coercion rules.
-        output (Dict[str, Any]): A dictionary to store the extracted data.
+        columns (Dict[str, List[Any]]): The values matched for each field.
 
     Returns:
-        bool: True if processing is successful, False if date parsing fails.
+        Optional[Dict[str, Any]]: The converted values, in a list for the
+            fields matched on several lines, or None if a date fails to parse.
     """
-    match = re.search(table["body"], line)
-    if match:
-        for field, value in match.groupdict().items():
-            logger.debug(
-                (
-                    "field=\033[1m\033[93m%s\033[0m |"
-                    "regex=\033[36m%s\033[0m | "
-                    "matches=\033[1m\033[92m['%s']\033[0m"
-                ),
-                field,
-                match.re.pattern,
-                value,
-            )
+    plan = _coercion_plan(self, table, columns)
+    output: Dict[str, Any] = {}
+    for field, values in columns.items():
+        if not values:
+            continue
+        if field in plan:
+            coerced = plan[field](values)
+            if _is_date(field) and not all(coerced):
+                failed = next(v for v, date in zip(values, coerced) if not date)
+                logger.error("Date parsing failed on date *%s*", failed)
+                return None
+            values = coerced
+        output[field] = values[0] if len(values) == 1 else values
+    return output
+
+
+def _is_date(field: str) -> bool:
+    return field.startswith("date") or field.endswith("date")
 
-            if field.startswith("date") or field.endswith("date"):
-                value = self.parse_date(value)  # type: ignore[attr-defined]
-                if not value:
-                    logger.error("Date parsing failed on date *%s*", value)
-                    return False
-            elif field.startswith("amount"):
-                value = self.parse_number(value)  # type: ignore[attr-defined]
-            elif field in types:
-                value = self.coerce_type(value, types[field])  # type: ignore[attr-defined]
-            elif table.get("fields"):
-                # Writing templates is hard. So we also support the following format
-                # In case someone mixup syntax
-                # fields:
-                #    example_field:
-                #      type: float
-                #      group: sum
-                field_set = table["fields"].get(field, {})
-                if "type" in field_set:
-                    value = self.coerce_type(value, field_set.get("type"))  # type: ignore[attr-defined]
-
-            if field in output:
-                # Ensure output[field] is a list before appending
-                if not isinstance(output[field], list):
-                    output[field] = [output[field]]
-                output[field].append(value)
-            else:
-                output[field] = value
-        # Return True if a match is found and processed successfully
-        return True
-    else:
-        logger.debug("The following line doesn't match anything:\n*%s*", line)
-        # Return True to continue processing even if a line doesn't match
-        return True
+
+def _coercion_plan(
+    self: "OrderedDict[str, Any]", table: Dict[str, Any], fields: Iterable[str]
+) -> Dict[str, Callable[[List[Any]], List[Any]]]:
+    """Choose once for each field of the table how its values are converted.
+
+    Args:
+        self (InvoiceTemplate): The current instance of the class.  # noqa: DOC103
+        table (Dict[str, Any]): The validated table settings.
+        fields (Iterable[str]): The names of the fields of the table.
+
+    Returns:
+        Dict[str, Callable[[List[Any]], List[Any]]]: The function converting
+            the values of each field, for the fields which are converted.
+    """
+    types = table.get("types", {})
+    plan: Dict[str, Callable[[List[Any]], List[Any]]] = {}
+    for field in fields:
+        if _is_date(field):
+            plan[field] = self.parse_dates  # type: ignore[attr-defined]
+        elif field.startswith("amount"):
+            plan[field] = self.parse_numbers  # type: ignore[attr-defined]
+        elif field in types:
+            plan[field] = partial(self.coerce_column, target_type=types[field])  # type: ignore[attr-defined]
+        elif table.get("fields"):
+            # Writing templates is hard. So we also support the following format
+            # In case someone mixup syntax
+            # fields:
+            #    example_field:
+            #      type: float
+            #      group: sum
+            field_set = table["fields"].get(field, {})
+            if "type" in field_set:
+                plan[field] = partial(
+                    self.coerce_column,  # type: ignore[attr-defined]
+                    target_type=field_set.get("type"),
+                )
+    return plan
@@ -0,0 +1,146 @@
+"""Keyword index used to select the templates matching an invoice.
+
+Instead of asking every template whether all of its keywords are present in
+the extracted text, the index collects the distinct `keywords` and
+`exclude_keywords` of all templates once. Matching a document then costs a
+single scan over the text to find which of those keywords occur, followed by
+cheap set lookups per candidate template.
+
+When `pyahocorasick` is installed, the scan is done with an Aho-Corasick
+automaton in one pass over the text. Otherwise each distinct keyword is
+searched once, which still avoids repeating shared keywords per template.
+"""
+
+from logging import getLogger
+from typing import Any
+from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
+from typing import List
+from typing import Set
+from typing import Tuple
+
+from .invoice_template import InvoiceTemplate
+
+
+logger = getLogger(__name__)
+
+try:
+    import ahocorasick  # type: ignore[import-not-found]
+
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+def ahocorasick_available() -> bool:
+    """Checks if the pyahocorasick module is available.
+
+    Returns:
+        bool: True if pyahocorasick is available, False otherwise.
+    """
+    return AHOCORASICK_AVAILABLE
+
+
+class TemplateIndex:
+    """Select the templates whose keywords match an extracted text.
+
+    Args:
+        templates (Iterable[InvoiceTemplate]): Templates to index.
+            Their order is kept to break ties between equal priorities.
+    """
+
+    def __init__(self, templates: Iterable[InvoiceTemplate]) -> None:
+        self.templates: List[InvoiceTemplate] = list(templates)
+
+        keywords: Set[str] = set()
+        # Each template is filed under its first keyword only: a template
+        # can't match unless that keyword is found, so the others are
+        # never looked at for most documents.
+        self._by_anchor: Dict[str, List[int]] = {}
+        self._requirements: List[Tuple[FrozenSet[str], FrozenSet[str]]] = []
+
+        for position, template in enumerate(self.templates):
+            required = frozenset(template["keywords"])
+            excluded = frozenset(template.get("exclude_keywords", []))
+            self._requirements.append((required, excluded))
+            keywords.update(required, excluded)
+            anchor = template["keywords"][0] if template["keywords"] else ""
+            self._by_anchor.setdefault(anchor, []).append(position)
+
+        self._keywords: List[str] = sorted(k for k in keywords if k)
+        self._automaton: Any = None
+        if self._keywords and ahocorasick_available():
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self._keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+        logger.debug(
+            "Indexed %d templates with %d distinct keywords (automaton: %s)",
+            len(self.templates),
+            len(self._keywords),
+            self._automaton is not None,
+        )
+
+    def __len__(self) -> int:
+        """Return the number of indexed templates."""
+        return len(self.templates)
+
+    def find_keywords(self, extracted_str: str) -> Set[str]:
+        """Return the indexed keywords which occur in the text.
+
+        Args:
+            extracted_str (str): The extracted text from the invoice.
+
+        Returns:
+            Set[str]: The keywords found in the text.
+        """
+        # An empty keyword is a substring of every text, and it is also the
+        # anchor of templates without keywords.
+        found = {""}
+        if self._automaton is not None:
+            found.update(
+                keyword for _end, keyword in self._automaton.iter(extracted_str)
+            )
+        else:
+            found.update(k for k in self._keywords if k in extracted_str)
+        return found
+
+    def match(self, extracted_str: str) -> List[InvoiceTemplate]:
+        """Return the templates matching the text, best candidate first.
+
+        A template matches when all of its keywords and none of its
+        exclude_keywords are found, like `InvoiceTemplate.matches_input`.
+
+        Args:
+            extracted_str (str): The extracted text from the invoice.
+
+        Returns:
+            List[InvoiceTemplate]: Matching templates sorted by descending
+                priority, keeping the original order for equal priorities.
+        """
+        found = self.find_keywords(extracted_str)
+
+        positions: List[int] = []
+        for anchor in found:
+            for position in self._by_anchor.get(anchor, []):
+                required, excluded = self._requirements[position]
+                if not required <= found:
+                    continue
+                if not excluded.isdisjoint(found):
+                    logger.debug(
+                        "Template: %s | Keywords matched. Exclude keyword found!",
+                        self.templates[position].get("template_name"),
+                    )
+                    continue
+                positions.append(position)
+
+        positions.sort()
+        matched = [self.templates[position] for position in positions]
+        matched.sort(key=lambda t: t.get("priority", 5), reverse=True)
+        logger.debug(
+            "Templates matching keywords: %s",
+            [t.get("template_name") for t in matched],
+        )
+        return matched
@@ -0,0 +1,91 @@
+"""Opt-in timing of the stages of an extraction.
+
+Pass a `Timings` instance to `extract_data` to record the wall time of
+text extraction, template matching, `prepare_input`, every field parser,
+every plugin and the ocrmypdf fallback. Each record names its stage and,
+where it applies, the template, field, parser or plugin, so a slow
+extraction can be attributed to the part of a template causing it.
+"""
+
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+from typing import Any
+from typing import ContextManager
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+
+class Timings:
+    """Wall time records of the stages of an extraction."""
+
+    def __init__(self) -> None:
+        self.records: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def measure(self, stage: str, **labels: Any) -> Iterator[None]:
+        """Record the wall time of the code run inside the context.
+
+        Args:
+            stage (str): Name of the stage, e.g. `parse_field`.
+            **labels (Any): Details of the stage, e.g. `field="date"`.
+
+        Yields:
+            None
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, **labels)
+
+    def add(self, stage: str, seconds: float, **labels: Any) -> None:
+        """Add a record.
+
+        Args:
+            stage (str): Name of the stage.
+            seconds (float): Wall time of the stage.
+            **labels (Any): Details of the stage.
+        """
+        self.records.append(dict(labels, stage=stage, seconds=seconds))
+
+    def totals(self) -> Dict[str, float]:
+        """Return the total wall time of each stage.
+
+        Returns:
+            Dict[str, float]: Seconds spent per stage name.
+        """
+        totals: Dict[str, float] = {}
+        for record in self.records:
+            totals[record["stage"]] = (
+                totals.get(record["stage"], 0.0) + record["seconds"]
+            )
+        return totals
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Return the records, e.g. to serialize them as JSON.
+
+        Returns:
+            List[Dict[str, Any]]: The records in the order they were made.
+        """
+        return [dict(record) for record in self.records]
+
+
+def measure(
+    timings: Optional[Timings], stage: str, **labels: Any
+) -> ContextManager[Any]:
+    """Measure a stage if timings are collected, else do nothing.
+
+    Args:
+        timings (Optional[Timings]): Where to record the stage, or None.
+        stage (str): Name of the stage.
+        **labels (Any): Details of the stage.
+
+    Returns:
+        ContextManager[Any]: The context to run the stage in.
+    """
+    if timings is None:
+        return nullcontext()
+    return timings.measure(stage, **labels)
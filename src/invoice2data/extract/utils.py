@@ -1,13 +1,23 @@
 """This module abstracts utilities for processing of the extracted values."""
 
+import re
+from functools import lru_cache
 from logging import getLogger
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Optional
+from typing import Pattern
+from typing import Tuple
 
 
 logger = getLogger(__name__)
 
+# Regex constructs which look at the text before the position a search starts
+# at. Searching from an offset would not match them as searching a copy of
+# the remaining text does.
+CONTEXT_RE = re.compile(r"(?<!\[)\^|\\[AbB]|\(\?<[=!]")
+
 
 def _apply_grouping(settings: Dict[str, Any], result: Any) -> Optional[Any]:
     """Apply grouping to the extracted values."""
@@ -31,3 +41,58 @@ def _apply_grouping(settings: Dict[str, Any], result: Any) -> Optional[Any]:
                 logger.warning("Unsupported grouping method: %s", settings["group"])
                 return None
     return result
+
+
+@lru_cache(maxsize=None)
+def _depends_on_context(pattern: Pattern[str]) -> bool:
+    """Return True if the matches of a regex depend on the text before them."""
+    return CONTEXT_RE.search(pattern.pattern) is not None
+
+
+def _search_from(
+    pattern: Pattern[str], content: str, pos: int = 0
+) -> Optional[Tuple[int, int]]:
+    """Search a regex in the text from an offset, without copying the text.
+
+    The regex matches as if the text started at the offset.
+
+    Args:
+        pattern (Pattern[str]): The compiled regex.
+        content (str): The text to search.
+        pos (int): Offset to start the search at. Defaults to 0.
+
+    Returns:
+        Optional[Tuple[int, int]]: Start and end offsets of the match in the
+            text, None if the regex does not match.
+    """
+    if pos and _depends_on_context(pattern):
+        match = pattern.search(content[pos:])
+        return (pos + match.start(), pos + match.end()) if match else None
+    match = pattern.search(content, pos)
+    return match.span() if match else None
+
+
+def _split_lines(
+    separator: Pattern[str], content: str, pos: int = 0, endpos: Optional[int] = None
+) -> List[str]:
+    """Split a part of the text on a separator, like `Pattern.split`.
+
+    The part is copied once and split in a single call, which is much faster
+    than iterating over the separators.
+
+    Args:
+        separator (Pattern[str]): The compiled line separator.
+        content (str): The text.
+        pos (int): Offset of the beginning of the part. Defaults to 0.
+        endpos (Optional[int]): Offset of the end of the part.
+            Defaults to the end of the text.
+
+    Returns:
+        List[str]: The lines, and the groups captured by the separator.
+    """
+    if pos or endpos is not None:
+        content = content[pos:endpos]
+    lines = separator.split(content)
+    if separator.groups:
+        return [line for line in lines if line is not None]
+    return lines
@@ -0,0 +1,147 @@
+"""Discovery of the external programs used by the input modules.
+
+The programs, their versions and the languages installed for tesseract
+are looked up once per process and cached, instead of on every document.
+`probe` reports everything that was found, e.g. to check an installation:
+
+    >>> from invoice2data.input import capabilities
+    >>> capabilities.probe()["programs"]["pdftotext"]["path"]  # doctest: +SKIP
+    '/usr/bin/pdftotext'
+"""
+
+import shutil
+from functools import lru_cache
+from logging import getLogger
+from subprocess import PIPE
+from subprocess import STDOUT
+from subprocess import CalledProcessError
+from subprocess import TimeoutExpired
+from subprocess import run
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+
+logger = getLogger(__name__)
+
+# Programs used by the input modules and the argument printing their version
+PROGRAMS = {
+    "pdftotext": "-v",
+    "pdfinfo": "-v",
+    "tesseract": "--version",
+    "convert": "--version",
+}
+
+
+@lru_cache(maxsize=None)
+def find_program(name: str) -> Optional[str]:
+    """Return the path of a program, None if it is not installed.
+
+    Args:
+        name (str): Name of the program, e.g. `pdftotext`.
+
+    Returns:
+        Optional[str]: Path of the program.
+    """
+    return shutil.which(name)
+
+
+@lru_cache(maxsize=None)
+def program_version(name: str) -> Optional[str]:
+    """Return the first line printed by a program about its version.
+
+    Args:
+        name (str): Name of the program, one of `PROGRAMS`.
+
+    Returns:
+        Optional[str]: The version line, None if the program is not
+            installed or did not report a version.
+    """
+    program = find_program(name)
+    if program is None:
+        return None
+    args_version = [program, PROGRAMS.get(name, "--version")]
+    try:
+        proc = run(
+            args_version, stdout=PIPE, stderr=STDOUT, text=True, timeout=30, check=False
+        )
+    except (OSError, TimeoutExpired):
+        return None
+    for line in proc.stdout.splitlines():
+        if line.strip():
+            return line.strip()
+    return None
+
+
+@lru_cache(maxsize=None)
+def tesseract_languages() -> Tuple[str, ...]:
+    """Return the languages installed for tesseract, sorted.
+
+    Returns:
+        Tuple[str, ...]: Language codes, e.g. `("deu", "eng")`.
+
+    Raises:
+        OSError: If tesseract is not installed, or fails to report its
+            languages in time.
+    """
+
+    def lang_error(output: str) -> str:
+        logger.warning(
+            "Tesseract failed to report available languages.\n"
+            "Output from Tesseract:\n"
+            "-----------\n"
+        )
+        return output
+
+    logger.debug("get lang called")
+    args_tess = ["tesseract", "--list-langs"]
+    try:
+        proc = run(
+            args_tess,
+            text=True,
+            stdout=PIPE,
+            stderr=STDOUT,
+            check=True,
+            timeout=30,
+        )
+        output = proc.stdout
+    except CalledProcessError as e:
+        raise OSError(lang_error(e.output)) from e
+    except TimeoutExpired as e:
+        # Reported as a missing tesseract, and not cached, so it is retried
+        raise OSError("Tesseract did not report its languages in time") from e
+
+    for line in output.splitlines():
+        if line.startswith("Error"):
+            raise OSError(lang_error(output))
+    _header, *rest = output.splitlines()
+    return tuple(sorted({lang.strip() for lang in rest if lang.strip()}))
+
+
+def probe() -> Dict[str, Any]:
+    """Report the programs found, their versions and the tesseract languages.
+
+    Returns:
+        Dict[str, Any]: `programs` maps every program of `PROGRAMS` to its
+            `path` and `version`, None when it is not installed.
+            `tesseract_languages` lists the installed languages.
+    """
+    programs = {
+        name: {"path": find_program(name), "version": program_version(name)}
+        for name in PROGRAMS
+    }
+    languages: Tuple[str, ...] = ()
+    if programs["tesseract"]["path"]:
+        try:
+            languages = tesseract_languages()
+        except OSError:
+            logger.warning("Failed to list the tesseract languages")
+    return {"programs": programs, "tesseract_languages": list(languages)}
+
+
+def clear_cache() -> None:
+    """Forget the programs and languages found, e.g. after installing one."""
+    find_program.cache_clear()
+    program_version.cache_clear()
+    tesseract_languages.cache_clear()
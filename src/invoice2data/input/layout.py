@@ -0,0 +1,181 @@
+"""Positional text layout of PDF files, used to extract areas in memory.
+
+`pdftotext -bbox-layout` is run once per document and reports the bounding
+box of every word. The text of any number of areas is then rebuilt from
+those words, instead of running pdftotext (or a whole OCR pipeline) again
+for every template field with an `area`.
+
+The rebuilt text approximates the crop of `pdftotext -x/-y/-W/-H`, spacing
+and words on the edge of an area can differ. Templates are therefore read
+with a pdftotext crop per area unless the INVOICE2DATA_LAYOUT_AREAS
+environment variable is set to 1.
+"""
+
+import os
+import subprocess
+import xml.etree.ElementTree as ET
+from logging import getLogger
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+
+from . import capabilities
+
+
+logger = getLogger(__name__)
+
+XHTML_NS = "{http://www.w3.org/1999/xhtml}"
+
+# Extract the areas of template fields from the layout of the document
+AREAS_FROM_LAYOUT = os.environ.get("INVOICE2DATA_LAYOUT_AREAS", "0") == "1"
+
+# pdftotext expresses areas in pixels at the given resolution, the layout
+# coordinates are PDF points.
+POINTS_PER_INCH = 72.0
+
+
+class Word(NamedTuple):
+    """A word and its bounding box in PDF points."""
+
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+    text: str
+
+
+class Page(NamedTuple):
+    """The words of a page, as lines in reading order."""
+
+    width: float
+    height: float
+    lines: List[List[Word]]
+
+
+def to_layout(path: str) -> List[Page]:
+    """Extract the positioned words of a PDF file using pdftotext.
+
+    Args:
+        path (str): Path to the PDF file.
+
+    Returns:
+        List[Page]: The pages of the document.
+
+    Raises:
+        FileNotFoundError: If the specified PDF file is not found.
+        OSError: If pdftotext is not installed.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    if not capabilities.find_program("pdftotext"):
+        raise OSError(
+            "pdftotext not installed. Can be downloaded from https://poppler.freedesktop.org/"
+        )
+    cmd = ["pdftotext", "-bbox-layout", "-q", "-enc", "UTF-8", path, "-"]
+    out, _err = subprocess.Popen(cmd, stdout=subprocess.PIPE).communicate()
+    return parse_bbox_layout(out.decode("utf-8"))
+
+
+def parse_bbox_layout(xhtml: str) -> List[Page]:
+    """Parse the XHTML written by `pdftotext -bbox-layout`.
+
+    Args:
+        xhtml (str): The pdftotext output.
+
+    Returns:
+        List[Page]: The pages of the document.
+    """
+    if not xhtml.strip():
+        return []
+    root = ET.fromstring(xhtml)  # noqa: S314
+    pages = []
+    for page in root.iter(XHTML_NS + "page"):
+        lines = []
+        for line in page.iter(XHTML_NS + "line"):
+            words = [
+                Word(
+                    float(word.get("xMin", 0)),
+                    float(word.get("yMin", 0)),
+                    float(word.get("xMax", 0)),
+                    float(word.get("yMax", 0)),
+                    word.text or "",
+                )
+                for word in line.iter(XHTML_NS + "word")
+            ]
+            if words:
+                lines.append(words)
+        pages.append(
+            Page(float(page.get("width", 0)), float(page.get("height", 0)), lines)
+        )
+    return pages
+
+
+def area_text(pages: List[Page], area_details: Dict[str, Any]) -> str:
+    """Return the text of an area, like `pdftotext -layout` with a crop box.
+
+    A word belongs to the area when its center lies inside it. Words are
+    grouped in rows by their vertical position and spaced out according to
+    their horizontal position, so regexes written against the output of
+    `pdftotext -layout -x -y -W -H` keep working.
+
+    Args:
+        pages (List[Page]): The layout of the document.
+        area_details (Dict[str, Any]): The area, with the same keys as the
+            `area` of a template field: first and last page `f` and `l`,
+            resolution `r` in DPI, and `x`, `y`, `W`, `H` in pixels.
+
+    Returns:
+        str: The text of the area, each page ending with a form feed.
+    """
+    for key in ("f", "l", "r", "x", "y", "W", "H"):
+        assert key in area_details, f"Area {key} details missing"
+    scale = POINTS_PER_INCH / float(area_details["r"])
+    x_min = float(area_details["x"]) * scale
+    y_min = float(area_details["y"]) * scale
+    x_max = x_min + float(area_details["W"]) * scale
+    y_max = y_min + float(area_details["H"]) * scale
+    first = int(area_details["f"])
+    last = int(area_details["l"])
+
+    texts = []
+    for page in pages[first - 1 : last]:
+        words = [
+            word
+            for line in page.lines
+            for word in line
+            if x_min <= (word.x_min + word.x_max) / 2 <= x_max
+            and y_min <= (word.y_min + word.y_max) / 2 <= y_max
+        ]
+        texts.append(_render(words) + "\f")
+    return "".join(texts)
+
+
+def _render(words: List[Word]) -> str:
+    """Lay out words on a character grid, one row per text line."""
+    if not words:
+        return ""
+    rows: List[List[Word]] = []
+    for word in sorted(words, key=lambda w: (w.y_min + w.y_max) / 2):
+        center = (word.y_min + word.y_max) / 2
+        if rows and rows[-1][0].y_min <= center <= rows[-1][0].y_max:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+
+    # Estimate the width of a character to turn positions into columns
+    widths = sorted(
+        (w.x_max - w.x_min) / len(w.text) for w in words if w.text and w.x_max > w.x_min
+    )
+    char_width = widths[len(widths) // 2] if widths else 1.0
+    left = min(w.x_min for w in words)
+
+    lines = []
+    for row in rows:
+        line = ""
+        for word in sorted(row, key=lambda w: w.x_min):
+            column = round((word.x_min - left) / char_width)
+            separator = 1 if line else 0
+            line += " " * max(column - len(line), separator) + word.text
+        lines.append(line)
+    return "\n".join(lines) + "\n"
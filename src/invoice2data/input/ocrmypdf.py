@@ -5,9 +5,12 @@ import tempfile
 from pathlib import Path
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Optional
 
+from . import layout
 from . import pdftotext
+from .layout import Page
 
 
 logger = logging.getLogger(__name__)
@@ -71,6 +74,24 @@ def to_text(
         return ""
 
 
+def to_layout(
+    path: str, input_reader_config: Optional[Dict[str, Any]] = None
+) -> List[Page]:
+    """Extract the positioned words of a PDF file pre-processed by ocrmypdf.
+
+    Args:
+        path (str): Path to the PDF invoice file.
+        input_reader_config (Optional[Dict[str, Any]], optional): Configuration settings for the input reader. Defaults to None.
+
+    Returns:
+        List[Page]: The pages of the document, or an empty list if OCRmyPDF is not available or processing fails.
+    """
+    pre_proc_output = pre_process_pdf(path, pre_conf=input_reader_config)
+    if pre_proc_output:
+        return layout.to_layout(pre_proc_output)
+    return []
+
+
 def pre_process_pdf(
     path: str, pre_conf: Optional[Dict[str, Any]] = None
 ) -> Optional[str]:
@@ -1,10 +1,16 @@
 """Poppler pdftotext input module for invoice2data."""
 
 import os
+import subprocess
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Optional
 
+from . import capabilities
+from . import layout
+from .layout import Page
+
 
 def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
     """Extract text from a PDF file using pdftotext.
@@ -32,10 +38,7 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
     """
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
-    import shutil
-    import subprocess
-
-    if shutil.which("pdftotext"):
+    if capabilities.find_program("pdftotext"):
         cmd = ["pdftotext", "-layout", "-q", "-enc", "UTF-8"]
         if area_details is not None:
             # An area was specified
@@ -74,3 +77,18 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
         raise OSError(
             "pdftotext not installed. Can be downloaded from https://poppler.freedesktop.org/"
         )
+
+
+def to_layout(path: str) -> List[Page]:
+    """Extract the positioned words of a PDF file using pdftotext.
+
+    Areas of the document can then be extracted from the result with
+    `invoice2data.input.layout.area_text`, without running pdftotext again.
+
+    Args:
+        path (str): Path to the PDF file.
+
+    Returns:
+        List[Page]: The pages of the document.
+    """
+    return layout.to_layout(path)
@@ -2,26 +2,47 @@
 
 import mimetypes
 import os
-import shutil
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from logging import getLogger
 from pathlib import Path
 from subprocess import PIPE
-from subprocess import STDOUT
 from subprocess import CalledProcessError
 from subprocess import Popen
 from subprocess import TimeoutExpired
 from subprocess import run
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import List
 from typing import Optional
-from typing import Set
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+from . import capabilities
+from . import layout
+from .layout import Page
 
 
 logger = getLogger(__name__)
 
 
-def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
+# Languages to OCR with, joined with "+". All the installed ones if empty.
+LANGUAGES = os.environ.get("INVOICE2DATA_TESSERACT_LANGUAGES", "")
+
+# Pages of a PDF file OCRed in parallel. With 1, the pages are appended in a
+# single image and OCRed by one tesseract process.
+PAGE_JOBS = int(os.environ.get("INVOICE2DATA_TESSERACT_JOBS", "1"))
+
+
+def to_text(
+    path: str,
+    area_details: Optional[Dict[str, Any]] = None,
+    jobs: Optional[int] = None,
+    languages: Union[str, Sequence[str], None] = None,
+) -> str:
     """Extract text from image using tesseract OCR.
 
     Args:
@@ -29,6 +50,13 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
         area_details (Optional[Dict[str, Any]], optional):
             Specific area in the image to extract text from.
             Defaults to None (extract from the entire image).
+        jobs (Optional[int], optional): Number of pages of a PDF file to OCR
+            in parallel. Defaults to `PAGE_JOBS`, set with the
+            INVOICE2DATA_TESSERACT_JOBS environment variable.
+        languages (Union[str, Sequence[str], None], optional): Languages to
+            OCR with. Defaults to `LANGUAGES`, set with the
+            INVOICE2DATA_TESSERACT_LANGUAGES environment variable, or all
+            the installed languages. See `get_languages`.
 
     Returns:
         str: The extracted text.
@@ -37,53 +65,197 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
         FileNotFoundError: If the specified image file is not found.
         OSError: If Tesseract OCR fails to extract text.
     """
+    _check_dependencies(path)
+
+    timeout = 180
+
+    if area_details is not None:
+        # An area was specified
+        # Validate the required keys were provided
+        assert "f" in area_details, "Area r details missing"
+        assert "l" in area_details, "Area r details missing"
+        assert "r" in area_details, "Area r details missing"
+        assert "x" in area_details, "Area x details missing"
+        assert "y" in area_details, "Area y details missing"
+        assert "W" in area_details, "Area W details missing"
+        assert "H" in area_details, "Area H details missing"
+        # Convert all of the values to strings
+        for key in area_details.keys():
+            area_details[key] = str(area_details[key])
+
+    with _ocr_to_pdfs(path, timeout, jobs, get_languages(languages)) as tess_pdfs:
+        return "".join(
+            _pdftotext(tess_pdf, page_area, timeout)
+            for tess_pdf, page_area in _page_areas(tess_pdfs, area_details)
+        )
+
+
+def to_layout(
+    path: str,
+    jobs: Optional[int] = None,
+    languages: Union[str, Sequence[str], None] = None,
+) -> List[Page]:
+    """Extract the positioned words of an image using tesseract OCR.
+
+    The OCR runs once, areas of the document can then be extracted from the
+    result with `invoice2data.input.layout.area_text`.
+
+    Args:
+        path (str): Path to the image file.
+        jobs (Optional[int], optional): Number of pages of a PDF file to OCR
+            in parallel. Defaults to `PAGE_JOBS`.
+        languages (Union[str, Sequence[str], None], optional): Languages to
+            OCR with. See `get_languages`.
+
+    Returns:
+        List[Page]: The pages of the document.
+
+    Raises:
+        FileNotFoundError: If the specified image file is not found.
+        OSError: If Tesseract OCR fails to extract text.
+    """
+    _check_dependencies(path)
+    with _ocr_to_pdfs(path, 180, jobs, get_languages(languages)) as tess_pdfs:
+        return [page for tess_pdf in tess_pdfs for page in layout.to_layout(tess_pdf)]
+
+
+def _check_dependencies(path: str) -> None:
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
     # Check for dependencies. Needs Tesseract and Imagemagick installed.
-    if not shutil.which("tesseract"):
+    if not capabilities.find_program("tesseract"):
         raise OSError("tesseract not installed.")
-    if not shutil.which("convert"):
+    if not capabilities.find_program("convert"):
         raise OSError("imagemagick not installed.")
 
-    language = get_languages()
-    logger.debug("tesseract language arg is, %s", language)
-    timeout = 180
 
-    # convert the (multi-page) pdf file to a 300dpi png
-    convert = [
+def _page_areas(
+    tess_pdfs: List[str], area_details: Optional[Dict[str, Any]]
+) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """Pair the text-only pdfs with the area to extract from each of them.
+
+    With a pdf per page, the pages outside of the area are skipped and the
+    area is extracted from the single page of the others.
+    """
+    if area_details is None or len(tess_pdfs) == 1:
+        return [(tess_pdf, area_details) for tess_pdf in tess_pdfs]
+    first, last = int(area_details["f"]), int(area_details["l"])
+    page_area = dict(area_details, f="1", l="1")
+    return [
+        (tess_pdf, page_area)
+        for number, tess_pdf in enumerate(tess_pdfs, start=1)
+        if first <= number <= last
+    ]
+
+
+def _pdftotext(
+    tess_pdf: str, area_details: Optional[Dict[str, Any]], timeout: int
+) -> str:
+    """Extract the text of a text-only pdf, keeping its layout."""
+    pdftotext_cmd = [
+        "pdftotext",
+        "-layout",
+        "-enc",
+        "UTF-8",
+    ]
+    if area_details is not None:
+        pdftotext_cmd += [
+            "-f",
+            area_details["f"],
+            "-l",
+            area_details["l"],
+            "-r",
+            area_details["r"],
+            "-x",
+            area_details["x"],
+            "-y",
+            area_details["y"],
+            "-W",
+            area_details["W"],
+            "-H",
+            area_details["H"],
+        ]
+    pdftotext_cmd += [tess_pdf, "-"]
+
+    logger.debug("Calling pdfttext with, %s", pdftotext_cmd)
+    p3 = Popen(pdftotext_cmd, stdout=PIPE)
+    try:
+        out, _err = p3.communicate(timeout=timeout)
+    except TimeoutExpired:
+        p3.kill()
+        logger.warning("pdftotext took too long - skipping")
+        return ""
+    return out.decode("utf-8")
+
+
+@contextmanager
+def _ocr_to_pdfs(
+    path: str, timeout: int, jobs: Optional[int], language: str
+) -> Iterator[List[str]]:
+    """Run tesseract on the file and yield the text-only pdfs of its pages.
+
+    The pages of a PDF file are OCRed separately, and in parallel, when more
+    than one job is set. Otherwise a single pdf holds the whole document.
+
+    The pdfs are written to a temporary directory private to this call, so
+    concurrent runs on files with the same name do not overwrite each other.
+    It is removed when the context exits.
+    """
+    jobs = PAGE_JOBS if jobs is None else jobs
+    with tempfile.TemporaryDirectory(prefix="invoice2data-") as tmp_dir:
+        logger.debug("temp dir is, *%s*", tmp_dir)
+        if jobs > 1 and mimetypes.guess_type(path)[0] == "application/pdf":
+            pages = _page_count(path)
+            if pages is not None and pages > 1:
+                yield _ocr_pages_to_pdfs(path, pages, timeout, jobs, language, tmp_dir)
+                return
+        yield [_ocr_to_pdf(path, timeout, language, tmp_dir)]
+
+
+def _page_count(path: str) -> Optional[int]:
+    """Return the number of pages of a PDF file, None if it is unknown."""
+    if not capabilities.find_program("pdfinfo"):
+        return None
+    args_pdfinfo = ["pdfinfo", path]
+    try:
+        proc = run(
+            args_pdfinfo,
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=30,
+        )
+    except (CalledProcessError, TimeoutExpired):
+        return None
+    for line in proc.stdout.splitlines():
+        if line.startswith("Pages:"):
+            return int(line.split()[1])
+    return None
+
+
+def _convert_cmd(source: str, append: bool) -> List[str]:
+    """Command converting a pdf to a 300dpi png written to stdout."""
+    return [
         "convert",
         "-units",
         "PixelsPerInch",
         "-density",
         "350",
-        path,
+        source,
         "-depth",
         "8",
         "-alpha",
         "off",
         "-resample",
         "300x300",
-        "-append",
+        *(["-append"] if append else []),
         "png:-",
     ]
-    mt = mimetypes.guess_type(path)
-    if mt[0] == "application/pdf":
-        # tesseract does not support pdf files, pre-processing is needed.
-        logger.debug("PDF file detected, start pre-processing by converting to png")
-        p1 = Popen(convert, stdout=PIPE)
-        tess_input = "stdin"
-        stdin = p1.stdout
-    else:
-        tess_input = path
-        stdin = None
-
-    inputfile = Path(path)
-    filename = inputfile.stem
 
-    tmp_folder = str(tempfile.gettempdir()) + "/"
-    logger.debug("temp dir is, *%s*", tmp_folder)
 
-    tess_cmd = [
+def _tesseract_cmd(language: str, tess_input: str, output_base: str) -> List[str]:
+    """Command writing the text-only pdf of an image."""
+    return [
         "tesseract",
         "-l",
         language,
@@ -96,11 +268,57 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
         "-c",
         "textonly_pdf=1",
         tess_input,
-        tmp_folder + filename,
+        output_base,
         "pdf",
-        "txt",
     ]
 
+
+def _ocr_pages_to_pdfs(
+    path: str, pages: int, timeout: int, jobs: int, language: str, tmp_dir: str
+) -> List[str]:
+    """OCR the pages of a PDF file in parallel, one tesseract process per page."""
+    output_base = os.path.join(tmp_dir, Path(path).stem)
+    # Each process gets a single thread, the pages are the parallelism
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+
+    def ocr_page(number: int) -> str:
+        p1 = Popen(_convert_cmd(f"{path}[{number - 1}]", append=False), stdout=PIPE)
+        page_base = f"{output_base}-page{number}"
+        tess_cmd = _tesseract_cmd(language, "stdin", page_base)
+        logger.debug("Calling tesseract with args, %s", tess_cmd)
+        p2 = Popen(tess_cmd, stdin=p1.stdout, stdout=PIPE, env=env)
+        p1.stdout.close()  # type: ignore[union-attr]
+        try:
+            p2.wait(timeout=timeout)
+        except TimeoutExpired:
+            p2.kill()
+            logger.warning("tesseract took too long to OCR page %s - skipping", number)
+        p1.wait()
+        return page_base + ".pdf"
+
+    logger.debug("OCR of %s pages with %s jobs", pages, jobs)
+    with ThreadPoolExecutor(max_workers=min(jobs, pages)) as executor:
+        return list(executor.map(ocr_page, range(1, pages + 1)))
+
+
+def _ocr_to_pdf(path: str, timeout: int, language: str, tmp_dir: str) -> str:
+    """Run tesseract on the file and return the path of the text-only pdf."""
+    logger.debug("tesseract language arg is, %s", language)
+    # convert the (multi-page) pdf file to a 300dpi png
+    mt = mimetypes.guess_type(path)
+    if mt[0] == "application/pdf":
+        # tesseract does not support pdf files, pre-processing is needed.
+        logger.debug("PDF file detected, start pre-processing by converting to png")
+        p1 = Popen(_convert_cmd(path, append=True), stdout=PIPE)
+        tess_input = "stdin"
+        stdin = p1.stdout
+    else:
+        tess_input = path
+        stdin = None
+
+    output_base = os.path.join(tmp_dir, Path(path).stem)
+    tess_cmd = _tesseract_cmd(language, tess_input, output_base)
+
     logger.debug("Calling tesseract with args, %s", tess_cmd)
     p2 = Popen(tess_cmd, stdin=stdin, stdout=PIPE)
 
@@ -111,81 +329,39 @@ def to_text(path: str, area_details: Optional[Dict[str, Any]] = None) -> str:
         p2.kill()
         logger.warning("tesseract took too long to OCR - skipping")
 
-    pdftotext_cmd = [
-        "pdftotext",
-        "-layout",
-        "-enc",
-        "UTF-8",
-    ]
-    if area_details is not None:
-        # An area was specified
-        # Validate the required keys were provided
-        assert "f" in area_details, "Area r details missing"
-        assert "l" in area_details, "Area r details missing"
-        assert "r" in area_details, "Area r details missing"
-        assert "x" in area_details, "Area x details missing"
-        assert "y" in area_details, "Area y details missing"
-        assert "W" in area_details, "Area W details missing"
-        assert "H" in area_details, "Area H details missing"
-        # Convert all of the values to strings
-        for key in area_details.keys():
-            area_details[key] = str(area_details[key])
-        pdftotext_cmd += [
-            "-f",
-            area_details["f"],
-            "-l",
-            area_details["l"],
-            "-r",
-            area_details["r"],
-            "-x",
-            area_details["x"],
-            "-y",
-            area_details["y"],
-            "-W",
-            area_details["W"],
-            "-H",
-            area_details["H"],
-        ]
-    pdftotext_cmd += [tmp_folder + filename + ".pdf", "-"]
+    return output_base + ".pdf"
 
-    logger.debug("Calling pdfttext with, %s", pdftotext_cmd)
-    p3 = Popen(pdftotext_cmd, stdin=p2.stdout, stdout=PIPE)
-    try:
-        out, err = p3.communicate(timeout=timeout)
 
-        extracted_str = out
-    except TimeoutExpired:
-        p3.kill()
-        logger.warning("pdftotext took too long - skipping")
-    return extracted_str.decode("utf-8")
+def get_languages(languages: Union[str, Sequence[str], None] = None) -> str:
+    """Return the tesseract `-l` argument for the requested languages.
 
+    The installed languages are listed once per process, see
+    `invoice2data.input.capabilities`.
 
-def get_languages() -> str:
-    def lang_error(output: str) -> str:
-        logger.warning(  # Use logger.warning instead of assigning to it
-            "Tesseract failed to report available languages.\n"
-            "Output from Tesseract:\n"
-            "-----------\n"
-        )
-        return output  # Add return statement
+    Args:
+        languages (Union[str, Sequence[str], None], optional): Languages to
+            OCR with, as a list or joined with `+`, e.g. `"eng+deu"`.
+            Languages which are not installed are skipped. Defaults to
+            `LANGUAGES`, or all the installed languages if it is not set.
 
-    logger.debug("get lang called")
-    args_tess = ["tesseract", "--list-langs"]
-    try:
-        proc = run(
-            args_tess,
-            text=True,
-            stdout=PIPE,
-            stderr=STDOUT,
-            check=True,
-        )
-        output = proc.stdout
-    except CalledProcessError as e:
-        raise OSError(lang_error(e.output)) from e
-
-    for line in output.splitlines():
-        if line.startswith("Error"):
-            raise OSError(lang_error(output))
-    _header, *rest = output.splitlines()
-    langlist: Set[str] = {lang.strip() for lang in rest}
-    return "+".join(map(str, langlist))
+    Returns:
+        str: The installed languages to use, joined with `+`.
+
+    Raises:
+        OSError: If tesseract fails to report its languages.
+    """
+    installed = capabilities.tesseract_languages()
+    if languages is None:
+        languages = LANGUAGES
+    if isinstance(languages, str):
+        languages = [lang for lang in languages.split("+") if lang]
+    if not languages:
+        return "+".join(installed)
+
+    selected = [lang for lang in languages if lang in installed]
+    missing = [lang for lang in languages if lang not in installed]
+    if missing:
+        logger.warning("Tesseract languages not installed: %s", ", ".join(missing))
+    if not selected:
+        return "+".join(installed)
+    return "+".join(selected)
@@ -0,0 +1,206 @@
+"""Content-addressed cache for the text extracted by input modules.
+
+Extracting text is the most expensive step of the processing, especially
+when OCR is involved. The cache stores the text returned by an input module
+on disk, keyed by a hash of the file content, the input module and the
+options it was called with. Processing the same document again, e.g. after
+editing a template or when retrying a failed invoice, then skips the
+extraction.
+
+The cache folder is kept under a maximum size by removing the least recently
+used entries. The size of the folder is scanned once, then kept as a running
+total of the entries written; the folder is only scanned again when the total
+goes over the maximum size.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from logging import getLogger
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from . import tesseract
+
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024  # 256 MiB
+
+# Seconds after which a temporary file is left over by an interrupted write
+STALE_TMP_AGE = 600
+
+# Input modules whose text depends on the tesseract languages used
+OCR_READERS = ("tesseract", "ocrmypdf")
+
+
+class TextCache:
+    """Cache of extracted texts stored in a folder.
+
+    Args:
+        folder (str): Folder where the cached texts are stored.
+        max_size (int): Maximum total size of the cached texts in bytes.
+            Defaults to 256 MiB.
+    """
+
+    def __init__(self, folder: str, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.folder = os.path.abspath(folder)
+        self.max_size = max_size
+        # Running total of the size of the entries, scanned on first write.
+        # Other processes sharing the folder make it an estimate, corrected
+        # by the scan of each eviction.
+        self._size: Optional[int] = None
+
+    def key(self, path: str, reader: str, *args: Any, **kwargs: Any) -> str:
+        """Return the cache key of a file read with an input module.
+
+        The key of the OCR readers includes the tesseract languages used,
+        so installing a language or changing INVOICE2DATA_TESSERACT_LANGUAGES
+        OCRs the file again.
+
+        Args:
+            path (str): Path of the invoice file.
+            reader (str): Name of the input module.
+            *args (Any): Positional options passed to the input module.
+            **kwargs (Any): Keyword options passed to the input module.
+
+        Returns:
+            str: The hexadecimal cache key.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        options = json.dumps([args, kwargs], sort_keys=True, default=str)
+        if reader.rsplit(".", 1)[-1] in OCR_READERS:
+            try:
+                languages = tesseract.get_languages(kwargs.get("languages"))
+            except OSError:
+                languages = ""
+            options += "\0" + languages
+        digest.update(b"\0" + reader.encode("utf-8"))
+        digest.update(b"\0" + options.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for a key, or None if it is not cached.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[str]: The cached text.
+        """
+        entry = self._entry_path(key)
+        try:
+            with open(entry, encoding="utf-8") as f:
+                text = f.read()
+            # The modification time tracks the last use for the eviction
+            os.utime(entry)
+        except OSError:
+            return None
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        """Store the text for a key, then evict old entries if needed.
+
+        Args:
+            key (str): The cache key.
+            text (str): The extracted text.
+        """
+        entry = self._entry_path(key)
+        if self._size is None:
+            self._size = self._scan()[1]
+        try:
+            replaced = os.path.getsize(entry)
+        except OSError:
+            replaced = 0
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, entry)
+            self._size += os.path.getsize(entry) - replaced
+        except OSError as error:
+            logger.warning("Failed to write text cache entry %s: %s", entry, error)
+            return
+        if self._size > self.max_size:
+            self.evict()
+
+    def to_text(self, input_module: Any, path: str, *args: Any, **kwargs: Any) -> str:
+        """Call `input_module.to_text`, using the cached text when available.
+
+        Empty results are not cached, so a failed extraction is retried.
+
+        Args:
+            input_module (Any): The input module to extract the text with.
+            path (str): Path of the invoice file.
+            *args (Any): Positional options passed to the input module.
+            **kwargs (Any): Keyword options passed to the input module.
+
+        Returns:
+            str: The extracted text.
+        """
+        key = self.key(path, input_module.__name__, *args, **kwargs)
+        text = self.get(key)
+        if text is not None:
+            logger.debug("Using cached text of %s (%s)", path, input_module.__name__)
+            return text
+
+        text = input_module.to_text(path, *args, **kwargs)
+        if isinstance(text, str) and text.strip():
+            self.set(key, text)
+        return text
+
+    def evict(self) -> None:
+        """Remove the least recently used entries above the maximum size."""
+        entries, total = self._scan()
+        self._size = total
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _mtime, size, entry in entries:
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            logger.debug("Evicted text cache entry %s", entry)
+            total -= size
+            self._size = total
+            if total <= self.max_size:
+                break
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        """Return the (mtime, size, path) of the entries and their total size.
+
+        Temporary files left over by a process killed while writing an entry
+        are removed.
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        stale = time.time() - STALE_TMP_AGE
+        for path, _subdirs, files in os.walk(self.folder):
+            for name in files:
+                if not name.endswith((".txt", ".tmp")):
+                    continue
+                entry = os.path.join(path, name)
+                try:
+                    stat = os.stat(entry)
+                    if name.endswith(".tmp"):
+                        if stat.st_mtime < stale:
+                            os.remove(entry)
+                            logger.debug("Removed stale text cache file %s", entry)
+                        continue
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+                total += stat.st_size
+        return entries, total
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], key + ".txt")
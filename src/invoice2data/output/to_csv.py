@@ -5,6 +5,65 @@ import datetime  # noqa
 from typing import Any
 from typing import Dict
 from typing import List
+from typing import Optional
+
+from .writer import OutputWriter
+
+
+class CsvWriter(OutputWriter):
+    """Write the extracted fields of invoices to a CSV file, one row at a time.
+
+    A header row is written before the first invoice and again whenever
+    the fields of an invoice differ from the ones of the previous invoice.
+
+    Examples:
+        >>> from invoice2data.output import to_csv
+        >>> with to_csv.CsvWriter("invoice.csv") as writer:
+        ...     writer.write_one({'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)})
+    """
+
+    extension = ".csv"
+    newline = ""
+
+    def write_header(self) -> None:
+        """Create the CSV writer."""
+        self.writer = csv.writer(self.file, delimiter=",")  # type: ignore[arg-type]
+        self.last_header: Optional[List[str]] = None
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write the row of an invoice, preceded by its header if it changed.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+        """
+        header = list(item.keys())
+
+        if header != self.last_header:
+            self.writer.writerow(header)
+            self.last_header = header
+
+        csv_items = []
+        for k, v in item.items():
+            if k.startswith("date") or k.endswith("date"):
+                v = v.strftime(self.date_format)  # Assuming v is a date object
+            csv_items.append(v)
+        self.writer.writerow(csv_items)
+
+
+def open_writer(path: str, date_format: str = "%Y-%m-%d") -> CsvWriter:
+    """Open a CSV file to write invoices to as they are extracted.
+
+    Args:
+        path (str): CSV file to save output to.
+        date_format (str): Date format used in the generated file.
+                            Defaults to "%Y-%m-%d".
+
+    Returns:
+        CsvWriter: The open writer, to close once all invoices are written.
+    """
+    writer = CsvWriter(path, date_format)
+    writer.open()
+    return writer
 
 
 def write_to_file(
@@ -31,25 +90,6 @@ def write_to_file(
         >>> data = [{'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)}]
         >>> to_csv.write_to_file(data, "invoice.csv")
     """
-    if not path.endswith(".csv"):
-        filename = path + ".csv"
-    else:
-        filename = path
-
-    with open(filename, "w", newline="", encoding="utf-8") as csv_file:
-        writer = csv.writer(csv_file, delimiter=",")
-
-        last_header = None
+    with CsvWriter(path, date_format) as writer:
         for line in data:
-            header = list(line.keys())
-
-            if header != last_header:
-                writer.writerow(header)
-                last_header = header
-
-            csv_items = []
-            for k, v in line.items():
-                if k.startswith("date") or k.endswith("date"):
-                    v = v.strftime(date_format)  # Assuming v is a date object
-                csv_items.append(v)
-            writer.writerow(csv_items)
+            writer.write_one(line)
@@ -3,9 +3,12 @@
 import datetime
 import json
 from typing import Any
+from typing import Callable
 from typing import Dict
 from typing import List
 
+from .writer import OutputWriter
+
 
 def format_item(item: Any, date_format: str) -> Any:
     """Format an item for JSON serialization.
@@ -26,6 +29,68 @@ def format_item(item: Any, date_format: str) -> Any:
     return item
 
 
+def _default(date_format: str) -> Callable[[Any], Any]:
+    """Return a `json.dumps` hook formatting dates, without changing the data."""
+
+    def default(obj: Any) -> Any:
+        if isinstance(obj, datetime.date):
+            return obj.strftime(date_format)
+        raise TypeError(
+            f"Object of type {obj.__class__.__name__} is not JSON serializable"
+        )
+
+    return default
+
+
+class JsonWriter(OutputWriter):
+    """Write the extracted fields of invoices to a JSON list, one at a time.
+
+    The file has the same content as the one of `write_to_file`, the list
+    is closed when the writer is closed.
+
+    Examples:
+        >>> from invoice2data.output import to_json
+        >>> with to_json.JsonWriter("invoice.json") as writer:
+        ...     writer.write_one({'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)})
+    """
+
+    extension = ".json"
+
+    def write_header(self) -> None:
+        """Prepare the date formatting."""
+        self.default = _default(self.date_format)
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write an invoice as an element of the list.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+        """
+        text = json.dumps(item, indent=4, ensure_ascii=False, default=self.default)
+        separator = ",\n    " if self.count else "[\n    "
+        self.file.write(separator + text.replace("\n", "\n    "))  # type: ignore[union-attr]
+
+    def write_footer(self) -> None:
+        """Close the list."""
+        self.file.write("\n]" if self.count else "[]")  # type: ignore[union-attr]
+
+
+def open_writer(path: str, date_format: str = "%Y-%m-%d") -> JsonWriter:
+    """Open a JSON file to write invoices to as they are extracted.
+
+    Args:
+        path (str): Directory to save the generated JSON file.
+        date_format (str): Date format used in the generated file.
+                            Defaults to "%Y-%m-%d".
+
+    Returns:
+        JsonWriter: The open writer, to close once all invoices are written.
+    """
+    writer = JsonWriter(path, date_format)
+    writer.open()
+    return writer
+
+
 def write_to_file(
     data: List[Dict[str, Any]], path: str, date_format: str = "%Y-%m-%d"
 ) -> None:
@@ -48,14 +113,6 @@ def write_to_file(
         >>> data = [{'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)}]
         >>> to_json.write_to_file(data, "invoice.json")
     """
-    for invoice in data:
-        for k, v in invoice.items():
-            invoice[k] = format_item(v, date_format)
-
-    if not path.endswith(".json"):
-        filename = path + ".json"
-    else:
-        filename = path
-
-    with open(filename, "w", encoding="utf-8") as json_file:
-        json.dump(data, json_file, indent=4, ensure_ascii=False)
+    with JsonWriter(path, date_format) as writer:
+        for invoice in data:
+            writer.write_one(invoice)
@@ -0,0 +1,78 @@
+"""NDJSON output module for invoice2data.
+
+Newline-delimited JSON holds one invoice per line, so every invoice is
+complete on disk as soon as it is written and the file can be read back
+line by line.
+"""
+
+import json
+from typing import Any
+from typing import Dict
+from typing import List
+
+from .to_json import _default
+from .writer import OutputWriter
+
+
+class NdjsonWriter(OutputWriter):
+    """Write the extracted fields of invoices to an NDJSON file, one per line.
+
+    Examples:
+        >>> from invoice2data.output import to_ndjson
+        >>> with to_ndjson.NdjsonWriter("invoice.ndjson") as writer:
+        ...     writer.write_one({'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)})
+    """
+
+    extension = ".ndjson"
+
+    def write_header(self) -> None:
+        """Prepare the date formatting."""
+        self.default = _default(self.date_format)
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write an invoice on a line.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+        """
+        line = json.dumps(item, ensure_ascii=False, default=self.default)
+        self.file.write(line + "\n")  # type: ignore[union-attr]
+
+
+def open_writer(path: str, date_format: str = "%Y-%m-%d") -> NdjsonWriter:
+    """Open an NDJSON file to write invoices to as they are extracted.
+
+    Args:
+        path (str): NDJSON file to save output to.
+        date_format (str): Date format used in the generated file.
+                            Defaults to "%Y-%m-%d".
+
+    Returns:
+        NdjsonWriter: The open writer, to close once all invoices are written.
+    """
+    writer = NdjsonWriter(path, date_format)
+    writer.open()
+    return writer
+
+
+def write_to_file(
+    data: List[Dict[str, Any]], path: str, date_format: str = "%Y-%m-%d"
+) -> None:
+    """Export extracted fields to NDJSON, one invoice per line.
+
+    Appends .ndjson to path if missing.
+
+    Args:
+        data (List[Dict[str, Any]]): List of dictionaries of extracted fields.
+        path (str): NDJSON file to save output to.
+        date_format (str): Date format used in the generated file.
+                            Defaults to "%Y-%m-%d".
+
+    Examples:
+        >>> from invoice2data.output import to_ndjson
+        >>> data = [{'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)}]
+        >>> to_ndjson.write_to_file(data, "invoice.ndjson")
+    """
+    with NdjsonWriter(path, date_format) as writer:
+        for invoice in data:
+            writer.write_one(invoice)
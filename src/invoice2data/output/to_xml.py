@@ -1,39 +1,124 @@
-"""XML output module for invoice2data."""
+"""XML output module for invoice2data.
 
+The keys of the extracted fields become tag names, a key which is not a
+valid XML name raises a ValueError instead of writing a malformed file.
+
+Text is escaped like ElementTree does: `&`, `<` and `>` are escaped, double
+quotes are written as is. The output used to be re-parsed with `minidom`,
+which escaped them as `&quot;`.
+"""
+
+import copy
 import datetime
-import importlib.util
+import re
+from functools import lru_cache
 from typing import Any
 from typing import Dict
 from typing import List
+from typing import Optional
 from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 
+from .writer import OutputWriter
 
-def defusedxml_available() -> bool:
-    """Checks if the defusedxml module is available.
 
-    Returns:
-        bool: True if defusedxml is available, False otherwise.
-    """
-    return importlib.util.find_spec("defusedxml") is not None
+XML_DECLARATION = '<?xml version="1.0" ?>\n'
 
+# XML names without namespace prefix: a letter or underscore, then letters,
+# digits, underscores, hyphens and periods
+TAG_NAME_RE = re.compile(r"[^\W\d][\w.-]*")
 
-def prettify(elem: ElementTree.Element) -> Any:
+
+def prettify(elem: ElementTree.Element) -> str:
     """Return a pretty-printed XML string for the Element.
 
+    The element is indented directly, without parsing the serialized XML
+    again. It is left unchanged.
+
     Args:
         elem (ElementTree.Element): The Element to be pretty-printed.
 
     Returns:
-        Any: A pretty-printed XML string.
+        str: A pretty-printed XML string.
+    """
+    elem = copy.deepcopy(elem)
+    indent(elem)
+    return XML_DECLARATION + ElementTree.tostring(elem, encoding="unicode") + "\n"
+
+
+@lru_cache(maxsize=1024)
+def check_tag(tag: str) -> str:
+    """Return the tag name of a key, if it is a valid XML name.
+
+    Args:
+        tag (str): The key of a field.
+
+    Returns:
+        str: The tag name.
+
+    Raises:
+        ValueError: If the key is not a valid XML name.
     """
-    if defusedxml_available():
-        from defusedxml import minidom  # type: ignore[import-not-found]
+    if not TAG_NAME_RE.fullmatch(tag):
+        raise ValueError(f"Field name {tag!r} is not a valid XML tag name")
+    return tag
+
+
+def _text(value: Any, date_format: str) -> Optional[str]:
+    """Return the text of a scalar value, or None for other values."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime.date):
+        return value.strftime(date_format)
+    return None
+
+
+def _set_value(tag: ElementTree.Element, value: Any, date_format: str) -> None:
+    """Set the text or the sub-elements of a tag from a value."""
+    if isinstance(value, dict):
+        dict_to_tags(tag, value, date_format)
+    elif isinstance(value, list):
+        for e in value:
+            item = ElementTree.SubElement(tag, "item")
+            _set_value(item, e, date_format)
     else:
-        from xml.dom import minidom
+        tag.text = _text(value, date_format)
 
-    rough_string = ElementTree.tostring(elem, "utf-8")
-    reparsed = minidom.parseString(rough_string)  # noqa S318
-    return reparsed.toprettyxml(indent="  ")
+
+def _to_lines(
+    tag: str,
+    value: Any,
+    date_format: str,
+    lines: List[str],
+    level: int = 0,
+    attributes: str = "",
+) -> None:
+    """Append the indented lines of a value, as `dict_to_tags` and `prettify` would.
+
+    Writing the lines directly avoids building, indenting and serializing
+    an element tree for every invoice.
+    """
+    pad = "  " * level
+    if isinstance(value, dict):
+        children = [(check_tag(str(k)), v) for k, v in value.items()]
+    elif isinstance(value, list):
+        children = [("item", e) for e in value]
+    else:
+        text = _text(value, date_format)
+        if text:
+            lines.append(f"{pad}<{tag}{attributes}>{escape(text)}</{tag}>")
+        else:
+            lines.append(f"{pad}<{tag}{attributes} />")
+        return
+    if not children:
+        lines.append(f"{pad}<{tag}{attributes} />")
+        return
+    lines.append(f"{pad}<{tag}{attributes}>")
+    for k, v in children:
+        _to_lines(k, v, date_format, lines, level + 1)
+    lines.append(f"{pad}</{tag}>")
 
 
 def dict_to_tags(
@@ -43,25 +128,97 @@ def dict_to_tags(
 
     This function iterates through the dictionary and creates XML tags
     for each key-value pair. It handles different data types and formats
-    dates according to the specified format.
+    dates according to the specified format. Lists become `item` tags and
+    dictionaries nested tags, at any depth.
 
     Args:
         parent (ElementTree.Element): The parent element.
         data (Dict[str, Any]): The dictionary to be converted.
         date_format (str): The date format to use.
+
+    Raises:
+        ValueError: If a key is not a valid XML tag name.
     """
     for k, v in data.items():
-        tag = ElementTree.SubElement(parent, k)
-        if isinstance(v, str):
-            tag.text = v
-        elif isinstance(v, (int, float)):
-            tag.text = str(v)
-        elif isinstance(v, datetime.date):
-            tag.text = v.strftime(date_format)
-        elif isinstance(v, list):
-            for e in v:
-                item = ElementTree.SubElement(tag, "item")
-                dict_to_tags(item, e, date_format)
+        tag = ElementTree.SubElement(parent, check_tag(str(k)))
+        _set_value(tag, v, date_format)
+
+
+def indent(elem: ElementTree.Element, level: int = 0, space: str = "  ") -> None:
+    """Indent the sub-elements of an element in place, like `ElementTree.indent`.
+
+    Elements with text only are kept on a single line.
+
+    Args:
+        elem (ElementTree.Element): The element to indent.
+        level (int): Depth of the element in the document. Defaults to 0.
+        space (str): Indentation of a level. Defaults to two spaces.
+    """
+    if not len(elem):
+        return
+    child_indent = "\n" + space * (level + 1)
+    if not elem.text or not elem.text.strip():
+        elem.text = child_indent
+    for child in elem:
+        indent(child, level + 1, space)
+        child.tail = child_indent
+    elem[-1].tail = "\n" + space * level
+
+
+class XmlWriter(OutputWriter):
+    """Write the extracted fields of invoices to an XML file, one at a time.
+
+    Every invoice is written as an indented `item` of the `data` element,
+    which is closed when the writer is closed. The file is the same as the
+    one `prettify` would make of the whole document.
+
+    Examples:
+        >>> from invoice2data.output import to_xml
+        >>> with to_xml.XmlWriter("invoice.xml") as writer:
+        ...     writer.write_one({'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)})
+    """
+
+    extension = ".xml"
+
+    def write_header(self) -> None:
+        """Write the XML declaration."""
+        self.file.write(XML_DECLARATION)  # type: ignore[union-attr]
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write an invoice as an `item` element.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+
+        Raises:
+            ValueError: If a key is not a valid XML tag name. Nothing is
+                written then.
+        """
+        lines = [] if self.count else ["<data>"]
+        attributes = f' id="{self.count + 1}"'
+        _to_lines("item", item, self.date_format, lines, 1, attributes)
+        lines.append("")
+        self.file.write("\n".join(lines))  # type: ignore[union-attr]
+
+    def write_footer(self) -> None:
+        """Close the `data` element."""
+        self.file.write("</data>\n" if self.count else "<data/>\n")  # type: ignore[union-attr]
+
+
+def open_writer(path: str, date_format: str = "%Y-%m-%d") -> XmlWriter:
+    """Open an XML file to write invoices to as they are extracted.
+
+    Args:
+        path (str): Path to save the generated XML file.
+        date_format (str, optional): Date format used in generated file.
+            Defaults to "%Y-%m-%d".
+
+    Returns:
+        XmlWriter: The open writer, to close once all invoices are written.
+    """
+    writer = XmlWriter(path, date_format)
+    writer.open()
+    return writer
 
 
 def write_to_file(
@@ -86,16 +243,6 @@ def write_to_file(
         >>> data = [{'amount': 123.45, 'date': datetime.datetime(2024, 1, 1)}]
         >>> to_xml.write_to_file(data, "invoice.xml")
     """
-    if not path.endswith(".xml"):
-        filename = path + ".xml"
-    else:
-        filename = path
-
-    tag_data = ElementTree.Element("data")
-    with open(filename, "w") as xml_file:
-        for i, line in enumerate(data):
-            tag_item = ElementTree.SubElement(tag_data, "item")
-            tag_item.set("id", str(i + 1))
-            dict_to_tags(tag_item, line, date_format)
-
-        xml_file.write(prettify(tag_data))
+    with XmlWriter(path, date_format) as writer:
+        for line in data:
+            writer.write_one(line)
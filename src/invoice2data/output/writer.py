@@ -0,0 +1,106 @@
+"""Base class of the incremental output writers.
+
+A writer is opened once, receives the extracted fields of every invoice
+with `write_one` as soon as they are available and is closed at the end.
+Each invoice is flushed to the file when it is written, so a large batch
+never has to be held in memory and the invoices processed before a crash
+are kept.
+"""
+
+import types
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import TextIO
+from typing import Type
+
+
+class OutputWriter:
+    """Write the extracted fields of invoices to a file, one at a time.
+
+    Subclasses set the file `extension` and implement `write_item`, and
+    `write_header` and `write_footer` if the format needs them.
+
+    Args:
+        path (str): File to write to. The extension is appended if missing.
+        date_format (str): Date format used in the file.
+            Defaults to "%Y-%m-%d".
+    """
+
+    extension = ""
+    newline: Optional[str] = None
+
+    def __init__(self, path: str, date_format: str = "%Y-%m-%d") -> None:
+        if not path.endswith(self.extension):
+            path += self.extension
+        self.filename = path
+        self.date_format = date_format
+        self.count = 0
+        self.file: Optional[TextIO] = None
+
+    def open(self) -> "OutputWriter":
+        """Create the file and write the beginning of the document.
+
+        Returns:
+            OutputWriter: The writer itself.
+        """
+        self.file = open(  # noqa: SIM115
+            self.filename, "w", newline=self.newline, encoding="utf-8"
+        )
+        self.write_header()
+        return self
+
+    def write_one(self, item: Dict[str, Any]) -> None:
+        """Write the extracted fields of an invoice and flush them.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+
+        Raises:
+            ValueError: If the writer is not open.
+        """
+        if self.file is None:
+            raise ValueError(f"{self.filename} is not open")
+        self.write_item(item)
+        self.count += 1
+        self.file.flush()
+
+    def close(self) -> None:
+        """Write the end of the document and close the file."""
+        if self.file is None:
+            return
+        try:
+            self.write_footer()
+        finally:
+            self.file.close()
+            self.file = None
+
+    def write_header(self) -> None:
+        """Write the beginning of the document."""
+
+    def write_item(self, item: Dict[str, Any]) -> None:
+        """Write the extracted fields of an invoice.
+
+        Args:
+            item (Dict[str, Any]): Extracted fields of the invoice.
+
+        Raises:
+            NotImplementedError: If the subclass does not implement it.
+        """
+        raise NotImplementedError
+
+    def write_footer(self) -> None:
+        """Write the end of the document."""
+
+    def __enter__(self) -> "OutputWriter":  # noqa: PYI034
+        """Open the writer."""
+        return self.open()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[types.TracebackType],
+    ) -> None:
+        """Close the writer."""
+        self.close()
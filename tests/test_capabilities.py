@@ -0,0 +1,54 @@
+import shutil
+from subprocess import TimeoutExpired
+from typing import Any
+from typing import List
+from typing import Optional
+
+import pytest
+
+from invoice2data.input import capabilities
+
+
+def test_find_program_is_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: List[str] = []
+
+    def which(name: str) -> Optional[str]:
+        calls.append(name)
+        return None
+
+    capabilities.clear_cache()
+    monkeypatch.setattr(shutil, "which", which)
+    try:
+        assert capabilities.find_program("pdftotext") is None
+        assert capabilities.find_program("pdftotext") is None
+        assert capabilities.program_version("pdftotext") is None
+    finally:
+        capabilities.clear_cache()
+
+    assert calls == ["pdftotext"]
+
+
+def test_probe_reports_programs() -> None:
+    report = capabilities.probe()
+
+    assert set(report["programs"]) == set(capabilities.PROGRAMS)
+    for program in report["programs"].values():
+        assert set(program) == {"path", "version"}
+        if program["path"] is None:
+            assert program["version"] is None
+    assert isinstance(report["tesseract_languages"], list)
+
+
+def test_tesseract_languages_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    def run(args: List[str], **kwargs: Any) -> None:
+        assert kwargs["timeout"]
+        raise TimeoutExpired(args, kwargs["timeout"])
+
+    capabilities.clear_cache()
+    monkeypatch.setattr(capabilities, "run", run)
+    try:
+        with pytest.raises(OSError):
+            capabilities.tesseract_languages()
+        assert capabilities.tesseract_languages.cache_info().currsize == 0
+    finally:
+        capabilities.clear_cache()
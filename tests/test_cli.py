@@ -4,8 +4,12 @@ import json
 import os
 import shutil
 import unittest
+from concurrent.futures.process import BrokenProcessPool
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import Tuple
+from unittest import mock
 from xml.dom import minidom
 
 from invoice2data.__main__ import main  # Import main only
@@ -111,6 +115,69 @@ class TestCLI(unittest.TestCase):
                         )
                     os.remove(test_files)
 
+    def test_jobs(self) -> None:
+        """Tests the --jobs argument keeps the order of the input files."""
+        custom_folder = "tests/custom"
+        input_files = sorted(
+            os.path.join(custom_folder, f)
+            for f in os.listdir(custom_folder)
+            if f.endswith(".txt")
+        )
+        test_file = "test_jobs.json"
+        with self.assertRaises(SystemExit) as cm:
+            main(
+                [
+                    "--jobs",
+                    "2",
+                    "--output-name",
+                    test_file,
+                    "--output-format",
+                    "json",
+                    "--template-folder",
+                    "tests/custom/templates",
+                    *input_files,
+                ]
+            )
+        self.assertEqual(cm.exception.code, 0)
+        with open(test_file) as json_test_file:
+            jdatatest = json.load(json_test_file)
+        os.remove(test_file)
+
+        expected = []
+        for ifile in input_files:
+            with open(ifile[:-4] + ".json") as json_file:
+                expected += json.load(json_file)
+        self.assertEqual(jdatatest, expected)
+
+    def test_jobs_crashed_worker(self) -> None:
+        """Tests the invoices extracted before a worker crashed are written."""
+
+        def extract_files(*args: Any) -> Iterator[Tuple[Dict[str, Any], None, None]]:
+            yield {"issuer": "Before the crash"}, None, None
+            raise BrokenProcessPool("worker killed")
+
+        test_file = "test_jobs_crash.json"
+        with mock.patch(
+            "invoice2data.__main__._extract_files", extract_files
+        ), self.assertRaises(SystemExit) as cm:
+            main(
+                [
+                    "--jobs",
+                    "2",
+                    "--output-name",
+                    test_file,
+                    "--output-format",
+                    "json",
+                    "tests/custom/basic.txt",
+                    "tests/custom/lines-basic.txt",
+                ]
+            )
+        self.assertEqual(cm.exception.code, 0)
+        with open(test_file) as json_test_file:
+            jdatatest = json.load(json_test_file)
+        os.remove(test_file)
+        self.assertEqual(jdatatest, [{"issuer": "Before the crash"}])
+
     def test_output_format_date_json(self) -> None:
         """Tests the date format in JSON output."""
         pdf_files = get_sample_files("free_fiber.pdf")
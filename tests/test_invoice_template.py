@@ -1,7 +1,12 @@
 import unittest
+from datetime import datetime
 from typing import Any
 from typing import Dict
 from typing import List
+from unittest import mock
+
+import dateparser  # type: ignore[import-untyped]
+from dateparser.date import DateDataParser  # type: ignore[import-untyped]
 
 from invoice2data.extract.invoice_template import InvoiceTemplate
 
@@ -47,6 +52,89 @@ def test_skip_template_with_too_long_lang_code() -> None:
         )
 
 
+def test_template_with_invalid_regex_is_not_initiated() -> None:
+    tpl: Dict[str, Any] = {
+        "keywords": ["Basic Test"],
+        "exclude_keywords": [],
+        "template_name": "invalid_regex.yml",
+        "fields": {"amount": {"parser": "regex", "regex": "(unterminated"}},
+    }
+    try:
+        InvoiceTemplate(tpl)
+    except ValueError as error:
+        assert "fields.amount.regex" in str(error)
+    else:
+        raise AssertionError("Template with an invalid regex is initiated")
+
+
+def test_template_regexes_are_compiled_once() -> None:
+    tpl: Dict[str, Any] = {
+        "keywords": ["Basic Test"],
+        "exclude_keywords": [],
+        "template_name": "compiled_regex.yml",
+        "fields": {"amount": {"parser": "regex", "regex": r"Total:\s+(\d+)"}},
+        "tables": [{"start": "Start", "end": "End", "body": r"(?P<qty>\d+)"}],
+    }
+    invoicetempl = InvoiceTemplate(tpl)
+
+    compiled = invoicetempl.compile_regex(r"Total:\s+(\d+)")
+    assert compiled is invoicetempl.compile_regex(r"Total:\s+(\d+)")
+    assert compiled.pattern == r"Total:\s+(\d+)"
+
+
+def test_parse_date_agrees_with_dateparser() -> None:
+    options = {"date_formats": ["%d.%m.%Y", "%m-%Y"], "languages": ["de"]}
+    invoicetempl = InvoiceTemplate(
+        {
+            "keywords": ["Basic Test"],
+            "exclude_keywords": [],
+            "template_name": "parse_date.yml",
+            "options": options,
+        }
+    )
+
+    for value in ["05.03.2024", " 05.03.2024\n", "03-2024", "5. März 2024", "foo"]:
+        expected = dateparser.parse(value, **options)
+        assert invoicetempl.parse_date(value) == expected, value
+
+
+def test_parse_date_tries_date_formats_first() -> None:
+    invoicetempl = InvoiceTemplate(
+        {
+            "keywords": ["Basic Test"],
+            "exclude_keywords": [],
+            "template_name": "parse_date.yml",
+            "options": {"date_formats": ["%d/%m/%Y"], "languages": ["fr"]},
+        }
+    )
+
+    with mock.patch.object(DateDataParser, "get_date_data") as get_date_data:
+        assert invoicetempl.parse_date("31/01/2024") == datetime(2024, 1, 31)
+    get_date_data.assert_not_called()
+
+
+def test_coerce_column_agrees_with_coerce_type() -> None:
+    invoicetempl = InvoiceTemplate(
+        {
+            "keywords": ["Basic Test"],
+            "exclude_keywords": [],
+            "template_name": "coerce_column.yml",
+            "options": {"decimal_separator": ","},
+        }
+    )
+
+    values = ["1.234,50", "", "7", "1 000,25", "7"]
+    for target_type in ["int", "float"]:
+        assert invoicetempl.coerce_column(values, target_type) == [
+            invoicetempl.coerce_type(value, target_type) for value in values
+        ]
+    assert invoicetempl.parse_dates(["31/01/2024", "foo", "31/01/2024"]) == [
+        datetime(2024, 1, 31),
+        None,
+        datetime(2024, 1, 31),
+    ]
+
+
 class TestInvoiceTemplateMethods(unittest.TestCase):
     def test_replace_a_with_b(self) -> None:
         options_test: Dict[str, Any] = {
@@ -0,0 +1,135 @@
+from typing import Any
+from typing import Dict
+from unittest import mock
+
+from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.input import layout
+from invoice2data.input import pdftotext
+
+
+BBOX_LAYOUT = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+"http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<title></title>
+</head>
+<body>
+<doc>
+  <page width="595.000000" height="842.000000">
+    <flow>
+      <block xMin="36.0" yMin="36.0" xMax="200.0" yMax="48.0">
+        <line xMin="36.0" yMin="36.0" xMax="200.0" yMax="48.0">
+          <word xMin="36.0" yMin="36.0" xMax="78.0" yMax="48.0">Invoice</word>
+          <word xMin="84.0" yMin="36.0" xMax="108.0" yMax="48.0">1234</word>
+        </line>
+      </block>
+      <block xMin="360.0" yMin="36.0" xMax="540.0" yMax="72.0">
+        <line xMin="360.0" yMin="36.0" xMax="540.0" yMax="48.0">
+          <word xMin="360.0" yMin="36.0" xMax="402.0" yMax="48.0">Street</word>
+          <word xMin="408.0" yMin="36.0" xMax="414.0" yMax="48.0">1</word>
+        </line>
+        <line xMin="360.0" yMin="60.0" xMax="540.0" yMax="72.0">
+          <word xMin="360.0" yMin="60.0" xMax="396.0" yMax="72.0">1234AB</word>
+          <word xMin="420.0" yMin="60.0" xMax="474.0" yMax="72.0">Town&amp;Co</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+  <page width="595.000000" height="842.000000">
+    <flow>
+      <block xMin="36.0" yMin="36.0" xMax="120.0" yMax="48.0">
+        <line xMin="36.0" yMin="36.0" xMax="120.0" yMax="48.0">
+          <word xMin="36.0" yMin="36.0" xMax="66.0" yMax="48.0">Total</word>
+        </line>
+      </block>
+    </flow>
+  </page>
+</doc>
+</body>
+</html>
+"""
+
+
+def test_parse_bbox_layout() -> None:
+    pages = layout.parse_bbox_layout(BBOX_LAYOUT)
+
+    assert len(pages) == 2
+    assert pages[0].width == 595.0
+    assert [[w.text for w in line] for line in pages[0].lines] == [
+        ["Invoice", "1234"],
+        ["Street", "1"],
+        ["1234AB", "Town&Co"],
+    ]
+    assert layout.parse_bbox_layout("") == []
+
+
+def test_area_text() -> None:
+    pages = layout.parse_bbox_layout(BBOX_LAYOUT)
+    # Right half of the first page, in pixels at 144 DPI
+    area = {"f": 1, "l": 1, "r": 144, "x": 600, "y": 0, "W": 590, "H": 300}
+
+    assert layout.area_text(pages, area) == "Street 1\n1234AB   Town&Co\n\f"
+
+    # String values, as passed to pdftotext, are accepted as well
+    area = {"f": "2", "l": "2", "r": "72", "x": "0", "y": "0", "W": "595", "H": "842"}
+    assert layout.area_text(pages, area) == "Total\n\f"
+
+
+def _area_template(area: Dict[str, Any]) -> InvoiceTemplate:
+    return InvoiceTemplate(
+        {
+            "issuer": "Layout",
+            "template_name": "layout.yml",
+            "keywords": ["Invoice"],
+            "exclude_keywords": [],
+            "priority": 5,
+            "fields": {
+                "invoice_number": {
+                    "parser": "regex",
+                    "regex": r"Invoice\s+(\d+)",
+                    "area": area,
+                },
+                "issuer_street": {
+                    "parser": "regex",
+                    "regex": r"Street\s+(\d+)",
+                    "area": dict(area, x=300, W=295),
+                },
+                "date": {"parser": "static", "value": "2024-01-01"},
+                "amount": {"parser": "static", "value": "1"},
+            },
+        }
+    )
+
+
+def test_areas_cropped_by_pdftotext_by_default() -> None:
+    area = {"f": 1, "l": 1, "r": 72, "x": 0, "y": 0, "W": 300, "H": 100}
+    template = _area_template(area)
+
+    with mock.patch.object(
+        pdftotext, "to_text", side_effect=["Invoice 1234", "Street 1"]
+    ) as to_text, mock.patch.object(pdftotext, "to_layout") as to_layout:
+        res = template.extract("Invoice 1234", "invoice.pdf", pdftotext)
+
+    to_layout.assert_not_called()
+    assert to_text.call_args_list == [
+        mock.call("invoice.pdf", area),
+        mock.call("invoice.pdf", dict(area, x=300, W=295)),
+    ]
+    assert res["invoice_number"] == "1234"
+    assert res["issuer_street"] == "1"
+
+
+def test_areas_share_one_layout() -> None:
+    area = {"f": 1, "l": 1, "r": 72, "x": 0, "y": 0, "W": 300, "H": 100}
+    template = _area_template(area)
+    pages = layout.parse_bbox_layout(BBOX_LAYOUT)
+
+    with mock.patch.object(layout, "AREAS_FROM_LAYOUT", True), mock.patch.object(
+        pdftotext, "to_layout", return_value=pages
+    ) as to_layout:
+        res = template.extract("Invoice 1234", "invoice.pdf", pdftotext)
+
+    to_layout.assert_called_once_with("invoice.pdf")
+    assert res["invoice_number"] == "1234"
+    assert res["issuer_street"] == "1"
@@ -3,10 +3,13 @@ import shutil
 import unittest
 from pathlib import Path
 from typing import Generator
+from unittest import mock
 
 import pytest
 
+from invoice2data.extract import loader
 from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.extract.loader import build_template_cache
 from invoice2data.extract.loader import ordered_load
 from invoice2data.extract.loader import read_templates
 
@@ -145,6 +148,53 @@ def test_template_bad_yaml_format_not_loaded(templatedirectory: Path) -> None:
     assert tpl == [], "Bad Yaml Template is loaded!"
 
 
+def test_template_with_invalid_regex_is_not_loaded(templatedirectory: Path) -> None:
+    yamlfile = templatedirectory / "template_bad_regex.yml"
+    yamlfile.write_text(template_bad_regex, encoding="utf-8")
+
+    tpl = read_templates(str(templatedirectory))
+    assert tpl == [], "Template with an invalid regex is loaded!"
+
+
+def test_templates_are_read_from_cache(templatedirectory: Path) -> None:
+    cache_dir = templatedirectory / "cache"
+    yamlfile = templatedirectory / "keywordnotlist.yml"
+    yamlfile.write_text(template_keyword_not_list, encoding="utf-8")
+    (templatedirectory / "excludekeywordnotlist.yml").write_text(
+        template_exclude_keyword_not_list, encoding="utf-8"
+    )
+
+    templates = read_templates(str(templatedirectory), cache_dir=str(cache_dir))
+    with mock.patch.object(
+        loader, "_read_template_file", wraps=loader._read_template_file
+    ) as read_file:
+        cached_templates = read_templates(
+            str(templatedirectory), cache_dir=str(cache_dir)
+        )
+        assert read_file.call_count == 0
+        assert cached_templates == templates
+
+        # Only the changed template is parsed again
+        yamlfile.write_text(template_with_single_special_char, encoding="utf-8")
+        changed_templates = read_templates(
+            str(templatedirectory), cache_dir=str(cache_dir)
+        )
+        assert read_file.call_count == 1
+        assert changed_templates[1]["keywords"] == ["Basic Test"]
+        assert "fields" in changed_templates[1]
+
+
+def test_template_with_invalid_regex_is_not_cached(templatedirectory: Path) -> None:
+    cache_dir = templatedirectory / "cache"
+    yamlfile = templatedirectory / "template_bad_regex.yml"
+    yamlfile.write_text(template_bad_regex, encoding="utf-8")
+
+    cache_file = build_template_cache(str(templatedirectory), str(cache_dir))
+
+    assert os.path.exists(cache_file)
+    assert read_templates(str(templatedirectory), cache_dir=str(cache_dir)) == []
+
+
 template_with_missing_keywords = """
 fields:
   foo:
@@ -180,3 +230,12 @@ exclude_keywords Exclude_this
 options:
   language: EN
 """
+
+
+template_bad_regex = """
+keywords: Basic Test
+fields:
+  amount:
+    parser: regex
+    regex: (Total
+"""
@@ -0,0 +1,122 @@
+import datetime
+import json
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytest
+
+from invoice2data.__main__ import main
+from invoice2data.output import to_csv
+from invoice2data.output import to_json
+from invoice2data.output import to_ndjson
+from invoice2data.output import to_xml
+
+
+INVOICES = [
+    {
+        "issuer": "Acme & Co",
+        "amount": 123.45,
+        "date": datetime.datetime(2024, 1, 31),
+        "lines": [{"description": "Widget", "qty": 2}],
+    },
+    {"issuer": "Other", "amount": 10.0, "date": datetime.datetime(2024, 2, 1)},
+]
+
+
+def test_writers_flush_each_invoice(tmp_path: Path) -> None:
+    for module in [to_csv, to_ndjson]:
+        writer = module.open_writer(str(tmp_path / "invoices"))
+        writer.write_one(INVOICES[1])
+        with open(writer.filename, encoding="utf-8") as f:
+            assert "Other" in f.read()
+        writer.close()
+
+
+def test_json_writer_matches_json_dump(tmp_path: Path) -> None:
+    path = tmp_path / "invoices.json"
+    with to_json.JsonWriter(str(path), "%d/%m/%Y") as writer:
+        for invoice in INVOICES:
+            writer.write_one(invoice)
+
+    expected = [
+        {k: to_json.format_item(v, "%d/%m/%Y") for k, v in invoice.items()}
+        for invoice in INVOICES
+    ]
+    assert path.read_text(encoding="utf-8") == json.dumps(
+        expected, indent=4, ensure_ascii=False
+    )
+    assert isinstance(INVOICES[0]["date"], datetime.datetime)
+
+    with to_json.JsonWriter(str(tmp_path / "empty")):
+        pass
+    assert json.loads((tmp_path / "empty.json").read_text()) == []
+
+
+def test_xml_writer(tmp_path: Path) -> None:
+    path = tmp_path / "invoices.xml"
+    with to_xml.XmlWriter(str(path)) as writer:
+        for invoice in INVOICES:
+            writer.write_one(invoice)
+
+    root = ElementTree.parse(path).getroot()  # noqa: S314
+    assert [item.get("id") for item in root] == ["1", "2"]
+    assert root.find("item/issuer").text == "Acme & Co"
+    assert root.find("item/date").text == "2024-01-31"
+    assert root.find("item/lines/item/qty").text == "2"
+
+
+def test_cli_writes_ndjson(tmp_path: Path) -> None:
+    output = tmp_path / "invoices"
+    try:
+        main(
+            [
+                "--exclude-built-in-templates",
+                "--template-folder",
+                "tests/custom/templates",
+                "--output-format",
+                "ndjson",
+                "--output-name",
+                str(output),
+                "tests/custom/basic.txt",
+                "tests/custom/table-groups.txt",
+            ]
+        )
+    except SystemExit as e:
+        assert e.code == 0
+
+    with open(f"{output}.ndjson", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 2
+    assert all(line["issuer"] for line in lines)
+
+
+def test_xml_writer_matches_prettify(tmp_path: Path) -> None:
+    invoices = [
+        *INVOICES,
+        {"tags": ["a", "b <c>"], "details": {"ref": 1, "empty": None}, "lines": []},
+        {},
+    ]
+    path = tmp_path / "invoices.xml"
+    to_xml.write_to_file(invoices, str(path))
+
+    root = ElementTree.Element("data")
+    for i, invoice in enumerate(invoices):
+        tag_item = ElementTree.SubElement(root, "item")
+        tag_item.set("id", str(i + 1))
+        to_xml.dict_to_tags(tag_item, invoice, "%Y-%m-%d")
+    assert path.read_text(encoding="utf-8") == to_xml.prettify(root)
+    assert root.find("item/issuer").text == "Acme & Co"
+
+
+def test_xml_writer_rejects_invalid_tag_names(tmp_path: Path) -> None:
+    path = tmp_path / "invoices.xml"
+    with to_xml.XmlWriter(str(path)) as writer:
+        writer.write_one({"issuer": 'Acme "Co"'})
+        for key in ["total amount", "1st", "a<b", ""]:
+            with pytest.raises(ValueError, match="not a valid XML tag name"):
+                writer.write_one({"lines": [{key: 1}]})
+
+    root = ElementTree.parse(path).getroot()  # noqa: S314
+    assert [item.get("id") for item in root] == ["1"]
+    assert root.find("item/issuer").text == 'Acme "Co"'
+    assert 'Acme "Co"' in path.read_text(encoding="utf-8")
@@ -0,0 +1,161 @@
+import re
+from typing import Any
+from typing import Dict
+
+from invoice2data.extract import utils
+from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.extract.parsers import lines
+from invoice2data.extract.parsers import regex
+from invoice2data.extract.plugins import tables
+
+
+STATEMENT = """Calls page 1
+Item  Amount
+call one  1.00
+call two  2.50
+Subtotal
+Calls page 2
+Item  Amount
+call three  3.25
+Subtotal
+Total"""
+
+
+def _template(**fields: Any) -> InvoiceTemplate:
+    return InvoiceTemplate(
+        {
+            "keywords": ["Calls"],
+            "template_name": "statement.yml",
+            "fields": fields,
+        }
+    )
+
+
+def test_lines_parsed_from_every_block() -> None:
+    template = _template()
+    rule: Dict[str, Any] = {
+        "start": r"Item\s+Amount",
+        "end": r"Subtotal",
+        "line": r"(?P<description>call \w+)\s+(?P<amount>\d+\.\d+)",
+    }
+
+    rows = lines.parse(template, "lines", rule, STATEMENT)
+
+    assert [row["description"] for row in rows] == [
+        "call one",
+        "call two",
+        "call three",
+    ]
+
+
+def test_block_end_anchored_to_block_start() -> None:
+    template = _template()
+    rule: Dict[str, Any] = {
+        "start": r"Item\s+Amount\n",
+        "end": r"\Acall three|Subtotal",
+        "line": r"(?P<description>call \w+)",
+    }
+
+    rows = lines.parse(template, "lines", rule, STATEMENT)
+
+    # The second block ends as soon as it starts, as with a copy of the text
+    assert [row["description"] for row in rows] == ["call one", "call two"]
+
+
+def test_split_lines_matches_pattern_split() -> None:
+    text = "a\nb\r\n\nc-d\n"
+    for separator in [r"\n", r"\r?\n", r"(-)", r"^", r"\b"]:
+        pattern = re.compile(separator, re.MULTILINE)
+        for pos, endpos in [(0, len(text)), (2, len(text)), (2, 8)]:
+            assert list(utils._split_lines(pattern, text, pos, endpos)) == [
+                line for line in pattern.split(text[pos:endpos]) if line is not None
+            ]
+
+
+def test_line_classifier_tries_roles_in_order() -> None:
+    classifier = lines.LineClassifier(
+        _template(),
+        {
+            "first_line": r"call (?P<description>\w+)",
+            "last_line": r"Subtotal",
+            "skip_line": [r"Item", r"call"],
+            "line": r"(?P<amount>\d+\.\d+)",
+        },
+    )
+
+    # Only first_line applies until an entry starts
+    assert classifier.classify("2.50", in_entry=False) is None
+    role, match = classifier.classify("call one  1.00", in_entry=False)
+    assert (role, match.groupdict()) == ("first_line", {"description": "one"})
+
+    assert classifier.classify("call two  2.50", True)[0] == "first_line"
+    assert classifier.classify("Subtotal 3.50", True)[0] == "last_line"
+    assert classifier.classify("Item  Amount", True)[0] == "skip_line"
+    assert classifier.classify("  2.50", True)[1].group("amount") == "2.50"
+    assert classifier.classify("Total", True) is None
+
+
+def test_table_repeated_on_every_page() -> None:
+    template = _template()
+    template["tables"] = [
+        {
+            "start": r"Item\s+Amount",
+            "end": r"Subtotal",
+            "body": r"(?P<description>call \w+)\s+(?P<amount_call>\d+\.\d+)",
+        }
+    ]
+
+    output = tables.extract(template, "Subtotal first\n" + STATEMENT, {})
+
+    # The first end is before the start, the table is read on both pages
+    assert output == {
+        "description": ["call one", "call two", "call three"],
+        "amount_call": [1.0, 2.5, 3.25],
+    }
+
+
+def test_table_without_end_is_skipped() -> None:
+    template = _template()
+    template["tables"] = [
+        {"start": r"Item\s+Amount", "end": r"Grand total", "body": r"(?P<x>call)"}
+    ]
+
+    assert tables.extract(template, STATEMENT, {}) == {}
+
+
+def test_lines_types_converted_across_blocks() -> None:
+    template = _template()
+    rule: Dict[str, Any] = {
+        "start": r"Item\s+Amount",
+        "end": r"Subtotal",
+        "line": r"(?P<description>call \w+)\s+(?P<amount>\d+\.\d+)",
+        "types": {"amount": "float"},
+    }
+
+    rows = lines.parse(template, "lines", rule, STATEMENT)
+
+    assert [row["amount"] for row in rows] == [1.0, 2.5, 3.25]
+
+
+def test_required_literal() -> None:
+    cases = {
+        r"\w+[@]example\.com": "@example.com",
+        r"Invoice\s+Date:\s+(\S+)": "Invoice",
+        r"x?(?:ab|cd)?yz": "yz",
+        r"(?i)Total": None,
+        r"(?i:total)\s+due": "due",
+        r"\d+": None,
+    }
+    for pattern, literal in cases.items():
+        assert regex.required_literal(re.compile(pattern)) == literal, pattern
+
+
+def test_regex_field_skipped_without_its_literal() -> None:
+    template = _template()
+    settings = {"regex": [r"(\d+\.\d+)\s+EUR", r"call (\w+)"]}
+
+    assert regex.parse(template, "amount", settings, STATEMENT) == [
+        "one",
+        "two",
+        "three",
+    ]
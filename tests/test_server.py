@@ -0,0 +1,306 @@
+"""Tests of the invoice processing server."""
+
+import csv
+import io
+import json
+import shutil
+import sqlite3
+import time
+import zipfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+from typing import AsyncIterator
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+
+import pytest
+from server.app import extraction
+
+
+BASIC_TEMPLATE = "tests/custom/templates/basic.yml"
+BASIC_INVOICE = "tests/custom/basic.txt"
+
+# Extracted data of the fake invoices, by filename
+INVOICES = {
+    "acme-1.pdf": {"issuer": "Acme", "date": "2024-01-15", "amount": 10.0},
+    "acme-2.pdf": {"issuer": "Acme", "date": "2024-02-15", "amount": 20.0},
+    "other-1.pdf": {
+        "issuer": "Other",
+        "date": "2024-02-20",
+        "amount": 30.0,
+        "lines": [{"qty": 2}],
+    },
+}
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Any]:
+    """Client of a server with a fresh database in a temporary data folder.
+
+    The extraction returns the data of `INVOICES`, by filename.
+    """
+    pytest.importorskip("python_multipart")
+    pytest.importorskip("openpyxl")
+    fastapi = pytest.importorskip("fastapi")
+    testclient = pytest.importorskip("fastapi.testclient")
+
+    # The routers create their folders, relative to the current one, on import
+    monkeypatch.chdir(tmp_path)
+    for folder in ["pdfs", "text", "unprocessed", "templates", "output"]:
+        (tmp_path / "data" / folder).mkdir(parents=True)
+
+    from server.app import job_queue
+    from server.app import storage
+    from server.app.routers import downloads
+    from server.app.routers import files
+    from server.app.routers import jobs
+
+    database = storage.Database(tmp_path / "data" / "invoices.db")
+    queue = job_queue.JobQueue(database, 2)
+    for module in [files, downloads]:
+        monkeypatch.setattr(module, "db", database)
+    for module in [files, jobs]:
+        monkeypatch.setattr(module, "queue", queue)
+
+    async def extract_invoice(path: Path) -> Optional[Dict[str, Any]]:
+        return INVOICES.get(path.name)
+
+    monkeypatch.setattr(extraction, "extract_invoice", extract_invoice)
+
+    @asynccontextmanager
+    async def lifespan(app: Any) -> AsyncIterator[None]:
+        await queue.start(files.process_invoice)
+        yield
+        await queue.stop()
+
+    app = fastapi.FastAPI(lifespan=lifespan)
+    app.include_router(files.router, prefix="/files")
+    app.include_router(downloads.router, prefix="/downloads")
+    app.include_router(jobs.router, prefix="/jobs")
+    with testclient.TestClient(app) as test_client:
+        yield test_client
+    database.close()
+
+
+def _wait_for_job(client: Any, job_id: str) -> Dict[str, Any]:
+    for _ in range(200):
+        job: Dict[str, Any] = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def _upload(client: Any, filename: str) -> Dict[str, Any]:
+    response = client.post(
+        "/files/upload/", files={"file": (filename, b"%PDF-1.4", "application/pdf")}
+    )
+    assert response.status_code == 200
+    return _wait_for_job(client, response.json()["job_id"])
+
+
+def test_template_store_reloads_subfolders(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(extraction, "TEMPLATE_CACHE_DIR", tmp_path / "cache")
+    folder = tmp_path / "templates"
+    (folder / "sub").mkdir(parents=True)
+    store = extraction.TemplateStore(folder)
+    built_in = len(store.get())
+
+    shutil.copy(BASIC_TEMPLATE, folder / "sub" / "basic.yml")
+
+    assert len(store.get()) == built_in + 1
+
+
+def test_worker_extracts_with_text_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    folder = tmp_path / "templates"
+    folder.mkdir()
+    shutil.copy(BASIC_TEMPLATE, folder / "basic.yml")
+    monkeypatch.setattr(extraction, "TEMPLATE_DIR", folder)
+    monkeypatch.setattr(extraction, "TEMPLATE_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(extraction, "TEXT_CACHE_DIR", str(tmp_path / "texts"))
+    monkeypatch.setattr(extraction, "_store", None)
+    monkeypatch.setattr(extraction, "_text_cache", None)
+
+    extraction._init_worker()
+    res = extraction._extract(BASIC_INVOICE)
+
+    assert res is not None
+    assert res["issuer"] == "Basic Test"
+    assert res["date"] == "2022-09-27"
+    assert list((tmp_path / "texts").rglob("*.txt"))
+
+
+def test_database_migrates_the_old_schema(tmp_path: Path) -> None:
+    from server.app import storage
+
+    path = tmp_path / "invoices.db"
+    with sqlite3.connect(path) as conn:
+        # Schema and rows of the databases written by the first server
+        conn.execute(
+            "CREATE TABLE invoices (id INTEGER PRIMARY KEY, filename TEXT UNIQUE, "
+            "json_data TEXT, csv_data TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO invoices (filename, json_data) VALUES (?, ?)",
+            [
+                ("failed.pdf", json.dumps("No template found")),
+                ("acme-1.pdf", json.dumps(INVOICES["acme-1.pdf"])),
+            ],
+        )
+    conn.close()
+
+    for _ in range(2):
+        database = storage.Database(path)
+        database.init_db()
+        with database.connection() as conn:
+            rows = conn.execute(
+                "SELECT filename, status, issuer, date, message FROM invoices "
+                "ORDER BY filename"
+            ).fetchall()
+        assert rows == [
+            ("acme-1.pdf", "processed", "Acme", "2024-01-15", None),
+            ("failed.pdf", "failed", None, None, "No template found"),
+        ]
+        assert list(database.iter_invoices()) == [
+            ("acme-1.pdf", INVOICES["acme-1.pdf"])
+        ]
+        assert database.invoice_fields() == ["amount", "date", "issuer"]
+        database.close()
+
+
+def test_upload_is_processed_as_a_job(client: Any) -> None:
+    job = _upload(client, "acme-1.pdf")
+
+    assert job["status"] == "success"
+    assert job["filename"] == "acme-1.pdf"
+    assert job["finished_at"]
+    assert Path("data/pdfs/acme-1.pdf").exists()
+
+    failed = _upload(client, "unknown.pdf")
+    assert failed["status"] == "failed"
+    assert Path("data/unprocessed/unknown.pdf").exists()
+
+    listed = client.get("/jobs/", params={"status": "failed"}).json()["jobs"]
+    assert [job["filename"] for job in listed] == ["unknown.pdf"]
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_upload_sanitizes_the_filename(client: Any) -> None:
+    job = _upload(client, "../../acme-1.pdf")
+
+    assert job["filename"] == "acme-1.pdf"
+    assert job["status"] == "success"
+
+
+def test_batch_upload_keeps_files_with_the_same_name(
+    client: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from server.app import uploads
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a/inv.pdf", b"first")
+        zf.writestr("b/inv.pdf", b"second")
+        zf.writestr("notes.txt", b"skipped")
+        zf.writestr("big.pdf", b"x" * 100)
+    monkeypatch.setattr(uploads, "MAX_UNZIPPED_SIZE", 50)
+
+    response = client.post(
+        "/files/upload/batch/",
+        files=[
+            ("files", ("invoices.zip", archive.getvalue(), "application/zip")),
+            ("files", ("inv.pdf", b"third", "application/pdf")),
+        ],
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    filenames = [job["filename"] for job in body["jobs"]]
+    assert filenames == ["inv.pdf", "inv-2.pdf", "inv-3.pdf"]
+    assert body["skipped"] == ["notes.txt", "big.pdf"]
+    for job in body["jobs"]:
+        _wait_for_job(client, job["job_id"])
+    # Without a matching template, the invoices are moved to unprocessed
+    contents = [Path("data/unprocessed", name).read_bytes() for name in filenames]
+    assert contents == [b"first", b"second", b"third"]
+    assert not list(Path("data/pdfs").glob(".*.part"))
+
+
+def _upload_invoices(client: Any) -> None:
+    for filename in INVOICES:
+        assert _upload(client, filename)["status"] == "success"
+
+
+def test_json_exports_are_filtered(client: Any) -> None:
+    _upload_invoices(client)
+
+    response = client.get("/downloads/download/json/", params={"issuer": "Acme"})
+    assert response.status_code == 200
+    assert "invoices.json" in response.headers["content-disposition"]
+    assert response.json() == {
+        name: INVOICES[name] for name in ["acme-1.pdf", "acme-2.pdf"]
+    }
+
+    response = client.get(
+        "/downloads/download/ndjson/", params={"date_from": "2024-02-01"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"filename": name, **INVOICES[name]} for name in ["acme-2.pdf", "other-1.pdf"]
+    ]
+
+    response = client.get("/downloads/download/json/", params={"issuer": "Nobody"})
+    assert response.json() == {}
+
+
+def test_csv_export_is_filtered(client: Any) -> None:
+    _upload_invoices(client)
+
+    response = client.get(
+        "/downloads/download/csv/",
+        params={"date_from": "2024-02-01", "date_to": "2024-02-15"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    # Only the fields of the exported invoices are columns
+    assert list(rows[0]) == ["filename", "amount", "date", "issuer"]
+    assert [row["filename"] for row in rows] == ["acme-2.pdf"]
+    assert rows[0]["amount"] == "20.0"
+
+    response = client.get("/downloads/download/csv/", params={"issuer": "Other"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["filename"] for row in rows] == ["other-1.pdf"]
+    assert "lines" in rows[0]
+
+    response = client.get("/downloads/download/csv/", params={"issuer": "Nobody"})
+    assert response.json() == {"message": "No processed invoices found."}
+
+
+def test_xlsx_export_is_filtered(client: Any) -> None:
+    openpyxl = pytest.importorskip("openpyxl")
+    _upload_invoices(client)
+
+    response = client.get("/downloads/download/xls/", params={"issuer": "Acme"})
+    assert response.status_code == 200
+    assert "invoices_summary_" in response.headers["content-disposition"]
+    workbook = openpyxl.load_workbook(io.BytesIO(response.content))
+    rows = list(workbook.active.iter_rows(values_only=True))
+    assert rows[0][:4] == ("File", "Invoice Number", "Amount", "Date")
+    assert [row[:4] for row in rows[1:]] == [
+        ("acme-1.pdf", None, 10, "01/15/2024"),
+        ("acme-2.pdf", None, 20, "02/15/2024"),
+    ]
+    # The file written for the request is removed once sent
+    assert not list(Path("data/output").iterdir())
+
+    response = client.get("/downloads/download/xls/", params={"issuer": "Nobody"})
+    assert response.json() == {"message": "No processed invoices found."}
+    assert not list(Path("data/output").iterdir())
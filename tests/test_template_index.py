@@ -0,0 +1,95 @@
+from typing import Any
+from typing import List
+from unittest import mock
+
+import pytest
+
+from invoice2data.extract import template_index
+from invoice2data.extract.invoice_template import InvoiceTemplate
+from invoice2data.extract.loader import read_templates
+from invoice2data.extract.template_index import TemplateIndex
+
+
+def _template(name: str, keywords: List[str], **kwargs: Any) -> InvoiceTemplate:
+    tpl = {
+        "keywords": keywords,
+        "exclude_keywords": [],
+        "template_name": name,
+        "priority": 5,
+    }
+    tpl.update(kwargs)
+    return InvoiceTemplate(tpl)
+
+
+@pytest.fixture(params=[True, False], ids=["automaton", "plain"])
+def use_automaton(request: Any) -> Any:
+    if request.param and not template_index.ahocorasick_available():
+        pytest.skip("requires pyahocorasick")
+    with mock.patch.object(template_index, "AHOCORASICK_AVAILABLE", request.param):
+        yield request.param
+
+
+def test_match_requires_all_keywords(use_automaton: bool) -> None:
+    templates = [
+        _template("both.yml", ["Invoice", "ACME"]),
+        _template("other.yml", ["Invoice", "Globex"]),
+    ]
+    index = TemplateIndex(templates)
+
+    matched = index.match("Invoice number 12 from ACME corp")
+
+    assert [t["template_name"] for t in matched] == ["both.yml"]
+
+
+def test_match_skips_exclude_keywords(use_automaton: bool) -> None:
+    templates = [
+        _template("excluded.yml", ["Basic Test"], exclude_keywords=["Exclude_this"]),
+    ]
+    index = TemplateIndex(templates)
+
+    assert index.match("Basic Test with Exclude_this") == []
+    assert len(index.match("Basic Test alone")) == 1
+
+
+def test_match_overlapping_keywords(use_automaton: bool) -> None:
+    templates = [
+        _template("short.yml", ["Invoice"]),
+        _template("long.yml", ["Invoice No"]),
+    ]
+    index = TemplateIndex(templates)
+
+    matched = index.match("Invoice No 42")
+
+    assert {t["template_name"] for t in matched} == {"short.yml", "long.yml"}
+
+
+def test_match_sorted_by_priority(use_automaton: bool) -> None:
+    templates = [
+        _template("first.yml", ["Invoice"]),
+        _template("generic.yml", ["Invoice"], priority=3),
+        _template("specific.yml", ["Invoice"], priority=6),
+        _template("second.yml", ["Invoice"]),
+    ]
+    index = TemplateIndex(templates)
+
+    matched = index.match("Invoice")
+
+    assert [t["template_name"] for t in matched] == [
+        "specific.yml",
+        "first.yml",
+        "second.yml",
+        "generic.yml",
+    ]
+
+
+def test_match_agrees_with_matches_input(use_automaton: bool) -> None:
+    templates = read_templates()
+    index = TemplateIndex(templates)
+    with open("tests/custom/table-groups.txt", encoding="utf-8") as f:
+        text = f.read()
+    text += " ".join(t["keywords"][0] for t in templates[::7])
+
+    expected = [t["template_name"] for t in templates if t.matches_input(text)]
+    matched = [t["template_name"] for t in index.match(text)]
+
+    assert sorted(matched) == sorted(expected)
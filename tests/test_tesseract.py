@@ -0,0 +1,84 @@
+import os
+from typing import List
+
+import pytest
+
+from invoice2data.input import capabilities
+from invoice2data.input import tesseract
+
+
+AREA = {"f": "2", "l": "3", "r": "300", "x": "0", "y": "0", "W": "10", "H": "10"}
+
+
+def test_page_areas_single_pdf() -> None:
+    assert tesseract._page_areas(["doc.pdf"], AREA) == [("doc.pdf", AREA)]
+    assert tesseract._page_areas(["doc.pdf"], None) == [("doc.pdf", None)]
+
+
+def test_page_areas_pdf_per_page() -> None:
+    pdfs = ["page1.pdf", "page2.pdf", "page3.pdf", "page4.pdf"]
+
+    areas = tesseract._page_areas(pdfs, AREA)
+
+    assert [pdf for pdf, _area in areas] == ["page2.pdf", "page3.pdf"]
+    assert all(area["f"] == area["l"] == "1" for _pdf, area in areas)
+    assert all(area["x"] == "0" for _pdf, area in areas)
+
+
+def test_ocr_to_pdfs_per_page_only_with_jobs(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: List[str] = []
+    monkeypatch.setattr(tesseract, "_page_count", lambda path: 3)
+    monkeypatch.setattr(
+        tesseract,
+        "_ocr_pages_to_pdfs",
+        lambda path, pages, timeout, jobs, language, tmp_dir: (
+            calls.append("pages") or ["1", "2", "3"]
+        ),
+    )
+    monkeypatch.setattr(
+        tesseract,
+        "_ocr_to_pdf",
+        lambda path, timeout, language, tmp_dir: calls.append("single") or "doc.pdf",
+    )
+
+    with tesseract._ocr_to_pdfs("doc.pdf", 10, 1, "eng") as pdfs:
+        assert pdfs == ["doc.pdf"]
+    with tesseract._ocr_to_pdfs("doc.pdf", 10, 2, "eng") as pdfs:
+        assert pdfs == ["1", "2", "3"]
+    with tesseract._ocr_to_pdfs("scan.png", 10, 2, "eng") as pdfs:
+        assert pdfs == ["doc.pdf"]
+    assert calls == ["single", "pages", "single"]
+
+
+def test_ocr_to_pdfs_private_temp_dir(monkeypatch: pytest.MonkeyPatch) -> None:
+    def ocr_to_pdf(path: str, timeout: int, language: str, tmp_dir: str) -> str:
+        tess_pdf = os.path.join(tmp_dir, "doc.pdf")
+        open(tess_pdf, "wb").close()
+        return tess_pdf
+
+    monkeypatch.setattr(tesseract, "_ocr_to_pdf", ocr_to_pdf)
+
+    with tesseract._ocr_to_pdfs(
+        "doc.pdf", 10, 1, "eng"
+    ) as first, tesseract._ocr_to_pdfs("doc.pdf", 10, 1, "eng") as second:
+        assert first != second
+        assert os.path.exists(first[0]) and os.path.exists(second[0])
+    assert not os.path.exists(os.path.dirname(first[0]))
+    assert not os.path.exists(os.path.dirname(second[0]))
+
+
+def test_get_languages_selects_installed(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        capabilities, "tesseract_languages", lambda: ("deu", "eng", "fra")
+    )
+    monkeypatch.setattr(tesseract, "LANGUAGES", "")
+
+    assert tesseract.get_languages() == "deu+eng+fra"
+    assert tesseract.get_languages(["eng", "fra"]) == "eng+fra"
+    assert tesseract.get_languages("fra+xyz") == "fra"
+    assert tesseract.get_languages(["xyz"]) == "deu+eng+fra"
+
+    monkeypatch.setattr(tesseract, "LANGUAGES", "eng")
+    assert tesseract.get_languages() == "eng"
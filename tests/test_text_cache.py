@@ -0,0 +1,115 @@
+import os
+from pathlib import Path
+from typing import List
+from typing import Tuple
+from unittest import mock
+
+from invoice2data.__main__ import extract_data
+from invoice2data.extract.loader import read_templates
+from invoice2data.input import capabilities
+from invoice2data.input import tesseract
+from invoice2data.input import text
+from invoice2data.input.text_cache import TextCache
+
+
+def test_cached_text_is_reused(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"))
+    invoice = "tests/custom/basic.txt"
+
+    with mock.patch.object(text, "to_text", wraps=text.to_text) as to_text:
+        first = cache.to_text(text, invoice)
+        second = cache.to_text(text, invoice)
+
+    assert to_text.call_count == 1
+    assert first == second
+
+
+def test_cache_key_depends_on_content_and_options(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"))
+    invoice = tmp_path / "invoice.txt"
+    invoice.write_text("Invoice 1", encoding="utf-8")
+    key = cache.key(str(invoice), "text")
+
+    assert cache.key(str(invoice), "text") == key
+    assert cache.key(str(invoice), "pdftotext") != key
+    assert cache.key(str(invoice), "text", {"f": 1}) != key
+
+    invoice.write_text("Invoice 2", encoding="utf-8")
+    assert cache.key(str(invoice), "text") != key
+
+
+def test_ocr_cache_key_depends_on_languages(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"))
+    invoice = tmp_path / "invoice.png"
+    invoice.write_bytes(b"image")
+
+    def keys(installed: Tuple[str, ...], languages: str) -> List[str]:
+        with mock.patch.object(
+            capabilities, "tesseract_languages", return_value=installed
+        ), mock.patch.object(tesseract, "LANGUAGES", languages):
+            return [
+                cache.key(str(invoice), reader)
+                for reader in ["invoice2data.input.tesseract", "ocrmypdf", "text"]
+            ]
+
+    eng = keys(("eng",), "")
+    assert keys(("eng",), "") == eng
+    assert keys(("deu", "eng"), "")[:2] != eng[:2]
+    assert keys(("deu", "eng"), "eng") == eng
+    assert keys(("deu", "eng"), "deu")[2] == eng[2]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"), max_size=25)
+    cache.set("aa01", "x" * 10)
+    cache.set("bb02", "x" * 10)
+    os.utime(cache._entry_path("aa01"), (1, 1))
+    os.utime(cache._entry_path("bb02"), (2, 2))
+
+    cache.set("cc03", "x" * 10)
+
+    assert cache.get("aa01") is None
+    assert cache.get("bb02") is not None
+    assert cache.get("cc03") is not None
+
+
+def test_folder_scanned_only_above_max_size(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"), max_size=25)
+    cache.set("aa01", "x" * 10)
+
+    with mock.patch.object(cache, "evict", wraps=cache.evict) as evict:
+        cache.set("aa01", "x" * 12)
+        cache.set("bb02", "x" * 10)
+        evict.assert_not_called()
+        cache.set("cc03", "x" * 10)
+        evict.assert_called_once()
+
+    assert cache._size == 20
+
+
+def test_stale_temporary_files_are_removed(tmp_path: Path) -> None:
+    cache = TextCache(str(tmp_path / "cache"))
+    cache.set("aa01", "x" * 10)
+    stale = tmp_path / "cache" / "aa" / "stale.tmp"
+    stale.write_text("x" * 100)
+    os.utime(stale, (1, 1))
+    writing = tmp_path / "cache" / "aa" / "writing.tmp"
+    writing.write_text("x" * 100)
+
+    cache.evict()
+
+    assert not stale.exists()
+    assert writing.exists()
+    assert cache._size == 10
+
+
+def test_extract_data_with_text_cache(tmp_path: Path) -> None:
+    templates = read_templates("tests/custom/templates")
+    cache = TextCache(str(tmp_path / "cache"))
+
+    res = extract_data("tests/custom/basic.txt", templates, text_cache=cache)
+    with mock.patch.object(text, "to_text") as to_text:
+        cached_res = extract_data("tests/custom/basic.txt", templates, text_cache=cache)
+
+    to_text.assert_not_called()
+    assert res and cached_res == res
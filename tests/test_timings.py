@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from invoice2data.__main__ import extract_data
+from invoice2data.__main__ import main
+from invoice2data.extract.loader import read_templates
+from invoice2data.extract.timings import Timings
+
+
+def test_extract_data_records_stages() -> None:
+    templates = read_templates("tests/custom/templates")
+    timings = Timings()
+
+    res = extract_data("tests/custom/table-groups.txt", templates, timings=timings)
+
+    assert res
+    stages = {record["stage"] for record in timings.records}
+    assert {"to_text", "match_templates", "prepare_input", "parse_field"} <= stages
+    assert "plugin" in stages
+    fields = {
+        record["field"]
+        for record in timings.records
+        if record["stage"] == "parse_field"
+    }
+    assert {"date", "invoice_number", "amount"} <= fields
+    assert all(record["seconds"] >= 0 for record in timings.records)
+    assert set(timings.totals()) == stages
+
+
+def test_extract_data_without_timings() -> None:
+    templates = read_templates("tests/custom/templates")
+
+    assert extract_data("tests/custom/basic.txt", templates)
+
+
+def test_cli_writes_timings(tmp_path: Path) -> None:
+    timings_file = tmp_path / "timings.json"
+    try:
+        main(
+            [
+                "--exclude-built-in-templates",
+                "--template-folder",
+                "tests/custom/templates",
+                "--timings",
+                str(timings_file),
+                "tests/custom/basic.txt",
+            ]
+        )
+    except SystemExit as e:
+        assert e.code == 0
+
+    with open(timings_file) as f:
+        timings = json.load(f)
+    assert [t["file"] for t in timings] == ["tests/custom/basic.txt"]
+    assert {"stage": "to_text"}.items() <= timings[0]["stages"][0].items()